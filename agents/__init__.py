@@ -1,3 +1,15 @@
-from .orchestrator import CBTCounselingSystem
+import importlib
 
-__all__ = ["CBTCounselingSystem"]
\ No newline at end of file
+# Imported on first access so that importing a single agent module (e.g.
+# agents.technique_selector) does not load the whole orchestrator.
+_EXPORTS = {"CBTCounselingSystem": ".orchestrator"}
+
+__all__ = ["CBTCounselingSystem"]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
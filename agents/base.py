@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import Optional, List, Any
 from strands import Agent
-from strands.models import Model, BedrockModel
+from strands.models import Model
+from utils.model_registry import get_model
 
 
 class BaseAgent(ABC):
@@ -11,7 +12,8 @@ class BaseAgent(ABC):
         self,
         system_prompt: str,
         tools: Optional[List[Any]] = None,
-        model: Optional[Model] = None
+        model: Optional[Model] = None,
+        streaming: bool = False
     ):
         """
         Initialize base agent.
@@ -19,15 +21,12 @@ class BaseAgent(ABC):
         Args:
             system_prompt: System prompt for the agent.
             tools: Optional list of tools for the agent.
-            model: Optional model instance (defaults to Bedrock Mistral).
+            model: Optional model instance (defaults to the pooled Bedrock Mistral model).
+            streaming: Whether the default model streams tokens.
         """
         self.system_prompt = system_prompt
         self.tools = tools or []
-        self.model = model or BedrockModel(
-            model_id="mistral.mistral-large-2402-v1:0",
-            region_name="ap-southeast-2",
-            streaming=False,
-        )
+        self.model = model or get_model(streaming=streaming)
         self.agent = Agent(
             system_prompt=self.system_prompt,
             tools=self.tools,
@@ -1,5 +1,5 @@
-from strands import Agent
 from config import Config
+from utils.llm import complete
 from utils.prompts import PromptTemplates
 from .base import BaseAgent
 
@@ -27,8 +27,12 @@ class CBTPlannerAgent(BaseAgent):
             initial_dialogue
         )
         
-        agent = Agent(system_prompt=prompt, tools=[], model=self.model)
-        return str(agent("Choose an appropriate CBT technique and create a comprehensive counseling plan that outlines behavioral goals and cognitive reframing strategies."))
+        return complete(
+            prompt,
+            "Choose an appropriate CBT technique and create a comprehensive counseling plan that outlines behavioral goals and cognitive reframing strategies.",
+            task="cbt_planning",
+            model=self.model,
+        )
     
     def execute(self, client_info: str, reason: str, initial_dialogue: str) -> str:
         """
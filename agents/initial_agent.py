@@ -1,9 +1,9 @@
-from typing import Dict, Optional
-from strands import Agent
+from typing import Dict
 from config import Config
+from models.outputs import Agenda
 from utils.prompts import PromptTemplates
+from utils.structured import structured_complete
 from models.client import ClientProfile
-from models.session import CounselingSession
 from .base import BaseAgent
 
 
@@ -42,20 +42,18 @@ class InitialAgent(BaseAgent):
             initial_message
         )
         
-        agent = Agent(system_prompt=prompt, tools=[], model=self.model)
-        agenda_response = agent("Create a clear, collaborative agenda that the client can agree to, focusing on their immediate needs and therapeutic goals")
-        
-        # Parse agenda response to extract structured information
-        # agenda_data = self._parse_agenda_response(agenda_response)
-        if hasattr(agenda_response, "content"):
-            agenda_text = agenda_response.content
-        elif hasattr(agenda_response, "text"):
-            agenda_text = agenda_response.text
-        else:
-            agenda_text = str(agenda_response)
-
-        agenda_data = self._parse_agenda_response(agenda_text)
-        return agenda_data
+        agenda = structured_complete(
+            prompt,
+            "Create a clear, collaborative agenda that the client can agree to, focusing on their immediate needs and therapeutic goals",
+            Agenda,
+            task="agenda_setting",
+            model=self.model,
+        )
+        if agenda is None:
+            # Planning proceeds from the client profile alone
+            print("[WARN] No valid agenda parsed; continuing without one")
+            return {'agenda_items': [], 'session_focus': '', 'goals': [], 'priorities': []}
+        return agenda.model_dump()
     
     def conduct_initial_session(self, client_profile: ClientProfile, 
                               initial_message: str) -> Dict[str, str]:
@@ -121,24 +119,6 @@ class InitialAgent(BaseAgent):
         """
         return self.conduct_initial_session(client_profile, initial_message)
     
-    def _parse_agenda_response(self, response: str) -> Dict[str, str]:
-        """Parse the agenda setting response into structured data."""
-        agenda_data = {
-            'agenda_items': [],
-            'session_focus': '',
-            'goals': [],
-            'priorities': []
-        }
-        
-        lines = response.split('\n')
-        for line in lines:
-            if 'agenda' in line.lower() or 'focus' in line.lower():
-                agenda_data['session_focus'] = line.strip()
-            elif line.strip().startswith('-') or line.strip().startswith('•'):
-                agenda_data['agenda_items'].append(line.strip())
-        
-        return agenda_data
-    
     def _create_combined_context(self, agenda_data: Dict[str, str]) -> str:
         """Create combined context for the CBT planner."""
         context_parts = []
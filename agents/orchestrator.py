@@ -1,9 +1,12 @@
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional
 from strands import Agent
 from models.client import ClientProfile
-from models.session import CounselingSession
+from models.session import CounselingSession, HistoryView
 from config import Config
 from utils.prompts import PromptTemplates
+from utils import usage
+from utils.concurrency import run_parallel
 from utils.validators import validate_client_profile, validate_message
 from .cbt_planner import CBTPlannerAgent
 from .initial_agent import InitialAgent
@@ -13,15 +16,26 @@ from .specialized import (
     questioning_agent,
     solution_agent,
     normalizing_agent,
-    psychoeducation_agent
+    psychoeducation_agent,
+    build_retrieval_context,
+    run_technique
 )
-from strands.models import BedrockModel
+from utils.model_registry import get_model
 
 
 class CBTCounselingSystem:
     """
     Main orchestrator for the CBT multi-agent counseling system.
     """
+
+    # Candidate name -> technique (Config.THERAPY_AGENTS) of its specialized agent
+    CANDIDATE_TECHNIQUES = {
+        'reflection': "Reflection",
+        'questioning': "Questioning",
+        'solution': "Providing solutions",
+        'normalizing': "Normalization",
+        'psychoeducation': "Psycho-education"
+    }
     
     def __init__(self, client_profile: ClientProfile, initial_client_message: str):
         """
@@ -38,18 +52,15 @@ class CBTCounselingSystem:
         self.client_profile = client_profile
         self.session = CounselingSession()
         self.config = Config()
+        # Model calls of the whole session; each turn gets its own ledger under it
+        self.usage = usage.Ledger("session", usage.Budget.per_session())
+        self._synthesis_usage: Dict = {}
         
         # Initialize sub-agents
         self.initial_agent = InitialAgent()
         self.cbt_planner = CBTPlannerAgent()
         self.technique_selector = TechniqueSelectorAgent()
         
-        bedrock_model = BedrockModel(
-            model_id="mistral.mistral-large-2402-v1:0",
-            region_name="ap-southeast-2",
-            streaming=False,
-        )
-        
         self.orchestrator = Agent(
             system_prompt="""You are a counselor synthesizing responses from 
             specialized therapeutic agents. Generate empathetic, natural counselor responses 
@@ -62,7 +73,7 @@ class CBTCounselingSystem:
                 normalizing_agent,
                 psychoeducation_agent
             ],
-            model=bedrock_model
+            model=get_model()
         )
         
         # Validate and process initial message
@@ -70,6 +81,17 @@ class CBTCounselingSystem:
         if not is_valid:
             raise ValueError(f"Invalid message: {error}")
         
+        with usage.activate(self.usage):
+            self._plan_session(initial_client_message)
+
+        # Add to history
+        self.session.add_message("Client", initial_client_message)
+        
+        # Generate initial response
+        self.initial_response = self._process_turn()
+
+    def _plan_session(self, initial_client_message: str) -> None:
+        """Agenda setting and CBT planning for the first client message."""
         # Conduct initial session task (agenda setting)
         self.session.initial_session_data = self.initial_agent.conduct_initial_session(
             self.client_profile,
@@ -99,12 +121,6 @@ class CBTCounselingSystem:
             self.client_profile.reason_for_counseling,
             initial_client_message
         )
-        
-        # Add to history
-        self.session.add_message("Client", initial_client_message)
-        
-        # Generate initial response
-        self.initial_response = self._process_turn()
     
     def process_turn(self, client_message: str) -> str:
         """
@@ -125,41 +141,82 @@ class CBTCounselingSystem:
     
     def _process_turn(self) -> str:
         """Internal method to process a counseling turn."""
-        history_str = self.session.get_history_string(
-            max_messages=self.config.MAX_HISTORY_LENGTH
-        )
+        with usage.open_ledger("turn", usage.Budget.per_turn(), parents=[self.usage]):
+            response = self._run_turn()
+        self.session.llm_usage = self.usage.to_dict()
+        return response
+
+    def _run_turn(self) -> str:
+        history = self.session.history_view(self.config.MAX_HISTORY_LENGTH)
         
         # Select appropriate techniques
-        techniques = self.technique_selector.select_techniques(
-            self.session.cbt_plan,
-            history_str
+        scored_techniques = self.technique_selector.select_techniques(
+            history.render(self.config.HISTORY_TOKEN_BUDGETS.get("technique_selection"))
         )
+        techniques = [t["technique"] for t in scored_techniques]
         self.session.selected_techniques = techniques
         
         # Generate candidate responses from all specialized agents
-        candidates = self._generate_candidate_responses(history_str)
-        
-        # Synthesize final response
-        synthesis_prompt = PromptTemplates.synthesis_prompt(candidates, techniques)
-        final_response = str(self.orchestrator(synthesis_prompt))
+        candidates = self._generate_candidate_responses(history)
+        
+        # Synthesize final response; when the LLM budget has no room left, the
+        # candidate of the best-scored technique is used as is
+        synthesis_prompt = PromptTemplates.candidates_synthesis_prompt(candidates, techniques)
+        fallback = self._best_candidate(candidates, techniques)
+        if fallback is not None and not usage.allows("synthesis", synthesis_prompt):
+            final_response = fallback
+        else:
+            start = time.perf_counter()
+            result = self.orchestrator(synthesis_prompt)
+            usage.record_result("synthesis", result, synthesis_prompt,
+                                (time.perf_counter() - start) * 1000, previous=self._synthesis_usage)
+            self._synthesis_usage = usage.reported_usage(result)
+            final_response = str(result)
         
         # Add to history
         self.session.add_message("Counselor", final_response)
         
         return final_response
     
-    def _generate_candidate_responses(self, history: str) -> Dict[str, str]:
-        """Generate candidate responses from all specialized agents."""
+    @classmethod
+    def _best_candidate(cls, candidates: Dict[str, str], techniques: List[str]) -> Optional[str]:
+        """Candidate of the highest-ranked selected technique (any candidate if none matches)."""
+        by_technique = {cls.CANDIDATE_TECHNIQUES[name]: text for name, text in candidates.items()}
+        for technique in techniques:
+            if technique in by_technique:
+                return by_technique[technique]
+        return next(iter(candidates.values()), None)
+
+    def _generate_candidate_responses(self, history: HistoryView) -> Dict[str, str]:
+        """
+        Generate candidate responses from all specialized agents concurrently.
+        
+        KB queries and passages are derived once for the turn and shared by all
+        agents, each keeping the passages of its own approach. Agents run on a
+        pool capped at ``Config.CANDIDATE_MAX_WORKERS``; any agent that fails or
+        exceeds ``Config.CANDIDATE_TIMEOUT_SECONDS`` is left out and synthesis
+        proceeds with the candidates that finished.
+        """
         client_info = self.client_profile.to_string()
         reason = self.client_profile.reason_for_counseling
-        
-        return {
-            'reflection': reflection_agent(client_info, reason, history),
-            'questioning': questioning_agent(client_info, reason, history),
-            'solution': solution_agent(client_info, reason, history),
-            'normalizing': normalizing_agent(client_info, reason, history),
-            'psychoeducation': psychoeducation_agent(client_info, reason, history)
-        }
+        try:
+            retrieval = build_retrieval_context(history.latest_client_turn)
+        except Exception as e:
+            # Each agent derives its own context, as without sharing
+            print(f"[WARN] Shared retrieval context failed: {e}")
+            retrieval = None
+        outcomes = run_parallel(
+            {
+                name: (lambda technique=technique: run_technique(technique, client_info, reason, history, retrieval))
+                for name, technique in self.CANDIDATE_TECHNIQUES.items()
+            },
+            max_workers=self.config.CANDIDATE_MAX_WORKERS,
+            timeout=self.config.CANDIDATE_TIMEOUT_SECONDS,
+        )
+        for outcome in outcomes.values():
+            if not outcome.ok:
+                print(f"[WARN] {outcome.name} agent skipped ({outcome.status}): {outcome.error}")
+        return {name: outcome.value for name, outcome in outcomes.items() if outcome.ok}
     
     def get_session_summary(self) -> Dict:
         """Get a summary of the current session."""
@@ -173,5 +230,6 @@ class CBTCounselingSystem:
             'agenda_summary': self.session.initial_session_data.get('agenda_summary', ''),
             'goals': self.session.initial_session_data.get('goals', []),
             'priorities': self.session.initial_session_data.get('priorities', []),
-            'initial_session_data': self.session.initial_session_data
+            'initial_session_data': self.session.initial_session_data,
+            'llm_usage': self.session.llm_usage
         }
\ No newline at end of file
@@ -1,15 +1,19 @@
-from strands.models import BedrockModel
+import json
+import re
+from typing import List, Optional
+
+from config import Config
+from utils import tracing
+from utils.concurrency import run_parallel
+from utils.llm import complete
+from utils.model_registry import get_model
 from utils.prompts import PromptTemplates
 from strands import Agent
 
 class RelevanceValidationAgent(Agent):
     def __init__(self, model=None):
         if model is None:
-            model = BedrockModel(
-                model_id="mistral.mistral-large-2402-v1:0",
-                region_name="ap-southeast-2",
-                streaming=False,
-            )
+            model = get_model()
         
         super().__init__(
             system_prompt=PromptTemplates.relevance_check_prompt(),
@@ -21,10 +25,81 @@ class RelevanceValidationAgent(Agent):
         Checks if the user input is relevant to a therapy session.
         Returns "RELEVANT" or a deflection message.
         """
-        response = str(self(user_input))
+        # Single-turn call (not self(...)) so verdicts do not accumulate in
+        # self.messages and identical inputs can be served from the cache.
+        response = complete(self.system_prompt, user_input, task="relevance_check", model=self.model)
         print("[DEBUG] RELEVANT RELEVANT")
 
         if "RELEVANT" in response:
             return "RELEVANT"
         else:
             return response.strip()
+
+    def classify_batch(self, messages: List[str]) -> List[Optional[bool]]:
+        """
+        Classify many messages with one LLM call per ``Config.RELEVANCE_BATCH_SIZE`` messages.
+
+        Returns one verdict per message, in order; None where the model's
+        output could not be parsed for that message.
+        """
+        verdicts: List[Optional[bool]] = []
+        size = Config.RELEVANCE_BATCH_SIZE
+        for start in range(0, len(messages), size):
+            verdicts.extend(self._classify_chunk(messages[start:start + size]))
+        return verdicts
+
+    def _classify_chunk(self, messages: List[str]) -> List[Optional[bool]]:
+        payload = json.dumps(
+            [{"id": i, "message": message} for i, message in enumerate(messages, 1)],
+            ensure_ascii=False,
+        )
+        response = complete(
+            PromptTemplates.relevance_batch_prompt(), payload, task="relevance_batch", model=self.model
+        )
+
+        by_id = {}
+        with tracing.span("parse.relevance_batch"):
+            try:
+                match = re.search(r'\[.*\]', response, re.DOTALL)
+                for item in json.loads(match.group(0)) if match else []:
+                    if isinstance(item, dict) and isinstance(item.get("relevant"), bool):
+                        by_id[item.get("id")] = item["relevant"]
+            except (json.JSONDecodeError, TypeError):
+                print(f"[ERROR] Could not parse batch relevance output: {response[:100]}")
+        return [by_id.get(i) for i in range(1, len(messages) + 1)]
+
+    def any_relevant(self, messages: List[str], strategy: Optional[str] = None) -> bool:
+        """
+        True as soon as one message is relevant to therapy.
+
+        Strategies (default ``Config.RELEVANCE_BATCH_STRATEGY``):
+            "batch": classify chunks with ``classify_batch`` and stop after the
+                first chunk containing a relevant message; messages the model
+                left unanswered are re-checked one by one in a parallel burst.
+            "parallel": one ``execute`` call per message on a bounded pool,
+                abandoning the rest once any message comes back RELEVANT.
+        """
+        strategy = strategy or Config.RELEVANCE_BATCH_STRATEGY
+        if strategy == "parallel":
+            return self._any_relevant_parallel(messages)
+        if strategy != "batch":
+            raise ValueError(f"Unknown relevance strategy: {strategy}")
+
+        size = Config.RELEVANCE_BATCH_SIZE
+        for start in range(0, len(messages), size):
+            chunk = messages[start:start + size]
+            verdicts = self._classify_chunk(chunk)
+            if any(verdicts):
+                return True
+            unanswered = [message for message, verdict in zip(chunk, verdicts) if verdict is None]
+            if unanswered and self._any_relevant_parallel(unanswered):
+                return True
+        return False
+
+    def _any_relevant_parallel(self, messages: List[str]) -> bool:
+        outcomes = run_parallel(
+            {str(i): (lambda m=message: self.execute(m) == "RELEVANT") for i, message in enumerate(messages)},
+            max_workers=Config.RELEVANCE_MAX_WORKERS,
+            stop_when=lambda outcome: outcome.ok and outcome.value,
+        )
+        return any(outcome.ok and outcome.value for outcome in outcomes.values())
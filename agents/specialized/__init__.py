@@ -1,15 +1,27 @@
-from .reflection import reflection_agent
-from .questioning import questioning_agent
-from .solution import solution_agent
-from .normalizing import normalizing_agent
-from .psychoeducation import psychoeducation_agent
-from .crisis_handler import CrisisHandlerAgent
-
-__all__ = [
-    "reflection_agent",
-    "questioning_agent",
-    "solution_agent",
-    "normalizing_agent",
-    "psychoeducation_agent",
-    "CrisisHandlerAgent"
-]
\ No newline at end of file
+import importlib
+
+# Exported name -> submodule. Submodules are imported on first access: the
+# @tool agents are only needed by the tool-calling orchestrator, so a handler
+# that imports run_technique does not pay for loading them at cold start.
+_EXPORTS = {
+    "reflection_agent": ".reflection",
+    "questioning_agent": ".questioning",
+    "solution_agent": ".solution",
+    "normalizing_agent": ".normalizing",
+    "psychoeducation_agent": ".psychoeducation",
+    "CrisisHandlerAgent": ".crisis_handler",
+    "run_technique": ".common",
+    "stream_specialized_agent": ".common",
+    "RetrievalContext": ".common",
+    "build_retrieval_context": ".common",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,206 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from config import Config
+from models.session import HistoryView
+from utils import tracing, usage
+from utils.knowledge_base import passage_content, retrieve_batch, score_threshold
+from utils.llm import complete, stream_complete
+from utils.prompts import PromptTemplates
+from utils.rag_lexicon import get_lexicon
+
+# (client_info, reason, history, kb_text) -> system prompt
+PromptBuilder = Callable[[str, str, str, str], str]
+
+# Rendered history string (tool calls) or the structured view (handlers)
+History = Union[str, HistoryView]
+
+_SPEAKER_LINE = re.compile(r"^(Client|Counselor): ?", re.MULTILINE)
+_HEADER_LABEL = re.compile(r"^(?:Approach|Module): ?(.+)$", re.MULTILINE)
+
+
+def latest_client_turn(history: History) -> str:
+    """Return the most recent client utterance (including continuation lines)."""
+    if isinstance(history, HistoryView):
+        return history.latest_client_turn
+    parts = _SPEAKER_LINE.split(history.strip())
+    # parts = [preamble, speaker, text, speaker, text, ...]
+    for speaker, text in reversed(list(zip(parts[1::2], parts[2::2]))):
+        if speaker == "Client":
+            return text.strip()
+    return ""
+
+
+def render_history(history: History, task: str = "specialized_response") -> str:
+    """Prompt text for ``history``, within the task's token budget for structured views."""
+    if isinstance(history, HistoryView):
+        return history.render(Config.HISTORY_TOKEN_BUDGETS.get(task))
+    return history
+
+
+def generate_kb_queries(latest_turn: str) -> List[str]:
+    """
+    Ask the model for CBT concept queries; fall back to the client turn itself
+    (also when the LLM budget has no room for the extra call, see ``utils.usage``).
+
+    With ``Config.RAG_QUERY_MODE == "local"`` the queries come from the
+    agent.json concept lexicon instead and the specialized agent makes a
+    single model call (``utils.rag_lexicon``).
+    """
+    if Config.RAG_QUERY_MODE == "local":
+        with tracing.span("rag_queries.local"):
+            return get_lexicon().queries(latest_turn)
+    prompt = PromptTemplates.rag_cbt_concept_prompt(latest_turn)
+    if not usage.allows("rag_query", f"{prompt}\n{latest_turn}"):
+        return [latest_turn]
+    query_response = complete(prompt, latest_turn, task="rag_query")
+    print("[QUERY] ", query_response)
+    with tracing.span("parse.rag_queries"):
+        try:
+            queries = json.loads(query_response).get("queries", [])
+        except Exception:
+            queries = []
+    return queries or [latest_turn]
+
+
+def _passage_labels(passage: Dict[str, Any]) -> List[str]:
+    """Approach and module of a passage, from its metadata or the header the KB prepends."""
+    metadata = passage.get("metadata") or {}
+    labels = [str(metadata[key]) for key in ("approach", "module") if metadata.get(key)]
+    text = passage.get("text", "")
+    header = text.split("Content:", 1)[0] if "Content:" in text else ""
+    return labels + _HEADER_LABEL.findall(header)
+
+
+@dataclass
+class RetrievalContext:
+    """
+    Knowledge base passages for one client turn. Queries are derived and
+    retrieved once (``build_retrieval_context``) and every specialized agent
+    takes its guidance from the same passages.
+    """
+    latest_turn: str
+    queries: List[str]
+    # Normalized retrieval results above the "relevant" score threshold, best first, each with the
+    # "queries" that found it (utils.knowledge_base.retrieve_batch)
+    passages: List[Dict[str, Any]] = field(default_factory=list)
+
+    def passages_for(self, technique: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        The passages of the technique's approach (``Config.TECHNIQUE_KB_APPROACHES``),
+        or all of them when none matches.
+        """
+        label = Config.TECHNIQUE_KB_APPROACHES.get(technique or "", "").lower()
+        matching = [
+            p for p in self.passages
+            if label and any(value.strip().lower().startswith(label) for value in _passage_labels(p))
+        ]
+        return (matching or self.passages)[:Config.RAG_PASSAGES_PER_AGENT]
+
+    def kb_text(self, technique: Optional[str] = None) -> str:
+        """Guideline string for the technique's agent prompt."""
+        return " ".join(passage_content(p["text"]) for p in self.passages_for(technique))
+
+
+def build_retrieval_context(latest_turn: str) -> RetrievalContext:
+    """Derive KB queries for the turn and retrieve their passages in one batch."""
+    with tracing.span("retrieval_context"):
+        queries = list(dict.fromkeys(q.strip() for q in generate_kb_queries(latest_turn) if q.strip()))
+        passages = retrieve_batch(queries, number_of_results=Config.RAG_CONTEXT_RESULTS, min_score=score_threshold("relevant"))
+    return RetrievalContext(latest_turn, queries, passages)
+
+
+def prepare_specialized_prompt(
+    agent_name: str,
+    build_prompt: PromptBuilder,
+    client_info: str,
+    reason: str,
+    history: History,
+    retrieval: Optional[RetrievalContext] = None,
+) -> Tuple[str, str]:
+    """
+    Take the agent's guidance from the turn's retrieval context (derived here
+    when none is shared) and build the technique-specific system prompt.
+
+    Returns:
+        (system_prompt, latest_client_turn)
+    """
+    latest_turn = latest_client_turn(history)
+    if retrieval is None:
+        retrieval = build_retrieval_context(latest_turn)
+    technique = next((t for t, (name, _) in TECHNIQUE_PROMPTS.items() if name == agent_name), None)
+    merged_kb_text = retrieval.kb_text(technique)
+    print(f"[DEBUG] RAG content for {agent_name}: '{merged_kb_text}'")
+    return build_prompt(client_info, reason, render_history(history), merged_kb_text), latest_turn
+
+
+def specialized_response(
+    agent_name: str,
+    build_prompt: PromptBuilder,
+    client_info: str,
+    reason: str,
+    history: History,
+    retrieval: Optional[RetrievalContext] = None,
+) -> str:
+    """Counselor utterance of a specialized agent; retrieval and model errors propagate."""
+    prompt, latest_turn = prepare_specialized_prompt(
+        agent_name, build_prompt, client_info, reason, history, retrieval
+    )
+    return complete(prompt, latest_turn, task="specialized_response")
+
+
+def run_specialized_agent(
+    agent_name: str,
+    build_prompt: PromptBuilder,
+    client_info: str,
+    reason: str,
+    history: History,
+    retrieval: Optional[RetrievalContext] = None,
+) -> str:
+    """Shared body of the specialized technique tools; errors are returned to the calling model as text."""
+    try:
+        return specialized_response(agent_name, build_prompt, client_info, reason, history, retrieval)
+    except Exception as e:
+        return f"Error in {agent_name.replace('_', ' ')}: {str(e)}"
+
+
+# Technique name (Config.THERAPY_AGENTS) -> (agent name, prompt builder)
+TECHNIQUE_PROMPTS: Dict[str, Tuple[str, PromptBuilder]] = {
+    "Reflection": ("reflection_agent", PromptTemplates.reflection_prompt),
+    "Questioning": ("questioning_agent", PromptTemplates.questioning_prompt),
+    "Providing solutions": ("solution_agent", PromptTemplates.solution_prompt),
+    "Normalization": ("normalizing_agent", PromptTemplates.normalizing_prompt),
+    "Psycho-education": ("psychoeducation_agent", PromptTemplates.psychoeducation_prompt),
+}
+
+
+def run_technique(technique: str, client_info: str, reason: str, history: History,
+                  retrieval: Optional[RetrievalContext] = None) -> str:
+    """
+    Run the specialized agent for ``technique`` (a ``Config.THERAPY_AGENTS``
+    name), with the turn's shared ``retrieval`` context if there is one.
+
+    Raises whatever retrieval or the model raised, so callers can tell a
+    failed agent from a counselor utterance.
+    """
+    agent_name, build_prompt = TECHNIQUE_PROMPTS[technique]
+    return specialized_response(agent_name, build_prompt, client_info, reason, history, retrieval)
+
+
+def stream_specialized_agent(technique: str, client_info: str, reason: str, history: History,
+                             retrieval: Optional[RetrievalContext] = None) -> Iterator[str]:
+    """
+    Streaming variant of the specialized agent for ``technique``.
+
+    Retrieval and prompt building happen up front; the counselor utterance is
+    then yielded chunk by chunk as the model generates it. Errors propagate as
+    in ``run_technique``, also after chunks have been yielded, so a failed
+    reply is never mistaken for (the end of) a counselor utterance.
+    """
+    agent_name, build_prompt = TECHNIQUE_PROMPTS[technique]
+    prompt, latest_turn = prepare_specialized_prompt(
+        agent_name, build_prompt, client_info, reason, history, retrieval
+    )
+    yield from stream_complete(prompt, latest_turn, task="specialized_response")
@@ -3,74 +3,67 @@ import json
 from typing import Optional
 from agents.base import BaseAgent
 from utils.prompts import PromptTemplates
-from strands.models import BedrockModel
-from strands import Agent, tool
-from strands_tools import retrieve
-import boto3
+from utils.knowledge_base import retrieve, score_threshold
+from utils.llm import complete
+from utils.model_registry import get_model
 
 class CrisisHandlerAgent(BaseAgent):
 
     def __init__(self):
-        self.model = BedrockModel(
-            model_id="mistral.mistral-large-2402-v1:0",
-            region_name="ap-southeast-2",
-            streaming=False,
-        )
+        self.model = get_model()
         super().__init__(
             system_prompt=None,
             model=self.model
         )
 
+    @staticmethod
+    def _result(flags: str, response: str, kb_score: Optional[float]) -> str:
+        return json.dumps({"flags": flags, "response": response, "kb_score": kb_score}, ensure_ascii=False)
+
     def execute(self, message: str) -> str:
         """Detect crisis intent and generate emergency response if needed.
-        """
-        bedrock_runtime = boto3.client("bedrock-agent-runtime", region_name="ap-southeast-2")
 
+        Returns a JSON string with "flags", "response" and the crisis KB
+        similarity "kb_score" (null when retrieval failed or found nothing).
+        """
         flags = ""
         response = ""
+        kb_score = None
 
         try:
-            kb_results = bedrock_runtime.retrieve(
-                knowledgeBaseId='UHCCSWKNZF',
-                retrievalQuery={'text': message},
-                retrievalConfiguration={
-                    'vectorSearchConfiguration': {
-                        'numberOfResults': 1,
-                        'filter': {
-                            'equals': {
-                                'key': 'intervention_type',
-                                'value': "crisis"
-                            }
-                        }
-                    }
-                }
+            retrievals = retrieve(
+                message,
+                number_of_results=1,
+                metadata_filter={'equals': {'key': 'intervention_type', 'value': "crisis"}},
             )
-            retrievals = kb_results.get("retrievalResults", [])
-            if not retrievals:
-                return json.dumps({"flags": flags, "response": response}, ensure_ascii=False)
+            # 0.2 / 0.55 on Bedrock's scale; see Config.KB_SCORE_THRESHOLDS. A
+            # crisis_possible of 0 (the local scales) sends every message to the
+            # LLM check, including ones that match no crisis example at all
+            crisis_possible = score_threshold("crisis_possible")
+            if not retrievals and crisis_possible > 0:
+                return self._result(flags, response, kb_score)
 
-            result = retrievals[0]
-            kb_text = result["content"]["text"]
-            kb_score = result.get("score", 0.0)
-            print(f"Retrieved KB text with score: {kb_score}")
+            kb_text = retrievals[0]["text"] if retrievals else ""
+            if retrievals:
+                kb_score = retrievals[0].get("score", 0.0)
+                print(f"Retrieved KB text with score: {kb_score}")
 
-            if kb_score <= 0.2:
-                return json.dumps({"flags": flags, "response": response}, ensure_ascii=False)
-            if kb_score <= 0.55:
+            if crisis_possible > 0 and kb_score <= crisis_possible:
+                return self._result(flags, response, kb_score)
+            if kb_score is None or kb_score <= score_threshold("crisis_likely"):
                 print("[DEBUG] FALLBACK CRISIS")
                 prompt_crisis_fallback = PromptTemplates.crisis_detect()
-                crisis_agent_fallback = Agent(system_prompt=prompt_crisis_fallback, model=self.model, tools=[])
-                crisis_response_fallback = str(crisis_agent_fallback(message)).strip()
+                crisis_response_fallback = complete(
+                    prompt_crisis_fallback, message, task="crisis_detect", model=self.model
+                ).strip()
                 if crisis_response_fallback.upper().startswith("NO_CRISIS"):
-                    return json.dumps({"flags": flags, "response": response}, ensure_ascii=False)  
+                    return self._result(flags, response, kb_score)  
             prompt_intent = PromptTemplates.intent_extraction_prompt(message, kb_text)
-            intent_agent = Agent(system_prompt=prompt_intent, model=self.model, tools=[])
-            intent_response = str(intent_agent(message)).strip()
+            intent_response = complete(prompt_intent, message, task="crisis_intent", model=self.model).strip()
             intent_response = re.sub(r'[^a-zA-Z0-9,\s]', '', intent_response)
             print("[DEBUG intent] ", intent_response)
             prompt_crisis = PromptTemplates.crisis_handler_prompt()
-            crisis_agent = Agent(system_prompt=prompt_crisis, model=self.model, tools=[])
-            crisis_response = str(crisis_agent(message)).strip()
+            crisis_response = complete(prompt_crisis, message, task="crisis_response", model=self.model).strip()
 
             if intent_response:
                 flags = intent_response
@@ -85,4 +78,4 @@ class CrisisHandlerAgent(BaseAgent):
             flags = ""
             response = ""
 
-        return json.dumps({"flags": flags, "response": response}, ensure_ascii=False)
+        return self._result(flags, response, kb_score)
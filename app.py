@@ -1,36 +1,51 @@
 import gradio as gr
 import json
-from lambda_function import start_session_handler, process_turn_handler, session_summary_handler
+from lambda_function import (
+    start_session_handler,
+    process_turn_handler,
+    session_summary_handler,
+    start_session_stream_handler,
+    process_turn_stream_handler,
+)
+
+
+def _session_ref(body):
+    """The part of a handler response the UI keeps: the stored session's id and version."""
+    return {"session_id": body["session_id"], "version": body["version"]}
 
 
 def chatbot_interface(client_msg, session_state_json, client_profile_json):
     """Call handler and return response + new session_state."""
     
+    # Session-id mode: the session lives server-side, so only the new message
+    # goes out and only the reply plus {"session_id", "version"} comes back
     if not session_state_json:
         event = {
             "body": json.dumps({
                 "client_profile": json.loads(client_profile_json),
-                "initial_client_message": client_msg
+                "initial_client_message": client_msg,
+                "session_mode": "id"
             })
         }
         response = start_session_handler(event, None)
         body = json.loads(response["body"])
         counselor_response = body.get("initial_response")
         crisis_detected = body.get("crisis_detected", False)
-        session_state = body["session_state"]
+        session_state = _session_ref(body)
     else:
         event = {
             "body": json.dumps({
-                "session_state": json.loads(session_state_json),
-                "client_message": client_msg,
-                "client_profile": json.loads(client_profile_json)
+                **json.loads(session_state_json),
+                "client_message": client_msg
             })
         }
         response = process_turn_handler(event, None)
         body = json.loads(response["body"])
+        if response["statusCode"] != 200:
+            return f"⚠️ {body.get('error', 'Session error')}", session_state_json
         counselor_response = body.get("response")
         crisis_detected = body.get("crisis_detected", False)
-        session_state = body["session_state"]
+        session_state = _session_ref(body)
 
     if crisis_detected:
         counselor_response = f"🚨 [Crisis Handler] {counselor_response}"
@@ -38,6 +53,43 @@ def chatbot_interface(client_msg, session_state_json, client_profile_json):
     return counselor_response, json.dumps(session_state, ensure_ascii=False)
 
 
+def chatbot_interface_stream(client_msg, session_state_json, client_profile_json):
+    """Streaming variant of chatbot_interface: yields (partial response, session_state)."""
+    client_profile = json.loads(client_profile_json)
+
+    if not session_state_json:
+        events = start_session_stream_handler({
+            "body": json.dumps({
+                "client_profile": client_profile,
+                "initial_client_message": client_msg,
+                "session_mode": "id"
+            })
+        }, None)
+    else:
+        events = process_turn_stream_handler({
+            "body": json.dumps({
+                **json.loads(session_state_json),
+                "client_message": client_msg
+            })
+        }, None)
+
+    partial_response = ""
+    for event in events:
+        if event["type"] == "token":
+            partial_response += event["text"]
+            yield partial_response, session_state_json
+            continue
+        if event["type"] == "error":
+            yield f"⚠️ {event['body'].get('error', 'Session error')}", session_state_json
+            return
+
+        body = event["body"]
+        counselor_response = body.get("response", body.get("initial_response"))
+        if body.get("crisis_detected", False):
+            counselor_response = f"🚨 [Crisis Handler] {counselor_response}"
+        yield counselor_response, json.dumps(_session_ref(body), ensure_ascii=False)
+
+
 def generate_session_summary(session_state_json, client_profile_json):
     """Generate session summary by calling session_summary_handler."""
     
@@ -52,6 +104,17 @@ def generate_session_summary(session_state_json, client_profile_json):
         print("=" * 80)
         print("DEBUG: Session State Keys:", list(session_state.keys()))
         print("=" * 80)
+
+        # Session-id mode: the handler reads history, annotations and the
+        # rolling summary from the session store
+        if "session_id" in session_state:
+            event = {
+                "body": json.dumps({
+                    "client_profile": client_profile,
+                    "session_id": session_state["session_id"]
+                })
+            }
+            return _format_summary(session_summary_handler(event, None))
         
         # Build chat_history from session_state
         # The CounselingSession.to_dict() returns the conversation_history
@@ -72,7 +135,8 @@ def generate_session_summary(session_state_json, client_profile_json):
                     if role and content:
                         chat_history.append({
                             "role": role,
-                            "message": content
+                            "message": content,
+                            "annotations": msg.get("annotations", {})
                         })
                         print(f"  - Added message: {role}: {content[:50]}...")
         else:
@@ -89,9 +153,11 @@ def generate_session_summary(session_state_json, client_profile_json):
                             content = msg.get("content") or msg.get("message") or msg.get("text")
                             
                             if role and content:
+                                # Per-message annotations let the summary skip re-screening
                                 chat_history.append({
                                     "role": role,
-                                    "message": content
+                                    "message": content,
+                                    "annotations": msg.get("annotations", {})
                                 })
                     break
         
@@ -113,13 +179,27 @@ def generate_session_summary(session_state_json, client_profile_json):
         event = {
             "body": json.dumps({
                 "client_profile": client_profile,
-                "chat_history": chat_history
+                "chat_history": chat_history,
+                "rolling_summary": session_state.get("rolling_summary", ""),
+                "summary_checkpoint": session_state.get("summary_checkpoint", 0)
             })
         }
         
         # Call the summary handler
         print("🔄 Calling session_summary_handler...")
         response = session_summary_handler(event, None)
+        return _format_summary(response)
+        
+    except json.JSONDecodeError as e:
+        return f"❌ JSON parsing error: {str(e)}"
+    except Exception as e:
+        import traceback
+        return f"❌ Error generating summary: {str(e)}\n\nTraceback:\n{traceback.format_exc()}"
+
+
+def _format_summary(response):
+    """Render a session_summary_handler response as Markdown."""
+    try:
         print(f"📥 Response Status Code: {response['statusCode']}")
         
         if response["statusCode"] != 200:
@@ -232,11 +312,13 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
 
     def user_message(user_text, chat_history, session_state, client_profile_state):
         if not user_text.strip():
-            return user_text, chat_history, session_state
+            yield user_text, chat_history, session_state
+            return
         
-        response, new_session_state = chatbot_interface(user_text, session_state, client_profile_state)
-        chat_history.append(("👤 " + user_text, "🧑‍⚕️ " + response))
-        return "", chat_history, new_session_state
+        chat_history = chat_history + [("👤 " + user_text, "")]
+        for partial_response, new_session_state in chatbot_interface_stream(user_text, session_state, client_profile_state):
+            chat_history[-1] = ("👤 " + user_text, "🧑‍⚕️ " + partial_response)
+            yield "", chat_history, new_session_state
 
     def clear_chat():
         return [], None, "Click 'Generate Session Summary' to see the summary."
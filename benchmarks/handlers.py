@@ -0,0 +1,259 @@
+"""
+End-to-end latency of the three Lambda handlers on the offline stub backend.
+
+Scripted conversations are replayed through start_session_handler,
+process_turn_handler (one call per client message) and session_summary_handler
+against a StubModel and StubRetriever with injected latency. The report has
+p50/p95/p99 per handler and per pipeline stage (``utils.metrics``), LLM and
+retrieval calls per handler call, LLM tokens per handler call and per task
+(``utils.usage``), and throughput. Every run is written to a
+JSON file; ``--compare`` prints the change against an earlier one.
+
+    python -m benchmarks.handlers --repeat 5 --concurrency 4
+    python -m benchmarks.handlers --compare benchmarks/results/handlers-20250101-120000.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from config import Config
+from lambda_function import process_turn_handler, session_summary_handler, start_session_handler
+from utils.metrics import MetricsCollector, describe, set_metrics
+from utils.offline import use_bedrock, use_stub
+from utils.stub_model import LatencyProfile, StubModel, StubRetriever
+
+PROFILE: Dict[str, Any] = {
+    "age": 28,
+    "gender": "Female",
+    "mood": "Sad",
+    "diagnosis": "Generalized Anxiety Disorder (GAD)",
+    "history": "Experiencing workplace stress and anxiety about performance reviews",
+    "reason_for_counseling": "Managing work-related anxiety and perfectionism",
+    "goal": "Reduce anxiety and improve work performance",
+}
+
+# Each script: {"client_profile": {...}, "messages": [initial message, turn, turn, ...]}
+SCRIPTS: List[Dict[str, Any]] = [
+    {"client_profile": PROFILE, "messages": [
+        "I've been feeling really anxious about work lately.",
+        "My manager has a review with me next week and I can't stop thinking about it.",
+        "I keep imagining that I'll be told I'm not good enough.",
+        "Last time I got feedback I couldn't sleep for two nights.",
+        "I guess I'm scared that one mistake means I'll lose my job.",
+        "Maybe I could write down what actually happened at the last review.",
+    ]},
+    {"client_profile": PROFILE, "messages": [
+        "I don't know why I'm so tired all the time.",
+        "I stopped going to the gym and I barely see my friends.",
+        "What's the price of bitcoin today?",
+        "Sorry. I just feel like nothing I do matters.",
+        "Some days I think everyone would be better off if I wasn't here.",
+    ]},
+]
+
+HANDLERS = ("start_session", "process_turn", "session_summary")
+
+
+def run_conversation(script: Dict[str, Any], model: StubModel, retriever: StubRetriever,
+                     samples: Dict[str, List[Dict[str, float]]], lock: threading.Lock) -> int:
+    """
+    Replay one script; appends {ms, llm_calls, retrievals, input_tokens,
+    output_tokens, by_task} per handler call. Returns turns run.
+    """
+    profile, messages = script["client_profile"], script["messages"]
+
+    def call(name: str, handler: Callable[[Dict[str, Any], Any], Dict[str, Any]], body: Dict[str, Any]) -> Dict[str, Any]:
+        llm_before, kb_before = len(model.calls), len(retriever.calls)
+        start = time.perf_counter()
+        response = handler({"body": json.dumps({**body, "include_usage": True})}, None)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if response.get("statusCode") != 200:
+            raise RuntimeError(f"{name} returned {response.get('statusCode')}: {response.get('body', '')[:200]}")
+        result = json.loads(response["body"])
+        used = result.pop("usage")
+        with lock:
+            samples[name].append({
+                "ms": elapsed_ms,
+                "llm_calls": len(model.calls) - llm_before,
+                "retrievals": len(retriever.calls) - kb_before,
+                "input_tokens": used["total"]["input_tokens"],
+                "output_tokens": used["total"]["output_tokens"],
+                "by_task": used["by_task"],
+            })
+        return result
+
+    body = call("start_session", start_session_handler, {
+        "client_profile": profile, "initial_client_message": messages[0],
+    })
+    state = body["session_state"]
+    for message in messages[1:]:
+        body = call("process_turn", process_turn_handler, {
+            "session_state": state, "client_message": message, "client_profile": profile,
+        })
+        state = body["session_state"]
+    call("session_summary", session_summary_handler, {
+        "client_profile": profile,
+        "chat_history": [{"role": m["speaker"], "message": m["content"], "annotations": m.get("annotations", {})}
+                         for m in state["messages"]],
+        "rolling_summary": state.get("rolling_summary", ""),
+        "summary_checkpoint": state.get("summary_checkpoint", 0),
+    })
+    return len(messages)
+
+
+def run_benchmark(scripts: List[Dict[str, Any]], repeat: int, concurrency: int,
+                  llm_latency: LatencyProfile, retrieval_latency: LatencyProfile) -> Dict[str, Any]:
+    """Run every script ``repeat`` times and return the report dict."""
+    model = StubModel(latency=llm_latency)
+    retriever = StubRetriever(latency=retrieval_latency)
+    use_stub(model=model, retriever=retriever)
+    collector = MetricsCollector()
+    set_metrics(collector)
+    samples: Dict[str, List[Dict[str, float]]] = defaultdict(list)
+    lock = threading.Lock()
+    jobs = [script for _ in range(repeat) for script in scripts]
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            turns = sum(pool.map(lambda s: run_conversation(s, model, retriever, samples, lock), jobs))
+        wall_s = time.perf_counter() - start
+    finally:
+        set_metrics(None)
+        use_bedrock()
+
+    handlers = {}
+    for name in HANDLERS:
+        calls = samples.get(name, [])
+        handlers[name] = {
+            **describe([c["ms"] for c in calls]),
+            # Only exact when --concurrency is 1: concurrent calls share the stubs
+            "llm_calls": describe([c["llm_calls"] for c in calls]),
+            "retrievals": describe([c["retrievals"] for c in calls]),
+            # Exact at any concurrency (each call has its own usage ledger)
+            "input_tokens": describe([c["input_tokens"] for c in calls]),
+            "output_tokens": describe([c["output_tokens"] for c in calls]),
+        }
+    tasks: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for calls in samples.values():
+        for call in calls:
+            for task, used in call["by_task"].items():
+                for field, value in used.items():
+                    tasks[task][field] += value
+    return {
+        "meta": _meta(repeat, concurrency, llm_latency, retrieval_latency),
+        "conversations": len(jobs),
+        "turns": turns,
+        "wall_s": wall_s,
+        "throughput": {
+            "turns_per_s": turns / wall_s if wall_s else 0.0,
+            "conversations_per_s": len(jobs) / wall_s if wall_s else 0.0,
+        },
+        "handlers": handlers,
+        "tasks": {task: dict(totals) for task, totals in sorted(tasks.items())},
+        "stages": collector.summary(),
+        "counters": collector.counters(),
+    }
+
+
+def _meta(repeat: int, concurrency: int, llm_latency: LatencyProfile,
+          retrieval_latency: LatencyProfile) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "concurrency": concurrency,
+        "llm_latency": vars(llm_latency),
+        "retrieval_latency": vars(retrieval_latency),
+        "config": {
+            "SPECULATIVE_CRISIS_SCREENING": Config.SPECULATIVE_CRISIS_SCREENING,
+            "ANNOTATE_RELEVANCE": Config.ANNOTATE_RELEVANCE,
+            "ROLLING_SUMMARY_ENABLED": Config.ROLLING_SUMMARY_ENABLED,
+            "SUMMARY_MAX_WORKERS": Config.SUMMARY_MAX_WORKERS,
+        },
+    }
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> List[str]:
+    """Lines describing the p50/p95/p99 change per handler and stage."""
+    lines = []
+    for section in ("handlers", "stages"):
+        for name, stats in current[section].items():
+            old = previous.get(section, {}).get(name)
+            if not old:
+                continue
+            deltas = []
+            for q in ("p50", "p95", "p99"):
+                change = (stats[q] - old[q]) / old[q] * 100 if old[q] else 0.0
+                deltas.append(f"{q} {old[q]:.1f} -> {stats[q]:.1f}ms ({change:+.1f}%)")
+            lines.append(f"{section[:-1]} {name:<34} " + ", ".join(deltas))
+    return lines
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['conversations']} conversations, {report['turns']} turns in {report['wall_s']:.2f}s "
+          f"({report['throughput']['turns_per_s']:.2f} turns/s)")
+    print(f"\n{'handler':<18} {'p50':>9} {'p95':>9} {'p99':>9} {'llm/call':>9} {'kb/call':>8} {'tok in':>8} {'tok out':>8}")
+    for name, stats in report["handlers"].items():
+        print(f"{name:<18} {stats['p50']:>7.1f}ms {stats['p95']:>7.1f}ms {stats['p99']:>7.1f}ms "
+              f"{stats['llm_calls']['mean']:>9.2f} {stats['retrievals']['mean']:>8.2f} "
+              f"{stats['input_tokens']['mean']:>8.0f} {stats['output_tokens']['mean']:>8.0f}")
+    print(f"\n{'task':<24} {'calls':>6} {'skipped':>8} {'tok in':>9} {'tok out':>9} {'llm ms':>10}")
+    for task, used in report["tasks"].items():
+        print(f"{task:<24} {used['calls']:>6.0f} {used['skipped']:>8.0f} {used['input_tokens']:>9.0f} "
+              f"{used['output_tokens']:>9.0f} {used['latency_ms']:>10.1f}")
+    print(f"\n{'stage':<36} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, stats in report["stages"].items():
+        print(f"{name:<36} {stats['count']:>6} {stats['p50']:>7.1f}ms {stats['p95']:>7.1f}ms {stats['p99']:>7.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scripts", help="JSON file with a list of {client_profile, messages} scripts")
+    parser.add_argument("--repeat", type=int, default=3, help="times each script is replayed")
+    parser.add_argument("--concurrency", type=int, default=1, help="conversations run at once")
+    parser.add_argument("--llm", choices=("bedrock", "instant"), default="bedrock",
+                        help="stub LLM latency profile (bedrock: ~0.7s first token, 20ms/token)")
+    parser.add_argument("--retrieval-ms", type=float, default=150.0, help="mean stub retrieval latency")
+    parser.add_argument("--out", help="result file (default benchmarks/results/handlers-<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    scripts = SCRIPTS
+    if args.scripts:
+        with open(args.scripts, encoding="utf-8") as f:
+            scripts = json.load(f)
+    llm_latency = LatencyProfile.bedrock_like() if args.llm == "bedrock" else LatencyProfile.instant()
+    retrieval_latency = LatencyProfile(first_token_ms=args.retrieval_ms, distribution="lognormal", spread=0.3)
+
+    report = run_benchmark(scripts, args.repeat, max(1, args.concurrency), llm_latency, retrieval_latency)
+    _print_report(report)
+
+    out = args.out or os.path.join("benchmarks", "results", f"handlers-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        print()
+        for line in compare(report, previous):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Import-time (cold start) budget for the Lambda entry point.
+
+Imports ``lambda_function`` in fresh interpreters with ``-X importtime`` and
+reports the cumulative time per module, grouped by top-level package. The run
+fails (exit code 1) when the median total exceeds ``--budget-ms`` or when a
+module that should load lazily was imported eagerly.
+
+    python -m benchmarks.import_time --runs 5 --budget-ms 2500
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, NamedTuple
+
+# Modules the handlers must not import at cold start (loaded on demand)
+LAZY_MODULES = (
+    "agents.orchestrator",
+    "agents.cbt_planner",
+    "agents.initial_agent",
+    "agents.specialized.reflection",
+    "agents.specialized.questioning",
+    "agents.specialized.solution",
+    "agents.specialized.normalizing",
+    "agents.specialized.psychoeducation",
+)
+
+DEFAULT_BUDGET_MS = 2500.0
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class ImportEntry(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportEntry]:
+    """Parse ``-X importtime`` output (the header and other lines are skipped)."""
+    entries = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append(ImportEntry(module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def total_ms(entries: List[ImportEntry]) -> float:
+    """Wall time of the whole import: the sum over top-level imports."""
+    return sum(e.cumulative_us for e in entries if e.depth == 0) / 1000
+
+
+def by_package(entries: List[ImportEntry]) -> Dict[str, float]:
+    """Self time per top-level package in ms (sums to ``total_ms``)."""
+    totals: Dict[str, float] = defaultdict(float)
+    for entry in entries:
+        totals[entry.module.split(".")[0]] += entry.self_us / 1000
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def measure(module: str) -> List[ImportEntry]:
+    """Import ``module`` in a fresh interpreter and return its import-time entries."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "CBT_WARMUP_ON_INIT": "0"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="lambda_function")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure (median is used)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    measure(args.module)  # writes .pyc files so compilation is not measured
+    runs = [measure(args.module) for _ in range(max(1, args.runs))]
+    totals = [total_ms(entries) for entries in runs]
+    median = statistics.median(totals)
+    typical = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    eager = sorted({e.module for e in typical} & set(LAZY_MODULES))
+
+    report = {
+        "module": args.module,
+        "total_ms": {"median": round(median, 1), "min": round(min(totals), 1), "max": round(max(totals), 1)},
+        "budget_ms": args.budget_ms,
+        "packages_ms": {k: round(v, 1) for k, v in list(by_package(typical).items())[:args.top]},
+        "eager_lazy_modules": eager,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {args.module}: median {median:.1f}ms "
+              f"(min {min(totals):.1f}, max {max(totals):.1f}) over {len(totals)} runs, budget {args.budget_ms:.0f}ms")
+        for package, ms in report["packages_ms"].items():
+            print(f"  {package:<30} {ms:8.1f}ms")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"import time {median:.1f}ms exceeds the {args.budget_ms:.0f}ms budget")
+    if eager:
+        failures.append(f"modules meant to load lazily were imported: {', '.join(eager)}")
+    for failure in failures:
+        print(f"[ERROR] {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
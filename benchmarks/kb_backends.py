@@ -0,0 +1,167 @@
+"""
+Compare the knowledge base backends on the crisis screening lookup, and
+write the dense index snapshot.
+
+``report`` sends two sets of client messages through each backend with the
+CrisisHandlerAgent filter (intervention_type "crisis"):
+
+- crisis: the client input of every crisis scenario in agent.json, with
+  its own example excluded by a ``notEquals`` filter on its flag, so the
+  lookup has to find a neighbouring scenario rather than itself;
+- counseling: the example inputs of the other agent.json entries.
+
+- known crisis: the same inputs with their own example left in, i.e. a
+  client phrasing a crisis the way agent.json does.
+
+Per backend it prints lookup latency, score percentiles of the sets and
+what the backend's Config.KB_SCORE_THRESHOLDS do with them: crises at or
+below crisis_possible are missed (none when it is 0), scores up to
+crisis_likely get the LLM check and higher ones the direct crisis
+response. The suggested crisis_possible is the 5th percentile of the
+held-out crisis scores and the suggested crisis_likely the 99th percentile
+of the counseling scores; the top counseling inputs include disclosures
+such as "I'm scared to go home", so a few of them above crisis_likely is
+expected. The local scales only take the suggested crisis_likely ("dense";
+"bm25" cannot be calibrated this way, its counseling p99 is 1.0): crises
+worded unlike agent.json score below everyday messages on both, so their
+crisis_possible stays 0 and every message gets the LLM check. The labelled
+sets are small: re-run the report after editing agent.json or changing the
+encoder.
+
+``snapshot`` encodes the passages with the current encoder and writes
+Config.DENSE_INDEX_PATH (run it after editing agent.json).
+
+    python -m benchmarks.kb_backends snapshot
+    python -m benchmarks.kb_backends report --backends bm25 dense
+"""
+import argparse
+import json
+import math
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from config import Config
+from utils.bm25_index import passages_from_entries
+from utils.metrics import describe
+from utils.rag_lexicon import concept_entries, example_inputs, load_entries
+
+CRISIS = {"equals": {"key": "intervention_type", "value": "crisis"}}
+
+
+def crisis_messages(entries: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """(client input, flag of the scenario it comes from) for every crisis example."""
+    messages = []
+    for passage in passages_from_entries(entries):
+        if passage.metadata["intervention_type"] == "crisis":
+            messages.extend((text, passage.metadata["flag"]) for text in example_inputs({"content": passage.text}))
+    return messages
+
+
+def counseling_messages(entries: List[Dict[str, Any]]) -> List[str]:
+    return list(dict.fromkeys(text for _, entry in concept_entries(entries) for text in example_inputs(entry)))
+
+
+def _retriever(name: str) -> Callable[..., List[Dict[str, Any]]]:
+    if name == "bm25":
+        from utils.bm25_index import get_bm25_index
+        return get_bm25_index()
+    if name == "dense":
+        from utils.dense_index import get_dense_index
+        return get_dense_index()
+    from utils.knowledge_base import bedrock_retrieve
+    return bedrock_retrieve
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def report(name: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    retriever = _retriever(name)
+    scale = getattr(retriever, "score_scale", "bedrock")
+    thresholds = Config.KB_SCORE_THRESHOLDS.get(scale, Config.KB_SCORE_THRESHOLDS["bedrock"])
+    latencies_us: List[float] = []
+
+    def best_score(text: str, metadata_filter: Dict[str, Any]) -> float:
+        start = time.perf_counter()
+        results = retriever(text, 1, metadata_filter)
+        latencies_us.append((time.perf_counter() - start) * 1e6)
+        return results[0]["score"] if results else 0.0
+
+    crisis = [
+        best_score(text, {"andAll": [CRISIS, {"notEquals": {"key": "flag", "value": flag}}]})
+        for text, flag in crisis_messages(entries)
+    ]
+    known = [best_score(text, CRISIS) for text, _ in crisis_messages(entries)]
+    counseling = [best_score(text, CRISIS) for text in counseling_messages(entries)]
+
+    def ignored(score: float) -> bool:
+        # As in CrisisHandlerAgent: a crisis_possible of 0 ignores nothing
+        return 0 < thresholds["crisis_possible"] and score <= thresholds["crisis_possible"]
+
+    def bands(scores: List[float]) -> Dict[str, float]:
+        count = len(scores) or 1
+        return {
+            "ignored": sum(ignored(s) for s in scores) / count,
+            "llm_check": sum(not ignored(s) and s <= thresholds["crisis_likely"] for s in scores) / count,
+            "crisis_response": sum(s > thresholds["crisis_likely"] for s in scores) / count,
+        }
+
+    return {
+        "score_scale": scale,
+        "thresholds": thresholds,
+        "latency_us": describe(latencies_us),
+        "crisis": {"messages": len(crisis), "p5": _percentile(crisis, 0.05), "p50": _percentile(crisis, 0.5),
+                   **bands(crisis)},
+        "known_crisis": {"messages": len(known), "p5": _percentile(known, 0.05), "p50": _percentile(known, 0.5),
+                         **bands(known)},
+        "counseling": {"messages": len(counseling), "p50": _percentile(counseling, 0.5),
+                       "p95": _percentile(counseling, 0.95), "p99": _percentile(counseling, 0.99),
+                       **bands(counseling)},
+        "suggested_crisis_possible": math.floor(_percentile(crisis, 0.05) * 100) / 100,
+        "suggested_crisis_likely": math.ceil(_percentile(counseling, 0.99) * 100) / 100,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot = commands.add_parser("snapshot", help="encode the passages and write the dense index snapshot")
+    snapshot.add_argument("--out", default=Config.DENSE_INDEX_PATH)
+    compare = commands.add_parser("report", help="crisis lookup scores and latency per backend")
+    compare.add_argument("--backends", nargs="*", choices=("bm25", "dense", "bedrock"), default=["bm25", "dense"])
+    compare.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--kb", default=Config.AGENT_KB_PATH, help="agent.json to index")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        from utils.dense_index import write_snapshot
+
+        index = write_snapshot(args.kb, args.out)
+        print(f"wrote {args.out}: {index.vectors.shape[0]} passages x {index.vectors.shape[1]} int8 "
+              f"({index.encoder.name})")
+        return
+
+    entries = load_entries(args.kb)
+    result = {name: report(name, entries) for name in args.backends}
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for name, stats in result.items():
+        thresholds = stats["thresholds"]
+        print(f"{name} (scale {stats['score_scale']}, crisis_possible {thresholds['crisis_possible']}, "
+              f"crisis_likely {thresholds['crisis_likely']}): lookup p50 {stats['latency_us']['p50']:.0f}us, "
+              f"p99 {stats['latency_us']['p99']:.0f}us")
+        for group in ("crisis", "known_crisis", "counseling"):
+            g = stats[group]
+            spread = (f"p50 {g['p50']:.3f} p99 {g['p99']:.3f}" if group == "counseling"
+                      else f"p5 {g['p5']:.3f} p50 {g['p50']:.3f}")
+            print(f"  {group:<12} {g['messages']:>4} msgs  {spread}  ignored {g['ignored']:.1%}  "
+                  f"llm check {g['llm_check']:.1%}  crisis response {g['crisis_response']:.1%}")
+        print(f"  suggested crisis_possible: {stats['suggested_crisis_possible']}, "
+              f"crisis_likely: {stats['suggested_crisis_likely']}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Per-turn construction overhead, before and after the shared model registry.
+
+A process_turn_handler turn used to build, on every call: a BedrockModel and a
+boto3 ``bedrock-agent-runtime`` client for the crisis check, a BedrockModel for
+the TechniqueSelectorAgent, and two BedrockModels inside the specialized agent.
+This script rebuilds exactly that set ("fresh") and compares it with the
+objects handed out by ``utils.model_registry`` ("pooled"). No model is invoked,
+so no network access or credentials are needed.
+
+    python -m benchmarks.model_construction --turns 50
+"""
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import boto3
+from strands import Agent
+from strands.models import BedrockModel
+
+from config import Config
+from utils import model_registry
+
+
+def _fresh_turn() -> None:
+    def model():
+        return BedrockModel(model_id=Config.DEFAULT_MODEL, region_name=Config.AWS_REGION, streaming=False)
+
+    boto3.client("bedrock-agent-runtime", region_name=Config.AWS_REGION)
+    crisis_model = model()
+    selector_model = model()
+    Agent(system_prompt="selector", tools=[], model=selector_model)
+    Agent(system_prompt="query", tools=[], model=model())
+    Agent(system_prompt="answer", tools=[], model=model())
+    del crisis_model
+
+
+def _pooled_turn() -> None:
+    model_registry.get_client("bedrock-agent-runtime")
+    model_registry.get_model()
+    Agent(system_prompt="selector", tools=[], model=model_registry.get_model())
+    Agent(system_prompt="query", tools=[], model=model_registry.get_model())
+    Agent(system_prompt="answer", tools=[], model=model_registry.get_model())
+
+
+def _time(fn: Callable[[], None], turns: int) -> List[float]:
+    samples = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples: List[float]) -> None:
+    print(
+        f"{label:<8} first={samples[0]:8.2f}ms  "
+        f"median={statistics.median(samples):8.2f}ms  "
+        f"mean={statistics.fmean(samples):8.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    model_registry.clear_registry()
+    _report("fresh", _time(_fresh_turn, args.turns))
+    _report("pooled", _time(_pooled_turn, args.turns))
+    print(f"pooled instances: {model_registry.registry_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Static vs dynamic token share of every prompt template, and the prefix-cache
+savings of an offline session.
+
+Each template returning ``PromptParts`` is built from a sample client profile,
+transcript and knowledge base passage; the report shows how many (estimated)
+tokens sit in the cacheable static prefix. A session is then run against the
+stub backend, which simulates provider prompt caching, to show how much of the
+prompt input was served from the cache.
+
+    python -m benchmarks.prompt_cache_report --turns 8
+"""
+import argparse
+import json
+from typing import Any, Callable, Dict, List, Tuple
+
+from config import Config
+from utils.prompts import PromptParts, PromptTemplates
+from utils.tokens import estimate_tokens
+
+PROFILE: Dict[str, Any] = {
+    "age": 28,
+    "gender": "Female",
+    "mood": "Sad",
+    "diagnosis": "Generalized Anxiety Disorder (GAD)",
+    "history": "Experiencing workplace stress and anxiety about performance reviews",
+    "reason_for_counseling": "Managing work-related anxiety and perfectionism",
+    "goal": "Reduce anxiety and improve work performance",
+}
+
+CLIENT_MESSAGES = [
+    "I've been feeling really anxious about work lately.",
+    "My manager has a review with me next week and I can't stop thinking about it.",
+    "I keep imagining that I'll be told I'm not good enough.",
+    "Last time I got feedback I couldn't sleep for two nights.",
+    "I guess I'm scared that one mistake means I'll lose my job.",
+    "Maybe I could write down what actually happened at the last review.",
+    "I'll try the breathing exercise before the meeting.",
+    "Thanks, that actually helps a bit.",
+]
+
+CLIENT_INFO = "Age: 28, Gender: Female, Diagnosis: Generalized Anxiety Disorder (GAD)"
+KB_TEXT = ("Notice the thought, name the feeling, and gently check the evidence for and "
+           "against it before choosing a helpful response.")
+
+
+def _transcript() -> str:
+    lines = []
+    for message in CLIENT_MESSAGES:
+        lines.append(f"Client: {message}")
+        lines.append("Counselor: That sounds really tough. What goes through your mind when that happens?")
+    return "\n".join(lines)
+
+
+def _templates() -> List[Tuple[str, Callable[[], str]]]:
+    history = _transcript()
+    techniques = "\n".join(f"- {t}" for t in Config.THERAPY_AGENTS)
+    candidates = {"reflection": "It sounds like the review feels like a verdict on you.",
+                  "questioning": "What evidence do you have that one mistake would cost you your job?"}
+    return [
+        ("crisis_handler_prompt", PromptTemplates.crisis_handler_prompt),
+        ("crisis_detect", PromptTemplates.crisis_detect),
+        ("relevance_check_prompt", PromptTemplates.relevance_check_prompt),
+        ("relevance_batch_prompt", PromptTemplates.relevance_batch_prompt),
+        ("intent_extraction_prompt", lambda: PromptTemplates.intent_extraction_prompt(CLIENT_MESSAGES[4], KB_TEXT)),
+        ("rag_cbt_concept_prompt", lambda: PromptTemplates.rag_cbt_concept_prompt(CLIENT_MESSAGES[4])),
+        ("reflection_prompt", lambda: PromptTemplates.reflection_prompt(CLIENT_INFO, PROFILE["reason_for_counseling"], history, KB_TEXT)),
+        ("questioning_prompt", lambda: PromptTemplates.questioning_prompt(CLIENT_INFO, PROFILE["reason_for_counseling"], history, KB_TEXT)),
+        ("solution_prompt", lambda: PromptTemplates.solution_prompt(CLIENT_INFO, PROFILE["reason_for_counseling"], history, KB_TEXT)),
+        ("normalizing_prompt", lambda: PromptTemplates.normalizing_prompt(CLIENT_INFO, PROFILE["reason_for_counseling"], history, KB_TEXT)),
+        ("psychoeducation_prompt", lambda: PromptTemplates.psychoeducation_prompt(CLIENT_INFO, PROFILE["reason_for_counseling"], history, KB_TEXT)),
+        ("cbt_planning_prompt", lambda: PromptTemplates.cbt_planning_prompt(techniques, CLIENT_INFO, PROFILE["reason_for_counseling"], CLIENT_MESSAGES[0])),
+        ("technique_selection_prompt", lambda: PromptTemplates.technique_selection_prompt(history, techniques)),
+        ("agenda_setting_prompt", lambda: PromptTemplates.agenda_setting_prompt(CLIENT_INFO, PROFILE["goal"], "None", PROFILE["diagnosis"], CLIENT_MESSAGES[0])),
+        ("candidates_synthesis_prompt", lambda: PromptTemplates.candidates_synthesis_prompt(candidates, ["Reflection"])),
+        ("synthesis_prompt", lambda: PromptTemplates.synthesis_prompt("reflection_agent", candidates["reflection"], ["Reflection"])),
+        ("session_summary_prompt", lambda: PromptTemplates.session_summary_prompt(PROFILE, history)),
+        ("rolling_summary_prompt", lambda: PromptTemplates.rolling_summary_prompt("", history)),
+        ("session_summary_update_prompt", lambda: PromptTemplates.session_summary_update_prompt(PROFILE, "The client discussed review anxiety.", history)),
+        ("technique_selection_for_all_sessions_prompt", lambda: PromptTemplates.technique_selection_for_all_sessions_prompt(history, Config.CBT_SUB_TECHNIQUES)),
+        ("crisis_flag_prompt", lambda: PromptTemplates.crisis_flag_prompt(CLIENT_MESSAGES[4])),
+        ("session_ratings_prompt", lambda: PromptTemplates.session_ratings_prompt(history)),
+        ("agenda_topic_prompt", lambda: PromptTemplates.agenda_topic_prompt(PROFILE, history)),
+    ]
+
+
+def template_report() -> List[Dict[str, Any]]:
+    """One row per template: static and dynamic token estimates."""
+    rows = []
+    for name, build in _templates():
+        prompt = build()
+        static, dynamic = (prompt.static, prompt.dynamic) if isinstance(prompt, PromptParts) else ("", prompt)
+        static_tokens, dynamic_tokens = estimate_tokens(static), estimate_tokens(dynamic)
+        total = static_tokens + dynamic_tokens
+        rows.append({
+            "template": name,
+            "static_tokens": static_tokens,
+            "dynamic_tokens": dynamic_tokens,
+            "static_share": round(static_tokens / total, 3) if total else 0.0,
+        })
+    return rows
+
+
+def session_report(turns: int) -> Dict[str, Any]:
+    """Run ``turns`` turns on the stub backend and return its prefix-cache totals."""
+    from lambda_function import process_turn_handler, start_session_handler
+    from utils.offline import use_bedrock, use_stub
+
+    model, _ = use_stub()
+    try:
+        start = json.loads(start_session_handler({"body": json.dumps({
+            "client_profile": PROFILE,
+            "initial_client_message": CLIENT_MESSAGES[0],
+        })}, None)["body"])
+        state = start["session_state"]
+        for i in range(1, turns):
+            body = json.loads(process_turn_handler({"body": json.dumps({
+                "session_state": state,
+                "client_message": CLIENT_MESSAGES[i % len(CLIENT_MESSAGES)],
+                "client_profile": PROFILE,
+            })}, None)["body"])
+            state = body["session_state"]
+        stats = model.prefix_cache_stats()
+    finally:
+        use_bedrock()
+
+    prompt_tokens = stats["input_tokens"] + stats["cache_read_tokens"] + stats["cache_write_tokens"]
+    stats["cached_share"] = round(stats["cache_read_tokens"] / prompt_tokens, 3) if prompt_tokens else 0.0
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=8, help="turns in the offline session (0 skips it)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    rows = template_report()
+    session = session_report(args.turns) if args.turns > 0 else None
+    if args.json:
+        print(json.dumps({"templates": rows, "session": session}, indent=2))
+        return
+
+    print(f"{'template':<45} {'static':>7} {'dynamic':>8} {'static%':>8}")
+    for row in rows:
+        print(f"{row['template']:<45} {row['static_tokens']:>7} {row['dynamic_tokens']:>8} "
+              f"{row['static_share'] * 100:>7.1f}%")
+    if session:
+        print(f"\noffline session ({args.turns} turns): {session['requests']} requests, "
+              f"{session['cache_hits']} prefix-cache hits, "
+              f"{session['cache_read_tokens']} of "
+              f"{session['input_tokens'] + session['cache_read_tokens'] + session['cache_write_tokens']} "
+              f"prompt tokens read from cache ({session['cached_share'] * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
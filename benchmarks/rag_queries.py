@@ -0,0 +1,148 @@
+"""
+Compare the two ways specialized agents derive knowledge base queries.
+
+"llm" asks the model for CBT concept queries (rag_cbt_concept_prompt, one
+extra model call per turn); "local" matches the client turn against the
+agent.json concept lexicon (utils/rag_lexicon.py) with no model call.
+
+The messages are the example client inputs in agent.json, each labelled with
+the intent it illustrates. The local lexicon is rebuilt without the message
+being scored (leave-one-out), so it cannot simply look the example up. The
+"behavioural activation" and "socratic questioning" entries cover hundreds of
+unrelated inputs, so their labels are rarely recoverable from the text. Per
+mode the report has query-derivation and retrieval latency, model calls per
+message, the share of queries with a passage above the "relevant" score
+threshold (Config.KB_SCORE_THRESHOLDS), the mean best passage score and the
+share of messages for which a retrieved passage belongs to the labelled
+intent. "local" also reports how often the labelled intent is among the
+chosen concepts.
+
+Retrieval and the LLM run on the current backends (CBT_BACKEND,
+CBT_KB_BACKEND). On the stub backend every query gets the same generic
+passage, so only latency and the concept hits are meaningful there; use
+bedrock or a recorded cassette for hit quality. A local knowledge base
+(CBT_KB_BACKEND=bm25) indexes the example inputs themselves, so its intent
+hits are an upper bound.
+
+    python -m benchmarks.rag_queries
+    CBT_BACKEND=bedrock python -m benchmarks.rag_queries --limit 40 --json
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+from agents.specialized.common import generate_kb_queries
+from config import Config
+from utils import usage
+from utils.knowledge_base import retrieve_batch, score_threshold
+from utils.metrics import describe
+from utils.offline import configure_backend
+from utils.rag_lexicon import ConceptLexicon, concept_entries, example_inputs, load_entries
+from utils.response_cache import ResponseCache, set_response_cache
+
+MODES = ("llm", "local")
+
+# (client message, intent name)
+Labelled = Tuple[str, str]
+
+
+def labelled_messages(entries: List[Dict[str, Any]]) -> List[Labelled]:
+    """
+    Every distinct example client input in agent.json with the concept it
+    illustrates (the first one, for inputs listed under several concepts).
+    """
+    labelled: Dict[str, str] = {}
+    for name, entry in concept_entries(entries):
+        for text in example_inputs(entry):
+            labelled.setdefault(text, name)
+    return list(labelled.items())
+
+
+def _passage_intent(result: Dict[str, Any]) -> str:
+    return f"{result.get('text', '')} {json.dumps(result.get('metadata', {}))}".lower().replace("_", " ")
+
+
+def run_mode(mode: str, entries: List[Dict[str, Any]], messages: List[Labelled]) -> Dict[str, Any]:
+    query_ms, retrieval_ms, best_scores = [], [], []
+    min_score = score_threshold("relevant")
+    queries_total = hits = intent_hits = concept_hits = 0
+    Config.RAG_QUERY_MODE = mode
+    with usage.open_ledger("rag_queries") as ledger:
+        for message, intent in messages:
+            start = time.perf_counter()
+            if mode == "local":
+                lexicon = ConceptLexicon.from_entries(entries, exclude_inputs={message})
+                start = time.perf_counter()
+                queries = lexicon.queries(message)
+                chosen = [concept.name for _, concept in lexicon.score(message)[:Config.RAG_LOCAL_CONCEPTS]]
+                concept_hits += intent in chosen
+            else:
+                queries = generate_kb_queries(message)
+            query_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            results = retrieve_batch(queries, number_of_results=1)
+            retrieval_ms.append((time.perf_counter() - start) * 1000)
+
+            queries_total += len(queries)
+            hits += sum(len(r["queries"]) for r in results if r.get("score", 0.0) >= min_score)
+            best_scores.append(max((r.get("score", 0.0) for r in results), default=0.0))
+            intent_hits += any(intent in _passage_intent(r) for r in results if r.get("score", 0.0) >= min_score)
+
+    count = len(messages) or 1
+    report = {
+        "messages": len(messages),
+        "query_ms": describe(query_ms),
+        "retrieval_ms": describe(retrieval_ms),
+        "llm_calls_per_message": ledger.totals().calls / count,
+        "queries_per_message": queries_total / count,
+        "hit_rate": hits / queries_total if queries_total else 0.0,
+        "mean_best_score": sum(best_scores) / count,
+        "intent_hit_rate": intent_hits / count,
+    }
+    if mode == "local":
+        report["concept_hit_rate"] = concept_hits / count
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", default=Config.AGENT_KB_PATH, help="agent.json to take concepts and messages from")
+    parser.add_argument("--limit", type=int, default=0, help="score only the first N messages")
+    parser.add_argument("--modes", nargs="*", choices=MODES, default=list(MODES))
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    configure_backend()
+    # An empty in-memory cache, so every "llm" message pays for its query call
+    set_response_cache(ResponseCache())
+    entries = load_entries(args.kb)
+    messages = labelled_messages(entries)
+    if args.limit:
+        messages = messages[:args.limit]
+    if not messages:
+        parser.error(f"no example client inputs in {args.kb}")
+
+    configured = Config.RAG_QUERY_MODE
+    try:
+        result = {mode: run_mode(mode, entries, messages) for mode in args.modes}
+    finally:
+        Config.RAG_QUERY_MODE = configured
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{len(messages)} labelled client messages, backend {Config.BACKEND}\n")
+    print(f"{'mode':<6} {'query p50':>10} {'query p99':>10} {'retr p50':>9} {'llm/msg':>8} "
+          f"{'q/msg':>6} {'hit':>6} {'best':>6} {'intent':>7} {'concept':>8}")
+    for mode, report in result.items():
+        concept = f"{report['concept_hit_rate']:.1%}" if "concept_hit_rate" in report else "-"
+        print(f"{mode:<6} {report['query_ms']['p50']:>8.2f}ms {report['query_ms']['p99']:>8.2f}ms "
+              f"{report['retrieval_ms']['p50']:>7.1f}ms {report['llm_calls_per_message']:>8.2f} "
+              f"{report['queries_per_message']:>6.2f} {report['hit_rate']:>6.1%} {report['mean_best_score']:>6.3f} "
+              f"{report['intent_hit_rate']:>7.1%} {concept:>8}")
+
+
+if __name__ == "__main__":
+    main()
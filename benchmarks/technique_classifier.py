@@ -0,0 +1,189 @@
+"""
+Train the local technique classifier and compare it with the LLM selector.
+
+Training data are logged ``(history, technique)`` pairs, read from any mix of:
+session states saved as JSON (``session_state`` dicts, session-store records
+or lists of either), a SQLite session store, and cassettes recorded with
+CBT_BACKEND=record (every technique-selection call is one example, labelled
+with the LLM's choice). Selections the classifier made itself are skipped.
+
+``report`` scores a trained model on such examples: agreement with the
+logged LLM choice, the share of turns it would answer locally at each
+confidence threshold, and prediction latency. ``--live N`` also runs the LLM
+selector on the current backend (CBT_BACKEND) for N examples and times it.
+
+    python -m benchmarks.technique_classifier train --sessions logs/*.json --out technique_classifier.json
+    python -m benchmarks.technique_classifier report --model technique_classifier.json --db /tmp/cbt_sessions.sqlite3
+"""
+import argparse
+import json
+import os
+import random
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+from config import Config
+from models.outputs import TechniqueSelection
+from utils.metrics import describe
+from utils.session_store import SQLiteSessionStore
+from utils.structured import parse
+from utils.technique_classifier import Example, TechniqueClassifier, collect_examples
+
+_DIALOGUE = "Counseling Dialogue: "
+THRESHOLDS = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+
+
+def _session_states(data: Any) -> Iterator[Dict[str, Any]]:
+    if isinstance(data, list):
+        for item in data:
+            yield from _session_states(item)
+    elif isinstance(data, dict):
+        yield data.get("session_state", data)
+
+
+def cassette_examples(path: str) -> List[Example]:
+    """One example per recorded technique-selection call (history from the prompt, label from the reply)."""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f).get("llm", [])
+    examples = []
+    for entry in entries:
+        system_prompt = entry["request"].get("system_prompt", "")
+        if "selecting psychological techniques" not in system_prompt or _DIALOGUE not in system_prompt:
+            continue
+        try:
+            selection = parse(TechniqueSelection, entry["response"])
+        except ValueError:
+            continue
+        history = system_prompt.rsplit(_DIALOGUE, 1)[1].strip()
+        best = max(selection.techniques, key=lambda t: t.score)
+        examples.append((history, best.technique))
+    return examples
+
+
+def load_examples(args: argparse.Namespace) -> List[Example]:
+    examples: List[Example] = []
+    for path in args.sessions or []:
+        with open(path, encoding="utf-8") as f:
+            examples.extend(collect_examples(_session_states(json.load(f))))
+    if args.db:
+        if not os.path.exists(args.db):
+            raise SystemExit(f"no session store at {args.db}")
+        store = SQLiteSessionStore(args.db, ttl_seconds=float("inf"))
+        examples.extend(collect_examples(record["session_state"] for record in store.records()))
+    for path in args.cassette or []:
+        examples.extend(cassette_examples(path))
+    return examples
+
+
+def split(examples: List[Example], holdout: float, seed: int = 0) -> Tuple[List[Example], List[Example]]:
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    cut = int(len(shuffled) * (1 - holdout))
+    return shuffled[:cut], shuffled[cut:]
+
+
+def evaluate(classifier: TechniqueClassifier, examples: List[Example]) -> Dict[str, Any]:
+    """Agreement with the logged choices, coverage per threshold and prediction latency."""
+    predictions, latencies_us = [], []
+    for history, label in examples:
+        start = time.perf_counter()
+        technique, confidence = classifier.predict(history)
+        latencies_us.append((time.perf_counter() - start) * 1e6)
+        predictions.append((technique == label, confidence))
+
+    thresholds = {}
+    for threshold in THRESHOLDS:
+        covered = [agree for agree, confidence in predictions if confidence >= threshold]
+        thresholds[f"{threshold:.1f}"] = {
+            "coverage": len(covered) / len(predictions) if predictions else 0.0,
+            "agreement": sum(covered) / len(covered) if covered else 0.0,
+        }
+    return {
+        "examples": len(examples),
+        "agreement": sum(agree for agree, _ in predictions) / len(predictions) if predictions else 0.0,
+        "thresholds": thresholds,
+        "latency_us": describe(latencies_us),
+    }
+
+
+def live_comparison(classifier: TechniqueClassifier, examples: List[Example], n: int) -> Dict[str, Any]:
+    """Run the LLM selector on ``n`` examples and time it against the classifier."""
+    from agents.technique_selector import TechniqueSelectorAgent
+    from utils.offline import configure_backend
+
+    configure_backend()
+    selector = TechniqueSelectorAgent()
+    agree, latencies_ms = 0, []
+    for history, _ in examples[:n]:
+        start = time.perf_counter()
+        best = max(selector.select_techniques(history), key=lambda t: t["score"])
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+        agree += classifier.predict(history)[0] == best["technique"]
+    count = len(latencies_ms)
+    return {"examples": count, "agreement": agree / count if count else 0.0, "llm_latency_ms": describe(latencies_ms)}
+
+
+def _print_evaluation(report: Dict[str, Any]) -> None:
+    print(f"{report['examples']} examples, agreement with the LLM choice {report['agreement']:.1%}")
+    latency = report["latency_us"]
+    print(f"classifier latency p50 {latency['p50']:.1f}us, p99 {latency['p99']:.1f}us")
+    print(f"\n{'threshold':>9} {'coverage':>9} {'agreement':>10}")
+    for threshold, stats in report["thresholds"].items():
+        marker = "  <- Config.TECHNIQUE_CLASSIFIER_THRESHOLD" if float(threshold) == Config.TECHNIQUE_CLASSIFIER_THRESHOLD else ""
+        print(f"{threshold:>9} {stats['coverage']:>8.1%} {stats['agreement']:>9.1%}{marker}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="fit a classifier on logged selections")
+    report = commands.add_parser("report", help="agreement/latency of a trained classifier")
+    for command in (train, report):
+        command.add_argument("--sessions", nargs="*", help="JSON files with session states")
+        command.add_argument("--db", help="SQLite session store (Config.SESSION_STORE_DB)")
+        command.add_argument("--cassette", nargs="*", help="cassettes recorded with CBT_BACKEND=record")
+        command.add_argument("--json", action="store_true", help="print the report as JSON")
+    train.add_argument("--out", required=True, help="where to write the model (Config.TECHNIQUE_CLASSIFIER_PATH)")
+    train.add_argument("--dim", type=int, default=4096, help="hashed feature dimensions")
+    train.add_argument("--epochs", type=int, default=15)
+    train.add_argument("--holdout", type=float, default=0.2, help="share of examples kept for evaluation")
+    report.add_argument("--model", default=Config.TECHNIQUE_CLASSIFIER_PATH, required=not Config.TECHNIQUE_CLASSIFIER_PATH)
+    report.add_argument("--live", type=int, default=0, help="also run the LLM selector on this many examples")
+    args = parser.parse_args()
+
+    examples = load_examples(args)
+    if not examples:
+        parser.error("no labelled technique selections found in the given sources")
+
+    if args.command == "train":
+        result: Dict[str, Any] = {"trained_on": len(examples), "holdout": None}
+        fit_on, held_out = split(examples, args.holdout) if args.holdout > 0 else (examples, [])
+        if held_out:
+            # Scored on a model that has not seen the holdout; the saved one uses every example
+            result["holdout"] = evaluate(TechniqueClassifier(dim=args.dim).fit(fit_on, epochs=args.epochs), held_out)
+        TechniqueClassifier(dim=args.dim).fit(examples, epochs=args.epochs).save(args.out)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print(f"trained on {len(examples)} examples, wrote {args.out}")
+            if held_out:
+                print(f"\nholdout ({len(held_out)} examples, model fit on the other {len(fit_on)}):")
+                _print_evaluation(result["holdout"])
+        return
+
+    classifier = TechniqueClassifier.load(args.model)
+    result = evaluate(classifier, examples)
+    if args.live:
+        result["live"] = live_comparison(classifier, examples, args.live)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    _print_evaluation(result)
+    if args.live:
+        live = result["live"]
+        print(f"\nlive LLM selector on {live['examples']} examples: agreement {live['agreement']:.1%}, "
+              f"p50 {live['llm_latency_ms']['p50']:.1f}ms, p99 {live['llm_latency_ms']['p99']:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from typing import List, Set
+import os
+from typing import Dict, List, Set
 
 class Config:
     # CBT Techniques
@@ -96,4 +97,176 @@ class Config:
     ]
     # Model Configuration
     DEFAULT_MODEL = "mistral.mistral-large-2402-v1:0"
-    MAX_HISTORY_LENGTH = 10  # Maximum conversation turns to keep
\ No newline at end of file
+    AWS_REGION = "ap-southeast-2"
+    KNOWLEDGE_BASE_ID = "UHCCSWKNZF"
+    # Source document of the knowledge base (also used for local query derivation)
+    AGENT_KB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent.json")
+
+    # How specialized agents derive KB queries: "llm" (one extra model call per
+    # agent, rag_cbt_concept_prompt) or "local" (the client turn plus the
+    # RAG_LOCAL_CONCEPTS best-matching agent.json concepts, utils/rag_lexicon.py)
+    RAG_QUERY_MODE = os.environ.get("CBT_RAG_QUERY_MODE", "llm")
+    RAG_LOCAL_CONCEPTS = 2
+
+    # Shared per-turn retrieval (agents.specialized.common.RetrievalContext):
+    # passages fetched per query, and the most any one agent puts in its prompt
+    RAG_CONTEXT_RESULTS = 3
+    RAG_PASSAGES_PER_AGENT = 3
+    # Concurrent queries of one utils.knowledge_base.retrieve_batch call (the
+    # pooled boto3 client keeps up to 10 connections) and the per-query budget
+    RETRIEVAL_MAX_WORKERS = 4
+    RETRIEVAL_TIMEOUT_SECONDS = 10.0
+
+    # Where KB lookups go: "bedrock" (the knowledge base above), "bm25", an
+    # in-process index over AGENT_KB_PATH (utils/bm25_index.py) built at
+    # startup, or "dense", an int8 embedding index (utils/dense_index.py)
+    # memory-mapped from the DENSE_INDEX_PATH snapshot on first use
+    KB_BACKEND = os.environ.get("CBT_KB_BACKEND", "bedrock")
+    LOCAL_KB_CHUNK_CHARS = 1500
+    DENSE_INDEX_PATH = os.environ.get("CBT_DENSE_INDEX", os.path.splitext(AGENT_KB_PATH)[0] + ".dense.npy")
+
+    # Retrieval score thresholds per score scale (the "score_scale" of the
+    # installed retriever, utils.knowledge_base.score_threshold):
+    #   relevant        - passages below it are left out of specialized agent prompts
+    #   crisis_possible - CrisisHandlerAgent ignores crisis matches at or below it
+    #                     (0: no message skips the LLM check)
+    #   crisis_likely   - above it the crisis response is given without the LLM check
+    # Bedrock scores are embedding similarities. BM25 scores are lexical
+    # overlap normalized by the query's own terms, and on agent.json they do
+    # not separate crisis from counseling inputs: held-out crisis inputs p50
+    # 0.42, counseling inputs p50 0.38, and short messages matching a crisis
+    # example word for word ("thank you", "I feel nothing") score 1.0. No
+    # "bm25" crisis_likely avoids giving those the crisis response, and low
+    # scores are no safer ("I bought a rope", 0.03), so crisis_likely is kept
+    # out of reach and crisis_possible is 0: every message gets the LLM check.
+    # The default dense encoder (idf-weighted hashed n-grams, fitted on the
+    # passages) separates the two better, but not enough to skip the check:
+    # crises worded unlike agent.json ("I am going to end it all tonight",
+    # 0.10) score below everyday messages ("I had a fight with my friend",
+    # 0.16). Its crisis_possible is 0, so every message gets at least the LLM
+    # check; crisis_likely is the 99th percentile of counseling inputs on the
+    # shipped snapshot (python -m benchmarks.kb_backends report), which a
+    # crisis phrased like an agent.json example ("I want to kill myself",
+    # 0.37) clears. Re-derive it after editing agent.json or plugging in
+    # another encoder.
+    KB_SCORE_THRESHOLDS: Dict[str, Dict[str, float]] = {
+        "bedrock": {"relevant": 0.7, "crisis_possible": 0.2, "crisis_likely": 0.55},
+        "bm25": {"relevant": 0.5, "crisis_possible": 0.0, "crisis_likely": 1.0},
+        "dense": {"relevant": 0.25, "crisis_possible": 0.0, "crisis_likely": 0.35},
+    }
+    # KB "approach"/"module" label (case-insensitive prefix of the passage
+    # metadata) that each technique's agent prefers from the shared passages
+    TECHNIQUE_KB_APPROACHES: Dict[str, str] = {
+        "Reflection": "REFLECTIONS",
+        "Questioning": "QUESTIONS",
+        "Providing solutions": "SOLUTIONS",
+        "Normalization": "NORMALIZING",
+        "Psycho-education": "CBT Foundations and Psychoeducation",
+    }
+    MAX_HISTORY_LENGTH = 10  # Maximum conversation turns to keep (hard cap; see HISTORY_TOKEN_BUDGETS)
+
+    # Estimated-token budget (utils/tokens.py) for the history section of each
+    # prompt: as many recent messages as fit are kept verbatim and older ones
+    # are condensed into a summary block (models.session.HistoryView.render)
+    HISTORY_TOKEN_BUDGETS: Dict[str, int] = {
+        "technique_selection": 800,
+        "specialized_response": 1200,
+    }
+
+    # Request tracing (utils/tracing.py). A request can also ask for a trace by
+    # sending "include_timings": true, which returns it in the response body.
+    # With TRACE_DIR set, traces are written there in Chrome trace format.
+    TRACING = os.environ.get("CBT_TRACING", "0") == "1"
+    TRACE_DIR = os.environ.get("CBT_TRACE_DIR", "")
+
+    # Structured outputs (utils/structured.py): "native" uses the backend's
+    # tool-use mode, "json" asks for JSON in the completion text. A failed
+    # parse gets one repair call; after that callers use their default
+    # (e.g. DEFAULT_TECHNIQUE for technique selection).
+    STRUCTURED_OUTPUT_MODE = os.environ.get("CBT_STRUCTURED_OUTPUT", "native")
+    DEFAULT_TECHNIQUE = "Reflection"
+
+    # Local technique classifier (utils/technique_classifier.py, trained with
+    # python -m benchmarks.technique_classifier train). When a model file is
+    # set, TechniqueSelectorAgent.execute uses its prediction if the confidence
+    # reaches the threshold and asks the LLM otherwise.
+    TECHNIQUE_CLASSIFIER_PATH = os.environ.get("CBT_TECHNIQUE_CLASSIFIER", "")
+    TECHNIQUE_CLASSIFIER_THRESHOLD = float(os.environ.get("CBT_TECHNIQUE_CLASSIFIER_THRESHOLD", "0.6"))
+
+    # LLM call/token accounting (utils/usage.py) per turn, session and handler
+    # invocation. Hard budgets (0 = unlimited) only ever skip the optional
+    # tasks below, which have cheap fallbacks: RAG query generation falls back
+    # to the client turn, orchestrator synthesis to the selected technique's
+    # candidate. Required calls are always made and still counted.
+    LLM_CALL_BUDGET_PER_TURN = int(os.environ.get("CBT_LLM_CALL_BUDGET_PER_TURN", "0"))
+    LLM_TOKEN_BUDGET_PER_TURN = int(os.environ.get("CBT_LLM_TOKEN_BUDGET_PER_TURN", "0"))
+    LLM_CALL_BUDGET_PER_SESSION = int(os.environ.get("CBT_LLM_CALL_BUDGET_PER_SESSION", "0"))
+    LLM_TOKEN_BUDGET_PER_SESSION = int(os.environ.get("CBT_LLM_TOKEN_BUDGET_PER_SESSION", "0"))
+    OPTIONAL_LLM_TASKS: List[str] = ["rag_query", "synthesis"]
+
+    # Build shared models/clients/agents during Lambda INIT (lambda_function.warm_up)
+    WARMUP_ON_INIT = os.environ.get("CBT_WARMUP_ON_INIT", "1") == "1"
+
+    # Backend: "bedrock", "stub" (scripted, offline), "record" or "replay" (cassette)
+    BACKEND = os.environ.get("CBT_BACKEND", "bedrock")
+    CASSETTE_PATH = os.environ.get("CBT_CASSETTE", "cassettes/session.json")
+
+    # LLM response cache (utils/response_cache.py). Only tasks listed here are
+    # cached; add a task only if its output is a pure function of its input.
+    CACHED_LLM_TASKS: Set[str] = {
+        "crisis_detect",
+        "relevance_check",
+        "rag_query",
+        "relevance_batch",
+        "agenda_topic",
+        "session_ratings",
+    }
+    RESPONSE_CACHE_MAX_ENTRIES = 1024
+    RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+    RESPONSE_CACHE_DB = os.environ.get("CBT_RESPONSE_CACHE_DB", "/tmp/cbt_response_cache.sqlite3")
+
+    # Provider prompt caching (utils/llm.prompt_content). Templates returning
+    # PromptParts get a cache point after their static prefix on models whose
+    # id contains one of PROMPT_CACHE_MODELS (Mistral on Bedrock has none).
+    PROMPT_CACHE_POINTS = os.environ.get("CBT_PROMPT_CACHE_POINTS", "1") == "1"
+    PROMPT_CACHE_MODELS: List[str] = ["anthropic.claude", "amazon.nova"]
+
+    # Fan-out of specialized agents in CBTCounselingSystem
+    CANDIDATE_MAX_WORKERS = 5
+    CANDIDATE_TIMEOUT_SECONDS = 30.0
+
+    # Run crisis screening and the counseling path concurrently; the crisis
+    # response still wins and the speculative reply is discarded (lambda_function._screened_turn)
+    SPECULATIVE_CRISIS_SCREENING = os.environ.get("CBT_SPECULATIVE_CRISIS", "0") == "1"
+
+    # session_summary_handler sections run concurrently; each gets its own
+    # budget so the whole handler stays under API Gateway's 29s limit
+    SUMMARY_MAX_WORKERS = 5
+    SUMMARY_STAGE_TIMEOUT_SECONDS = 25.0
+
+    # Record a relevance verdict on each client message during live turns so
+    # summaries can reuse it. It runs in the background and is kept only if it
+    # is back by the end of the turn. Off by default: it costs one model call
+    # per turn, while the summary's batched screening (RELEVANCE_BATCH_STRATEGY
+    # below) checks a whole session in about one
+    ANNOTATE_RELEVANCE = os.environ.get("CBT_ANNOTATE_RELEVANCE", "0") == "1"
+
+    # Whole-session relevance screening (RelevanceValidationAgent.any_relevant):
+    # "batch" = one call per RELEVANCE_BATCH_SIZE messages, "parallel" = one
+    # call per message, RELEVANCE_MAX_WORKERS at a time, stopping at the first hit
+    RELEVANCE_BATCH_STRATEGY = "batch"
+    RELEVANCE_BATCH_SIZE = 20
+    RELEVANCE_MAX_WORKERS = 4
+
+    # Rolling session summary (utils/rolling_summary.py): messages older than
+    # MAX_HISTORY_LENGTH are folded into it once this many have piled up
+    ROLLING_SUMMARY_ENABLED = True
+    ROLLING_SUMMARY_UPDATE_EVERY = 4
+    ROLLING_SUMMARY_TIMEOUT_SECONDS = 10.0
+
+    # Session-id mode (utils/session_store.py): the server keeps the session
+    # and clients send only the new message. "memory" or "sqlite".
+    SESSION_STORE = os.environ.get("CBT_SESSION_STORE", "memory")
+    SESSION_STORE_DB = os.environ.get("CBT_SESSION_STORE_DB", "/tmp/cbt_sessions.sqlite3")
+    SESSION_STORE_MAX_ENTRIES = 1000
+    SESSION_STORE_TTL_SECONDS = 7 * 24 * 3600
@@ -1,27 +1,43 @@
 import json
-from typing import Dict, Any, List
-
-from agents.cbt_planner import CBTPlannerAgent
-from agents.initial_agent import InitialAgent
-from agents.specialized import normalizing_agent, psychoeducation_agent, questioning_agent, reflection_agent, solution_agent
+import os
+import queue
+import threading
+import time
+from typing import Dict, Any, Callable, Generator, Iterator, List, Optional, Tuple
+
+# Only what the handlers use is imported here; the tool-calling orchestrator,
+# InitialAgent and CBTPlannerAgent are loaded on demand (cold start budget:
+# python -m benchmarks.import_time)
+from agents.specialized.common import run_technique, stream_specialized_agent
 from agents.specialized.crisis_handler import CrisisHandlerAgent
 from agents.technique_selector import TechniqueSelectorAgent
 from agents.relevance_validator import RelevanceValidationAgent
 from models.client import ClientProfile
-from models.session import CounselingSession
-from strands.models import BedrockModel
+from models.session import CounselingSession, HistoryView
+from utils import metrics, rolling_summary, tracing, usage
+from utils.concurrency import Speculation, SpeculationCancelled, Stage, run_dag
+from utils.llm import complete
+from utils.model_registry import current_backend, get_client, get_model, get_shared_agent
+from utils.offline import configure_backend
 from utils.prompts import PromptTemplates
-from strands import Agent
+from utils.rag_lexicon import get_lexicon
+from utils.response_cache import get_response_cache
+from utils.session_store import SessionNotFoundError, VersionConflictError, get_session_store
+from utils.technique_classifier import get_technique_classifier
 from config import Config
-import boto3
 import re
 
+# CBT_BACKEND=stub|record|replay swaps Bedrock for offline backends (see utils/offline.py);
+# CBT_KB_BACKEND=bm25 builds the in-process knowledge base here, during INIT
+configure_backend()
+
 def _get_orchestrator():
-    bedrock_model = BedrockModel(
-        model_id="mistral.mistral-large-2402-v1:0",
-        region_name="ap-southeast-2",
-        streaming=False,
+    from strands import Agent
+    from agents.specialized import (
+        normalizing_agent, psychoeducation_agent, questioning_agent, reflection_agent, solution_agent
     )
+
+    bedrock_model = get_model()
     
     return Agent(
         system_prompt='''You are a counselor synthesizing responses from 
@@ -38,30 +54,104 @@ def _get_orchestrator():
         model=bedrock_model
     )
 
-def _process_turn(session: CounselingSession, client_profile: ClientProfile) -> str:
-    """Internal method to process a counseling turn."""
+def _check_crisis(message: str) -> Tuple[str, str, Optional[float]]:
+    """
+    Run the crisis handler; returns (flags, response, kb_score).
+
+    flags and response are both empty when no crisis was detected.
+    """
+    crisis_handler = get_shared_agent(CrisisHandlerAgent)
+    with metrics.timed("stage.crisis_check"):
+        crisis_json_str = crisis_handler.execute(message)
+
+    try:
+        with tracing.span("parse.crisis_result"):
+            crisis_data = json.loads(crisis_json_str)
+        return crisis_data.get("flags", ""), crisis_data.get("response", ""), crisis_data.get("kb_score")
+    except json.JSONDecodeError:
+        return "", "", None
+
+
+def _start_relevance_check(message: str) -> Optional[Speculation]:
+    """Start the relevance verdict for a client message in the background (annotation only)."""
+    if not Config.ANNOTATE_RELEVANCE:
+        return None
+    validator = get_shared_agent(RelevanceValidationAgent)
+    return Speculation(lambda cancel: validator.execute(message) == "RELEVANT")
+
+
+def _annotate_client_turn(
+    session: CounselingSession,
+    crisis_flags: str,
+    kb_score: Optional[float],
+    relevance: Optional[Speculation],
+) -> None:
+    """
+    Record the screening results on the latest client message for session_summary_handler.
+
+    The relevance verdict is only recorded if it has already come back: the
+    turn never waits for it. Without one the message stays unannotated and
+    the summary handler validates it itself.
+    """
+    annotations = {
+        "crisis_flags": [f.strip() for f in crisis_flags.split(",") if f.strip()],
+        "kb_score": kb_score,
+    }
+    if relevance is not None:
+        if not relevance.done():
+            print("[WARN] Relevance annotation skipped: verdict not ready")
+            relevance.cancel()
+        else:
+            try:
+                annotations["relevant"] = relevance.result()
+            except Exception as e:
+                print(f"[WARN] Relevance annotation skipped: {type(e).__name__}: {e}")
+    session.annotate_last("Client", **annotations)
+
+
+def _cancel(*speculations: Optional[Speculation]) -> None:
+    """Cancel the background tasks of a turn that failed."""
+    for speculation in speculations:
+        if speculation is not None:
+            speculation.cancel()
+
+
+def _select_technique(session: CounselingSession) -> Tuple[Dict[str, Any], HistoryView]:
+    """
+    Pick the technique for the next counselor turn; returns
+    ({"technique", "score", "source"}, history view).
+    """
     config = Config()
-    history_str = session.get_history_string(max_messages=config.MAX_HISTORY_LENGTH)
-    
-    technique_selector = TechniqueSelectorAgent()
-    best = technique_selector.execute(history_str)
+    history = session.history_view(config.MAX_HISTORY_LENGTH, slack=config.ROLLING_SUMMARY_UPDATE_EVERY)
+
+    technique_selector = get_shared_agent(TechniqueSelectorAgent)
+    with metrics.timed("stage.technique_selection"):
+        best = technique_selector.execute(history.render(config.HISTORY_TOKEN_BUDGETS.get("technique_selection")))
+    session.selected_techniques = [best["technique"]]
+    return best, history
+
+
+def _process_turn(
+    session: CounselingSession,
+    client_profile: ClientProfile,
+    cancel: Optional[threading.Event] = None,
+) -> str:
+    """Internal method to process a counseling turn."""
+    best, history = _select_technique(session)
     selected_technique = best["technique"]
-    selected_score = best["score"]
-    session.selected_techniques = [selected_technique]
+    if cancel is not None and cancel.is_set():
+        raise SpeculationCancelled()
 
     client_info = client_profile.to_string()
     reason = client_profile.reason_for_counseling
 
-    techniques_map = {
-        "Reflection": reflection_agent,
-        "Questioning": questioning_agent,
-        "Providing solutions": solution_agent,
-        "Normalization": normalizing_agent,
-        "Psycho-education": psychoeducation_agent
-    }
-
-    agent_func = techniques_map[selected_technique]
-    agent_response = agent_func(client_info, reason, history_str)
+    # The agents get the structured view (latest client turn without re-parsing)
+    with metrics.timed("stage.technique_response"):
+        try:
+            agent_response = run_technique(selected_technique, client_info, reason, history)
+        except Exception as e:
+            # One agent per turn here, so there is no other candidate to fall back to
+            agent_response = f"Error in {selected_technique} agent: {e}"
     # synthesis_prompt = PromptTemplates.synthesis_prompt(
     #     selected_agent=selected_technique,
     #     agent_response=agent_response,
@@ -71,37 +161,241 @@ def _process_turn(session: CounselingSession, client_profile: ClientProfile) ->
     # final_response = str(orchestrator(synthesis_prompt))
 
     session.add_message("Counselor", agent_response)
+    session.annotate_last("Counselor", technique=selected_technique, technique_source=best["source"])
     return agent_response
 
 
+def _process_turn_stream(
+    session: CounselingSession,
+    client_profile: ClientProfile,
+    cancel: Optional[threading.Event] = None,
+) -> Iterator[str]:
+    """Streaming variant of ``_process_turn``: yields counselor text as it is generated."""
+    best, history = _select_technique(session)
+    selected_technique = best["technique"]
+    if cancel is not None and cancel.is_set():
+        raise SpeculationCancelled()
+
+    chunks = []
+    for chunk in stream_specialized_agent(
+        selected_technique,
+        client_profile.to_string(),
+        client_profile.reason_for_counseling,
+        history,
+    ):
+        chunks.append(chunk)
+        yield chunk
+
+    session.add_message("Counselor", "".join(chunks))
+    session.annotate_last("Counselor", technique=selected_technique, technique_source=best["source"])
+
+
+def _screened_turn(
+    session: CounselingSession,
+    client_profile_dict: Dict[str, Any],
+    client_message: str,
+) -> Tuple[CounselingSession, str, str]:
+    """
+    Add ``client_message`` and the counselor reply to the session (see
+    ``_metered_turn``). Returns (session, response, crisis_flags); crisis_flags
+    is empty unless the crisis response was used.
+    """
+    return _drain(_metered_turn(session, client_profile_dict, client_message, _process_turn_whole))
+
+
+def _process_turn_whole(
+    session: CounselingSession,
+    client_profile: ClientProfile,
+    cancel: Optional[threading.Event] = None,
+) -> Iterator[str]:
+    """``_process_turn`` as a one-chunk reply, for ``_metered_turn``."""
+    yield _process_turn(session, client_profile, cancel)
+
+
+def _drain(turn: Generator[Any, None, Any]) -> Any:
+    """Run a generator to the end and return its return value."""
+    while True:
+        try:
+            next(turn)
+        except StopIteration as done:
+            return done.value
+
+
+# Counseling path of a turn: (session, client profile, cancel event) -> reply chunks
+Counsel = Callable[[CounselingSession, ClientProfile, Optional[threading.Event]], Iterator[str]]
+
+
+def _metered_turn(
+    session: CounselingSession,
+    client_profile_dict: Dict[str, Any],
+    client_message: str,
+    counsel: Counsel,
+) -> Generator[str, None, Tuple[CounselingSession, str, str]]:
+    """
+    Run one turn (see ``_screen_turn``) in a turn ledger (``utils.usage``)
+    under the handler's and the session's, and store the session's running
+    usage in ``session.llm_usage``. Per-turn and per-session budgets apply.
+    """
+    session_usage = usage.Ledger.from_dict("session", session.llm_usage, usage.Budget.per_session())
+    with usage.open_ledger("turn", usage.Budget.per_turn(), parents=[session_usage]):
+        session, response, crisis_flags = yield from _screen_turn(session, client_profile_dict, client_message, counsel)
+    session.llm_usage = session_usage.to_dict()
+    return session, response, crisis_flags
+
+
+def _screen_turn(
+    session: CounselingSession,
+    client_profile_dict: Dict[str, Any],
+    client_message: str,
+    counsel: Counsel,
+) -> Generator[str, None, Tuple[CounselingSession, str, str]]:
+    """
+    Add ``client_message`` and the counselor reply to the session, yielding
+    the reply as ``counsel`` generates it; shared by the streaming and
+    non-streaming handlers. Returns (session, response, crisis_flags).
+
+    The crisis check always decides the reply. With
+    ``Config.SPECULATIVE_CRISIS_SCREENING`` the counseling path starts at the
+    same time on a copy of the session, buffering its chunks, and is cancelled
+    and thrown away if a crisis is detected; otherwise it only starts once the
+    check comes back clean. Nothing is yielded before the check. If the turn
+    fails (or the caller stops reading), the background work is cancelled and
+    ``session`` is left as it was.
+    """
+    summary_update = rolling_summary.start_update(session)
+    relevance = _start_relevance_check(client_message)
+    speculation = None
+    if Config.SPECULATIVE_CRISIS_SCREENING:
+        speculative_session = CounselingSession.from_dict(session.to_dict())
+        speculative_session.add_message("Client", client_message)
+        chunks: "queue.Queue[Optional[str]]" = queue.Queue()
+
+        def run_counsel(cancel: threading.Event) -> None:
+            try:
+                for chunk in counsel(speculative_session, ClientProfile(**client_profile_dict), cancel):
+                    chunks.put(chunk)
+            finally:
+                chunks.put(None)
+
+        speculation = Speculation(run_counsel)
+
+    try:
+        crisis_flags, crisis_response, kb_score = _check_crisis(client_message)
+        if crisis_flags and crisis_response:
+            _cancel(speculation)
+            session.add_message("Client", client_message)
+            session.add_message("Counselor", crisis_response)
+            _annotate_client_turn(session, crisis_flags, kb_score, relevance)
+            rolling_summary.finish_update(session, summary_update)
+            yield crisis_response
+            return session, crisis_response, crisis_flags
+
+        if speculation is not None:
+            while (chunk := chunks.get()) is not None:
+                yield chunk
+            speculation.result()
+            session = speculative_session
+        else:
+            serial_session = CounselingSession.from_dict(session.to_dict())
+            serial_session.add_message("Client", client_message)
+            yield from counsel(serial_session, ClientProfile(**client_profile_dict), None)
+            session = serial_session
+    except BaseException:
+        _cancel(speculation, relevance, summary_update)
+        raise
+
+    _annotate_client_turn(session, crisis_flags, kb_score, relevance)
+    rolling_summary.finish_update(session, summary_update)
+    return session, session.messages[-1].content, ""
+
+
+# Session-id mode: instead of round-tripping session_state, clients send
+# {"session_id", "version"} and the session lives in utils/session_store.py.
+# A session ref is None in full-state mode, (None, None) for a new stored
+# session and (session_id, version) for an existing one.
+SessionRef = Optional[Tuple[Optional[str], Optional[int]]]
+
+
+def _load_session(body: Dict[str, Any]) -> Tuple[CounselingSession, Dict[str, Any], SessionRef]:
+    """Return (session, client_profile, session_ref) for a turn request in either mode."""
+    session_id = body.get("session_id")
+    if session_id is None:
+        with tracing.span("parse.session_state"):
+            return CounselingSession.from_dict(body.get("session_state")), body.get("client_profile"), None
+
+    with tracing.span("session_store.load"):
+        record, version = get_session_store().load(session_id)
+    expected_version = body.get("version")
+    if expected_version is not None and expected_version != version:
+        raise VersionConflictError(session_id, expected_version, version)
+    client_profile_dict = body.get("client_profile") or record["client_profile"]
+    with tracing.span("parse.session_state"):
+        session = CounselingSession.from_dict(record["session_state"])
+    return session, client_profile_dict, (session_id, version)
+
+
+def _session_fields(
+    session: CounselingSession,
+    client_profile_dict: Dict[str, Any],
+    session_ref: SessionRef,
+) -> Dict[str, Any]:
+    """Response fields carrying the session: full session_state, or the stored id and new version."""
+    with tracing.span("serialize.session_state"):
+        session_state = session.to_dict()
+    if session_ref is None:
+        return {"session_state": session_state}
+
+    store = get_session_store()
+    record = {"session_state": session_state, "client_profile": client_profile_dict}
+    session_id, version = session_ref
+    with tracing.span("session_store.save"):
+        if session_id is None:
+            session_id, version = store.create(record)
+        else:
+            version = store.save(session_id, record, expected_version=version)
+    return {"session_id": session_id, "version": version}
+
+
+def _session_error(error: Exception) -> Dict[str, Any]:
+    if isinstance(error, VersionConflictError):
+        return {
+            "statusCode": 409,
+            "body": json.dumps({
+                "error": str(error),
+                "session_id": error.session_id,
+                "version": error.current_version
+            })
+        }
+    return {
+        "statusCode": 404,
+        "body": json.dumps({"error": f"Unknown session_id: {error}"})
+    }
+
+
+@tracing.traced_handler("start_session")
+@usage.metered_handler("start_session")
 def start_session_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    body = json.loads(event.get("body", "{}"))
+    with tracing.span("parse.request"):
+        body = json.loads(event.get("body", "{}"))
     client_profile_dict = body.get("client_profile")
     initial_client_message = body.get("initial_client_message")
+    # "session_mode": "id" keeps the session server-side (see _load_session)
+    session_ref = (None, None) if body.get("session_mode") == "id" else None
 
-    # Check for crisis FIRST using CrisisHandlerAgent
-    crisis_handler = CrisisHandlerAgent()
-    crisis_json_str = crisis_handler.execute(initial_client_message)
-    
-    try:
-        crisis_data = json.loads(crisis_json_str)
-        crisis_flags = crisis_data.get("flags", "")
-        crisis_response = crisis_data.get("response", "")
-    except json.JSONDecodeError:
-        crisis_flags = ""
-        crisis_response = ""
+    # Crisis check (CrisisHandlerAgent) always decides the reply; the counseling
+    # path may run speculatively alongside it (see _screened_turn)
+    session, initial_response, crisis_flags = _screened_turn(
+        CounselingSession(), client_profile_dict, initial_client_message
+    )
+    session_fields = _session_fields(session, client_profile_dict, session_ref)
     
     # If crisis detected (has both flags and response)
-    if crisis_flags and crisis_response:
-        session = CounselingSession()
-        session.add_message("Client", initial_client_message)
-        session.add_message("Counselor", crisis_response)
-        
+    if crisis_flags:
         return {
             "statusCode": 200,
             "body": json.dumps({
-                "initial_response": crisis_response,
-                "session_state": session.to_dict(),
+                "initial_response": initial_response,
+                **session_fields,
                 "crisis_detected": True,
                 "crisis_flags": crisis_flags
             })
@@ -125,8 +419,6 @@ def start_session_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]
     #     }
 
     # Normal counseling flow
-    client_profile = ClientProfile(**client_profile_dict)
-    session = CounselingSession()
 
     # initial_agent = InitialAgent()
     # session.initial_session_data = initial_agent.conduct_initial_session(
@@ -156,48 +448,44 @@ def start_session_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]
     #     initial_client_message
     # )
     
-    session.add_message("Client", initial_client_message)
-    initial_response = _process_turn(session, client_profile)
-    
     return {
         "statusCode": 200,
         "body": json.dumps({
             "initial_response": initial_response,
-            "session_state": session.to_dict(),
+            **session_fields,
             "crisis_detected": False
         })
     }
 
 
+@tracing.traced_handler("process_turn")
+@usage.metered_handler("process_turn")
 def process_turn_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    body = json.loads(event.get("body", "{}"))
-    session_state_dict = body.get("session_state")
+    with tracing.span("parse.request"):
+        body = json.loads(event.get("body", "{}"))
     client_message = body.get("client_message")
-    client_profile_dict = body.get("client_profile")
 
-    # Check for crisis FIRST
-    crisis_handler = CrisisHandlerAgent()
-    crisis_json_str = crisis_handler.execute(client_message)
-    
+    # Full session_state round trip, or session_id/version in session-id mode
     try:
-        crisis_data = json.loads(crisis_json_str)
-        crisis_flags = crisis_data.get("flags", "")
-        crisis_response = crisis_data.get("response", "")
-    except json.JSONDecodeError:
-        crisis_flags = ""
-        crisis_response = ""
+        session, client_profile_dict, session_ref = _load_session(body)
+    except (SessionNotFoundError, VersionConflictError) as e:
+        return _session_error(e)
+
+    # Crisis check always decides the reply (see _screened_turn)
+    session, response, crisis_flags = _screened_turn(session, client_profile_dict, client_message)
+
+    try:
+        session_fields = _session_fields(session, client_profile_dict, session_ref)
+    except (SessionNotFoundError, VersionConflictError) as e:
+        return _session_error(e)
     
     # If crisis detected (has both flags and response)
-    if crisis_flags and crisis_response:
-        session = CounselingSession.from_dict(session_state_dict)
-        session.add_message("Client", client_message)
-        session.add_message("Counselor", crisis_response)
-        
+    if crisis_flags:
         return {
             "statusCode": 200,
             "body": json.dumps({
-                "response": crisis_response,
-                "session_state": session.to_dict(),
+                "response": response,
+                **session_fields,
                 "crisis_detected": True,
                 "crisis_flags": crisis_flags
             })
@@ -221,24 +509,111 @@ def process_turn_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     #     }
 
     # Normal counseling flow
-    session = CounselingSession.from_dict(session_state_dict)
-    client_profile = ClientProfile(**client_profile_dict)
-    session.add_message("Client", client_message)
-    response = _process_turn(session, client_profile)
-    
     return {
         "statusCode": 200,
         "body": json.dumps({
             "response": response,
-            "session_state": session.to_dict(),
+            **session_fields,
             "crisis_detected": False
         })
     }
- 
 
-def session_summary_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+
+def _stream_turn(
+    session: CounselingSession,
+    client_profile_dict: Dict[str, Any],
+    client_message: str,
+    response_key: str,
+    session_ref: SessionRef = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Shared body of the streaming handlers: ``_metered_turn`` with streamed
+    reply chunks. A turn that fails, possibly after some chunks were sent,
+    ends with a 500 ``{"type": "error"}`` event instead of a final one; the
+    partial reply is not stored, so the caller keeps its previous session.
+    """
+    turn = _metered_turn(session, client_profile_dict, client_message, _process_turn_stream)
     try:
+        while True:
+            try:
+                chunk = next(turn)
+            except StopIteration as done:
+                session, response, crisis_flags = done.value
+                break
+            yield {"type": "token", "text": chunk}
+    except Exception as e:
+        print(f"[ERROR] Streamed turn failed: {type(e).__name__}: {e}")
+        yield {"type": "error", "statusCode": 500, "body": {"error": f"Internal server error: {str(e)}"}}
+        return
+    finally:
+        turn.close()
+
+    body = {response_key: response, **_session_fields(session, client_profile_dict, session_ref)}
+    if crisis_flags:
+        yield {"type": "final", "body": {**body, "crisis_detected": True, "crisis_flags": crisis_flags}}
+    else:
+        yield {"type": "final", "body": {**body, "crisis_detected": False}}
+
+
+@tracing.traced_stream_handler("start_session")
+@usage.metered_stream_handler("start_session")
+def start_session_stream_handler(event: Dict[str, Any], context: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of ``start_session_handler``.
+
+    Yields ``{"type": "token", "text": ...}`` events while the counselor reply
+    is generated, then one ``{"type": "final", "body": {...}}`` event whose body
+    matches the non-streaming handler's response body. Meant for in-process
+    callers (app.py) or a response-streaming adapter in front of Lambda.
+    """
+    with tracing.span("parse.request"):
         body = json.loads(event.get("body", "{}"))
+    yield from _stream_turn(
+        CounselingSession(),
+        body.get("client_profile"),
+        body.get("initial_client_message"),
+        "initial_response",
+        (None, None) if body.get("session_mode") == "id" else None,
+    )
+
+
+@tracing.traced_stream_handler("process_turn")
+@usage.metered_stream_handler("process_turn")
+def process_turn_stream_handler(event: Dict[str, Any], context: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of ``process_turn_handler`` (same event protocol as above).
+
+    Session-id errors (unknown id, version conflict) are reported as a single
+    ``{"type": "error", "statusCode": ..., "body": {...}}`` event, as is a
+    failed turn (see ``_stream_turn``).
+    """
+    with tracing.span("parse.request"):
+        body = json.loads(event.get("body", "{}"))
+    try:
+        session, client_profile_dict, session_ref = _load_session(body)
+        yield from _stream_turn(
+            session,
+            client_profile_dict,
+            body.get("client_message"),
+            "response",
+            session_ref,
+        )
+    except (SessionNotFoundError, VersionConflictError) as e:
+        error = _session_error(e)
+        yield {"type": "error", "statusCode": error["statusCode"], "body": json.loads(error["body"])}
+
+
+@tracing.traced_handler("session_summary")
+@usage.metered_handler("session_summary")
+def session_summary_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    try:
+        with tracing.span("parse.request"):
+            body = json.loads(event.get("body", "{}"))
+        if body.get("session_id"):
+            try:
+                body = _summary_body_from_store(body)
+            except SessionNotFoundError as e:
+                return _session_error(e)
         client_profile = body.get("client_profile")
         chat_history = body.get("chat_history", [])
         
@@ -250,32 +625,54 @@ def session_summary_handler(event: Dict[str, Any], context: Any) -> Dict[str, An
                 })
             }
         
-        summary_text = _generate_session_summary(
-            client_profile=client_profile,
-            chat_history=chat_history
-        )
-        
-        recommended_technique = _select_technique_for_all_sessions(
-            client_profile=client_profile,
-            chat_history=chat_history
+        # The sections are independent, so they run as a graph with bounded
+        # parallelism; a failed or slow section leaves the others intact
+        stages = {
+            "summary": Stage(lambda: _generate_session_summary(
+                client_profile=client_profile,
+                chat_history=chat_history,
+                rolling_summary_text=body.get("rolling_summary", ""),
+                summary_checkpoint=body.get("summary_checkpoint", 0)
+            )),
+            "techniquesUsed": Stage(lambda: _select_technique_for_all_sessions(
+                client_profile=client_profile,
+                chat_history=chat_history
+            )),
+            "flags": Stage(lambda: _collect_crisis_flags_from_session(chat_history)),
+            "ratings": Stage(lambda: _evaluate_session_ratings(chat_history)),
+            "agendaTopic": Stage(lambda: _generate_agenda_topic(client_profile, chat_history)),
+        }
+        for name, stage in stages.items():
+            stage.fn = tracing.traced(f"summary.{name}", stage.fn)
+        outcomes = run_dag(
+            stages,
+            max_workers=Config.SUMMARY_MAX_WORKERS,
+            timeout=Config.SUMMARY_STAGE_TIMEOUT_SECONDS,
         )
 
-        flags_list = _collect_crisis_flags_from_session(chat_history)
+        section_status = {}
+        for name, outcome in outcomes.items():
+            section_status[name] = outcome.status
+            if outcome.status != "skipped":
+                metrics.record(f"summary.{name}", outcome.elapsed_ms)
+            if not outcome.ok:
+                print(f"[WARN] Summary section {name} {outcome.status}: {outcome.error}")
 
-        ratings = _evaluate_session_ratings(chat_history)
-
-        agenda_topic = _generate_agenda_topic(client_profile, chat_history)
+        def section(name: str, default: Any) -> Any:
+            return outcomes[name].value if outcomes[name].ok else default
 
+        recommended_technique = section("techniquesUsed", "")
         techniques_used = [recommended_technique] if recommended_technique else []
 
         return {
             "statusCode": 200,
             "body": json.dumps({
-                "ratings": ratings,
-                "flags": flags_list,
-                "agendaTopic": agenda_topic,
-                "summary": summary_text,
-                "techniquesUsed": techniques_used
+                "ratings": section("ratings", {}),
+                "flags": section("flags", []),
+                "agendaTopic": section("agendaTopic", ""),
+                "summary": section("summary", ""),
+                "techniquesUsed": techniques_used,
+                "sectionStatus": section_status
             })
         }
         
@@ -290,28 +687,54 @@ def session_summary_handler(event: Dict[str, Any], context: Any) -> Dict[str, An
         }
 
 
-def _generate_session_summary(client_profile: Dict[str, Any], chat_history: List[Dict[str, Any]]) -> str:
-    formatted_history = _format_chat_history(chat_history)
-    
-    summary_prompt = PromptTemplates.session_summary_prompt(
-        client_profile=client_profile,
-        formatted_history=formatted_history
-    )
-    
-    bedrock_model = BedrockModel(
-        model_id="mistral.mistral-large-2402-v1:0",
-        region_name="ap-southeast-2",
-        streaming=False,
-    )
+def _summary_body_from_store(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill a session-id summary request from the stored session."""
+    record, _ = get_session_store().load(body["session_id"])
+    state = record["session_state"]
+    return {
+        **body,
+        "client_profile": body.get("client_profile") or record["client_profile"],
+        "chat_history": [
+            {"role": m["speaker"], "message": m["content"], "annotations": m.get("annotations", {})}
+            for m in state.get("messages", [])
+        ],
+        "rolling_summary": state.get("rolling_summary", ""),
+        "summary_checkpoint": state.get("summary_checkpoint", 0),
+    }
+
+
+def _generate_session_summary(
+    client_profile: Dict[str, Any],
+    chat_history: List[Dict[str, Any]],
+    rolling_summary_text: str = "",
+    summary_checkpoint: int = 0,
+) -> str:
+    """
+    Write the session overview. When the session carries a rolling summary
+    covering chat_history[:summary_checkpoint], only the turns after the
+    checkpoint are sent along with it instead of the whole transcript.
+    """
+    if rolling_summary_text and 0 < summary_checkpoint <= len(chat_history):
+        summary_prompt = PromptTemplates.session_summary_update_prompt(
+            client_profile=client_profile,
+            rolling_summary=rolling_summary_text,
+            new_turns=_format_chat_history(chat_history[summary_checkpoint:])
+        )
+    else:
+        formatted_history = _format_chat_history(chat_history)
+        
+        summary_prompt = PromptTemplates.session_summary_prompt(
+            client_profile=client_profile,
+            formatted_history=formatted_history
+        )
     
-    summary_agent = Agent(
-        system_prompt='''You are an experienced clinical supervisor with expertise in 
+    summary_response = complete(
+        '''You are an experienced clinical supervisor with expertise in 
         CBT and mental health counseling. Provide clear, professional session summaries 
         that would be useful for treatment planning.''',
-        model=bedrock_model
+        summary_prompt,
+        task="session_summary",
     )
-    
-    summary_response = str(summary_agent(summary_prompt))
     return summary_response
 
 
@@ -325,24 +748,27 @@ def _format_chat_history(chat_history: List[Dict[str, Any]]) -> str:
 
 
 def _is_session_relevant(chat_history: List[Dict[str, Any]]) -> bool:
-    relevance_validator = RelevanceValidationAgent()
-    
-    client_messages = [
-        msg.get("message", "") 
+    client_turns = [
+        msg
         for msg in chat_history 
         if msg.get("role", "").lower() == "client"
     ]
     
-    if not client_messages:
+    if not client_turns:
         return False
-    
-    # Check if ANY client message is relevant
-    for message in client_messages:
-        relevance_response = relevance_validator.execute(message)
-        if relevance_response == "RELEVANT":
-            return True  
-    
-    return False
+
+    # Verdicts recorded during the live turns need no LLM call
+    unannotated = []
+    for turn in client_turns:
+        relevant = (turn.get("annotations") or {}).get("relevant")
+        if relevant is True:
+            return True
+        if relevant is None:
+            unannotated.append(turn.get("message", ""))
+
+    # Check if ANY remaining client message is relevant (batched, stops at the first hit)
+    relevance_validator = get_shared_agent(RelevanceValidationAgent)
+    return relevance_validator.any_relevant(unannotated)
 
 
 def _select_technique_for_all_sessions(client_profile: Dict[str, Any], chat_history: List[Dict[str, Any]]) -> str:
@@ -362,29 +788,23 @@ def _select_technique_for_all_sessions(client_profile: Dict[str, Any], chat_hist
         available_sub_techniques=config.CBT_SUB_TECHNIQUES
     )
     
-    bedrock_model = BedrockModel(
-        model_id="mistral.mistral-large-2402-v1:0",
-        region_name="ap-southeast-2",
-        streaming=False,
-    )
-    
-    technique_agent = Agent(
-        system_prompt='''You are a CBT supervisor expert in selecting appropriate 
+    selected_technique = complete(
+        '''You are a CBT supervisor expert in selecting appropriate 
         therapeutic interventions for ongoing treatment. Respond with ONLY the sub technique name.''',
-        model=bedrock_model
-    )
-    
-    selected_technique = str(technique_agent(technique_prompt)).strip()
+        technique_prompt,
+        task="session_technique",
+    ).strip()
     
     return selected_technique
 
 
 def _collect_crisis_flags_from_session(chat_history: List[Dict[str, Any]]) -> List[str]:
     """
-    Collect all crisis flags from the entire session by re-running CrisisHandlerAgent
-    on each client message.
+    Collect all crisis flags from the entire session. Flags recorded during the
+    live turns are reused; CrisisHandlerAgent is only re-run on client messages
+    that carry no crisis annotation.
     """
-    crisis_handler = CrisisHandlerAgent()
+    crisis_handler = get_shared_agent(CrisisHandlerAgent)
     flags_set = set()
     
     for turn in chat_history:
@@ -392,6 +812,11 @@ def _collect_crisis_flags_from_session(chat_history: List[Dict[str, Any]]) -> Li
             message = turn.get("message", "").strip()
             if not message:
                 continue
+
+            annotations = turn.get("annotations") or {}
+            if "crisis_flags" in annotations:
+                flags_set.update(annotations["crisis_flags"])
+                continue
             
             try:
                 crisis_json_str = crisis_handler.execute(message)
@@ -437,15 +862,7 @@ def _evaluate_session_ratings(chat_history: List[Dict[str, Any]]) -> Dict[str, b
     config = Config()
     formatted_history = _format_chat_history(chat_history)
 
-    bedrock_model = BedrockModel(
-        model_id="mistral.mistral-large-2402-v1:0",
-        region_name="ap-southeast-2",
-        streaming=False,
-        temperature=0
-    )
-
-    rating_agent = Agent(
-        system_prompt=f"""
+    rating_system_prompt = f"""
         You are an evaluator of CBT counseling quality.
         Evaluate each of the following criteria as True or False.
 
@@ -456,13 +873,13 @@ def _evaluate_session_ratings(chat_history: List[Dict[str, Any]]) -> Dict[str, b
             "message_reciprocity": false,
             ...
         }}
-        Criteria: {', '.join(config.CRITERIONS)}
-        """,
-        model=bedrock_model
-    )
+        Criteria: {', '.join(sorted(config.CRITERIONS))}
+        """
 
     prompt = PromptTemplates.session_ratings_prompt(formatted_history)
-    response = str(rating_agent(prompt)).strip()
+    response = complete(
+        rating_system_prompt, prompt, task="session_ratings", model=get_model(temperature=0)
+    ).strip()
 
     try:
         parsed = json.loads(response)
@@ -474,15 +891,57 @@ def _evaluate_session_ratings(chat_history: List[Dict[str, Any]]) -> Dict[str, b
 def _generate_agenda_topic(client_profile: Dict[str, Any], chat_history: List[Dict[str, Any]]) -> str:
     """Generate a concise agenda topic title for the conversation."""
     formatted_history = _format_chat_history(chat_history)
-    bedrock_model = BedrockModel(
-        model_id="mistral.mistral-large-2402-v1:0",
-        region_name="ap-southeast-2",
-        streaming=False
-    )
-    topic_agent = Agent(
-        system_prompt='''You are a summarization expert. 
-        Generate a short, meaningful agenda topic (3-7 words) summarizing the session theme.''',
-        model=bedrock_model
-    )
     prompt = PromptTemplates.agenda_topic_prompt(client_profile, formatted_history)
-    return str(topic_agent(prompt)).strip()
\ No newline at end of file
+    return complete(
+        '''You are a summarization expert. 
+        Generate a short, meaningful agenda topic (3-7 words) summarizing the session theme.''',
+        prompt,
+        task="agenda_topic",
+    ).strip()
+
+
+def _load_dense_index() -> None:
+    from utils.dense_index import get_dense_index
+    get_dense_index()
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Build the shared models, clients and agents a turn needs ahead of time.
+
+    Returns the milliseconds spent per step. A failing step is logged and
+    skipped, so warmup can never break the function's INIT phase.
+    """
+    steps = [
+        ("model", get_model),
+        ("streaming_model", lambda: get_model(streaming=True)),
+        ("crisis_handler", lambda: get_shared_agent(CrisisHandlerAgent)),
+        ("technique_selector", lambda: get_shared_agent(TechniqueSelectorAgent)),
+        ("technique_classifier", get_technique_classifier),
+        ("relevance_validator", lambda: get_shared_agent(RelevanceValidationAgent)),
+        ("session_store", get_session_store),
+        ("response_cache", get_response_cache),
+    ]
+    if Config.RAG_QUERY_MODE == "local":
+        steps.append(("rag_lexicon", get_lexicon))
+    if Config.KB_BACKEND == "dense":
+        # Memory-maps the snapshot shipped next to agent.json (no re-encoding)
+        steps.append(("dense_index", _load_dense_index))
+    if current_backend() == "bedrock" and Config.KB_BACKEND == "bedrock":
+        steps.append(("kb_client", lambda: get_client("bedrock-agent-runtime")))
+
+    timings = {}
+    for name, build in steps:
+        start = time.perf_counter()
+        try:
+            build()
+        except Exception as e:
+            print(f"[WARN] Warmup step {name} failed: {type(e).__name__}: {e}")
+            continue
+        timings[name] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+# Lambda INIT runs module code before the first request; do the construction there
+if Config.WARMUP_ON_INIT and os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+    print(f"[DEBUG] Warmup: {warm_up()}")
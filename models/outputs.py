@@ -0,0 +1,34 @@
+from typing import List
+
+from pydantic import BaseModel, Field, field_validator
+
+from config import Config
+
+
+# Schemas for model outputs parsed with utils.structured. Keep them small:
+# the compact form (utils.structured.compact_schema) is sent with every call.
+
+class TechniqueScore(BaseModel):
+    technique: str = Field(json_schema_extra={"enum": Config.THERAPY_AGENTS})
+    score: float = Field(ge=0.0, le=1.0)
+
+    @field_validator("technique")
+    @classmethod
+    def known_technique(cls, value: str) -> str:
+        if value not in Config.THERAPY_AGENTS:
+            raise ValueError(f"unknown technique {value!r}")
+        return value
+
+
+class TechniqueSelection(BaseModel):
+    """Top techniques for the next counselor turn, best first."""
+    techniques: List[TechniqueScore] = Field(min_length=1, max_length=3)
+
+
+class Agenda(BaseModel):
+    """Session agenda agreed in the first turn (InitialAgent)."""
+    session_focus: str
+    agenda_items: List[str] = Field(default_factory=list)
+    goals: List[str] = Field(default_factory=list)
+    priorities: List[str] = Field(default_factory=list)
+    agenda_summary: str = ""
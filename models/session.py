@@ -1,17 +1,149 @@
-from typing import List, Optional, Dict, Any
+from collections import deque
+from typing import Deque, List, Optional, Dict, Any, Tuple
 from dataclasses import dataclass, field, asdict
 
+from utils.tokens import estimate_tokens, truncate_to_tokens
+
 
 @dataclass
 class Message:
     """Represents a single message in the conversation."""
     speaker: str  # "Client" or "Counselor"
     content: str
+    # Facts recorded while the turn was processed (crisis_flags, kb_score,
+    # relevant, technique, technique_source) so later stages don't have to
+    # recompute them
+    annotations: Dict[str, Any] = field(default_factory=dict)
     
     def __str__(self) -> str:
         return f"{self.speaker}: {self.content}"
 
 
+class HistoryView:
+    """
+    Bounded, incrementally maintained view of the conversation for turn prompts.
+
+    Keeps the last ``max_messages + slack`` messages in a ring buffer, tracks
+    the latest client utterance as messages arrive, and memoizes the rendered
+    string until the next append (or summary change). With a rolling summary,
+    the render is the summary followed by the messages it does not cover yet
+    (``slack`` leaves room for those beyond ``max_messages``); without one it
+    is the last ``max_messages`` messages.
+
+    ``render(token_budget)`` additionally keeps only as many recent messages
+    as fit the budget and condenses the rest into a summary block, so prompt
+    size no longer depends on how long the messages are.
+    """
+
+    def __init__(self, max_messages: int, slack: int = 0, first_index: int = 0):
+        self.max_messages = max_messages
+        self._window: Deque[Tuple[int, Message]] = deque(maxlen=max_messages + slack)
+        self._count = first_index  # session index of the next appended message
+        self._latest_client_turn = ""
+        self._summary = ""
+        self._checkpoint = 0
+        self._rendered: Dict[Optional[int], str] = {}
+
+    def append(self, message: Message) -> None:
+        self._window.append((self._count, message))
+        self._count += 1
+        if message.speaker == "Client":
+            self._latest_client_turn = message.content
+        self._rendered.clear()
+
+    def set_summary(self, summary: str, checkpoint: int) -> None:
+        """Use ``summary`` in place of the first ``checkpoint`` messages."""
+        if (summary, checkpoint) != (self._summary, self._checkpoint):
+            self._summary, self._checkpoint = summary, checkpoint
+            self._rendered.clear()
+
+    @property
+    def latest_client_turn(self) -> str:
+        """Most recent client utterance (full text, including line breaks)."""
+        return self._latest_client_turn
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    def messages(self) -> List[Message]:
+        """Messages included in the rendered history, oldest first."""
+        if self._summary:
+            return [msg for index, msg in self._window if index >= self._checkpoint]
+        return [msg for _, msg in self._window][-self.max_messages:]
+
+    def render(self, token_budget: Optional[int] = None) -> str:
+        """Render the history, optionally within ``token_budget`` estimated tokens."""
+        rendered = self._rendered.get(token_budget)
+        if rendered is None:
+            if token_budget is None:
+                rendered = self._render_all()
+            else:
+                rendered = self._render_budgeted(token_budget)
+            self._rendered[token_budget] = rendered
+        return rendered
+
+    def _render_all(self) -> str:
+        lines = [f"Summary of earlier conversation: {self._summary}"] if self._summary else []
+        lines.extend(str(msg) for msg in self.messages())
+        return "\n".join(lines)
+
+    def _render_budgeted(self, token_budget: int) -> str:
+        messages = self.messages()
+        lines = [str(msg) for msg in messages]
+        costs = [estimate_tokens(line) for line in lines]
+        summary_cost = estimate_tokens(self._summary) + 6 if self._summary else 0
+        if summary_cost + sum(costs) <= token_budget:
+            return self._render_all()
+
+        # Newest messages first, leaving a quarter of the budget for the
+        # summary block; the latest message is always kept (shortened if need be)
+        turn_budget = token_budget - token_budget // 4
+        kept: List[str] = []
+        used = 0
+        for line, cost in zip(reversed(lines), reversed(costs)):
+            if used + cost > turn_budget:
+                if not kept:
+                    kept.append(truncate_to_tokens(line, turn_budget))
+                    used = turn_budget
+                break
+            kept.append(line)
+            used += cost
+        kept.reverse()
+
+        omitted = messages[:len(messages) - len(kept)]
+        block = self._summary_block(omitted, token_budget - used)
+        return "\n".join(([block] if block else []) + kept)
+
+    def _summary_block(self, omitted: List[Message], token_budget: int) -> str:
+        """Rolling summary plus a condensed excerpt of omitted messages, within ``token_budget``."""
+        parts = []
+        remaining = token_budget
+        if self._summary:
+            summary = truncate_to_tokens(self._summary, remaining - 6)
+            if summary:
+                parts.append(f"Summary of earlier conversation: {summary}")
+                remaining -= estimate_tokens(parts[-1])
+
+        excerpts: List[str] = []
+        for msg in reversed(omitted):
+            excerpt = f"{msg.speaker}: {truncate_to_tokens(msg.content, 30)}"
+            cost = estimate_tokens(excerpt) + 1
+            if cost > remaining - 6:
+                break
+            excerpts.append(excerpt)
+            remaining -= cost
+        if excerpts:
+            parts.append("Earlier turns (condensed): " + " | ".join(reversed(excerpts)))
+        return "\n".join(parts)
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def __len__(self) -> int:
+        return len(self.messages())
+
+
 @dataclass
 class CounselingSession:
     """Manages the state of a counseling session."""
@@ -22,10 +154,29 @@ class CounselingSession:
     agenda_items: List[str] = field(default_factory=list)
     session_focus: Optional[str] = None
     initial_session_data: Optional[Dict[str, str]] = None
+    # Running summary of messages[:summary_checkpoint] (utils/rolling_summary.py)
+    rolling_summary: str = ""
+    summary_checkpoint: int = 0
+    # Model calls/tokens per task over the whole session (utils.usage.Ledger.to_dict)
+    llm_usage: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        # Not a dataclass field, so it stays out of to_dict()
+        self._views: Dict[Tuple[int, int], HistoryView] = {}
     
     def add_message(self, speaker: str, content: str) -> None:
         """Add a message to the session history."""
-        self.messages.append(Message(speaker, content))
+        message = Message(speaker, content)
+        self.messages.append(message)
+        for view in self._views.values():
+            view.append(message)
+
+    def annotate_last(self, speaker: str, **annotations: Any) -> None:
+        """Attach annotations to the most recent message from ``speaker``."""
+        for msg in reversed(self.messages):
+            if msg.speaker == speaker:
+                msg.annotations.update(annotations)
+                return
     
     def get_history_string(self, max_messages: Optional[int] = None) -> str:
         """Get conversation history as formatted string."""
@@ -34,6 +185,23 @@ class CounselingSession:
             messages = messages[-max_messages:]
         return "\n".join(str(msg) for msg in messages)
     
+    def history_view(self, max_messages: int, slack: int = 0) -> HistoryView:
+        """
+        Get the structured history for turn prompts (see ``HistoryView``).
+
+        The view is built once per session object and then kept up to date by
+        ``add_message``; the rolling summary is applied on every call.
+        """
+        view = self._views.get((max_messages, slack))
+        if view is None:
+            recent = self.messages[-(max_messages + slack):] if max_messages + slack else []
+            view = HistoryView(max_messages, slack, first_index=len(self.messages) - len(recent))
+            for message in recent:
+                view.append(message)
+            self._views[(max_messages, slack)] = view
+        view.set_summary(self.rolling_summary, self.summary_checkpoint)
+        return view
+    
     def get_last_n_messages(self, n: int) -> List[Message]:
         """Retrieve last N messages from history."""
         return self.messages[-n:] if len(self.messages) >= n else self.messages
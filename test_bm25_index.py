@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from agents.specialized.crisis_handler import CrisisHandlerAgent
+from utils import knowledge_base, usage
+from utils.bm25_index import BM25Index, get_bm25_index, matches_filter, passages_from_entries
+from utils.knowledge_base import retrieve, score_threshold
+from utils.offline import use_bedrock, use_stub
+from utils.rag_lexicon import load_entries
+from utils.stub_model import StubModel
+
+CRISIS = {"equals": {"key": "intervention_type", "value": "crisis"}}
+
+ENTRIES = [
+    {"section": "Comprehensive Crisis Scenarios", "subsection": "SUICIDAL IDEATION", "approach": "NORMALIZING",
+     "module": "Cognitive Interventions",
+     "content": 'Example 1: Direct Suicidal Statement\nClient Input: "I want to kill myself"\n'
+                'Cotherapist Response: "Thank you for telling me. Please call 000."\n'
+                'Example 2: Indirect Suicidal Expression\nClient Input: "I don\'t want to be here anymore"\n'
+                'Cotherapist Response: "Thank you for sharing this with me."'},
+    {"section": "CBT COTHERAPIST BOT TRAINING RESPONSES", "subsection": "Intent: work_stress",
+     "approach": "REFLECTIONS on EMOTIONS", "module": "Distress Tolerance & Coping Skills",
+     "content": 'Example Input 1: "My boss keeps adding deadlines"\nResponse 1: "That sounds like a lot."'},
+]
+
+
+@pytest.fixture
+def index():
+    index = BM25Index.from_entries(ENTRIES)
+    knowledge_base.set_retriever(index)
+    yield index
+    knowledge_base.set_retriever(None)
+
+
+def test_crisis_examples_are_separate_filtered_passages(index):
+    passages = passages_from_entries(ENTRIES)
+    assert [p.metadata["flag"] for p in passages] == ["1: Direct Suicidal Statement", "2: Indirect Suicidal Expression", ""]
+
+    best = retrieve("I want to kill myself", 1, CRISIS)[0]
+    assert best["metadata"]["flag"] == "1: Direct Suicidal Statement"
+    assert best["source"] == "bm25" and 0.9 <= best["score"] <= 1.0
+    assert all(r["metadata"]["intervention_type"] == "crisis" for r in retrieve("I want my boss", 3, CRISIS))
+    assert retrieve("my boss keeps adding deadlines", 3)[0]["metadata"]["subsection"] == "Intent: work_stress"
+    # Counselor responses are not scored: "thank you" matches no client wording
+    assert retrieve("thank you", 1, CRISIS) == []
+
+
+def test_filters_follow_bedrock_semantics():
+    metadata = {"approach": "REFLECTIONS on EMOTIONS", "intervention_type": "counseling"}
+
+    assert matches_filter(metadata, {"startsWith": {"key": "approach", "value": "REFLECTIONS"}})
+    assert matches_filter(metadata, {"andAll": [
+        {"notEquals": {"key": "intervention_type", "value": "crisis"}},
+        {"in": {"key": "approach", "value": ["NORMALIZING", "REFLECTIONS on EMOTIONS"]}},
+    ]})
+    assert not matches_filter(metadata, CRISIS)
+    with pytest.raises(ValueError):
+        matches_filter(metadata, {"greaterThan": {"key": "score", "value": 1}})
+
+
+def test_crisis_handler_confirms_bm25_matches_with_the_llm(index):
+    assert score_threshold("crisis_likely") == 1.0
+    model, _ = use_stub(model=StubModel(responses=["NO_CRISIS"]))
+    knowledge_base.set_retriever(index)
+    try:
+        result = json.loads(CrisisHandlerAgent().execute("I want to kill myself"))
+    finally:
+        use_bedrock()
+
+    assert result["flags"] == "" and result["kb_score"] > score_threshold("crisis_possible")
+    assert len(model.calls) == 1
+
+
+def test_every_bm25_lookup_gets_the_llm_check():
+    from benchmarks.kb_backends import report
+
+    stats = report("bm25", load_entries())
+
+    # Word-for-word matches of short benign messages reach the top of the scale...
+    assert get_bm25_index()("thank you", 1, CRISIS)[0]["score"] == 1.0
+    assert stats["counseling"]["p99"] == 1.0
+    # ...and crises can score near 0, so no score skips the check or replaces it
+    for group in ("crisis", "known_crisis", "counseling"):
+        assert stats[group]["ignored"] == 0.0
+        assert stats[group]["crisis_response"] == 0.0
+
+
+@pytest.mark.parametrize("message", ["I bought a rope", "zxqv"])
+def test_low_and_missing_bm25_matches_still_get_the_llm_check(message):
+    use_stub(model=StubModel(responses=["NO_CRISIS"]))
+    knowledge_base.set_retriever(get_bm25_index())
+    try:
+        with usage.open_ledger("crisis") as ledger:
+            result = json.loads(CrisisHandlerAgent().execute(message))
+    finally:
+        use_bedrock()
+
+    assert result["flags"] == ""
+    assert ledger.by_task()["crisis_detect"].calls == 1
+
+
+def test_agent_json_index_builds():
+    passages = get_bm25_index().passages
+    assert sum(p.metadata["intervention_type"] == "crisis" for p in passages) >= 40
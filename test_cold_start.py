@@ -0,0 +1,55 @@
+import pytest
+
+from benchmarks.import_time import LAZY_MODULES, measure, parse_importtime, total_ms
+from lambda_function import warm_up
+from utils import model_registry
+from utils.offline import use_bedrock, use_stub
+from utils.response_cache import ResponseCache, set_response_cache
+from utils.session_store import InMemorySessionStore, set_session_store
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    set_response_cache(ResponseCache())
+    set_session_store(InMemorySessionStore())
+    yield
+    use_bedrock()
+    set_session_store(None)
+
+
+def test_lambda_import_leaves_optional_agents_unloaded():
+    imported = {entry.module for entry in measure("lambda_function")}
+
+    assert "lambda_function" in imported
+    assert not imported & set(LAZY_MODULES)
+
+
+def test_lazy_package_exports_still_resolve():
+    from agents.specialized import reflection_agent, run_technique
+
+    assert callable(reflection_agent) and callable(run_technique)
+
+
+def test_parse_importtime_totals_top_level_imports():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |     _json",
+        "import time:       300 |        400 |   json",
+        "import time:      1000 |       1400 | lambda_function",
+        "import time:        50 |         50 | site",
+    ])
+
+    entries = parse_importtime(stderr)
+
+    assert [(e.module, e.depth) for e in entries] == [("_json", 2), ("json", 1), ("lambda_function", 0), ("site", 0)]
+    assert total_ms(entries) == pytest.approx(1.45)
+
+
+def test_warm_up_builds_shared_agents_before_the_first_turn():
+    use_stub()
+
+    timings = warm_up()
+
+    assert {"model", "crisis_handler", "technique_selector", "relevance_validator", "session_store"} <= set(timings)
+    assert "kb_client" not in timings  # the stub backend needs no boto3 client
+    assert model_registry.registry_stats()["agents"] == 3
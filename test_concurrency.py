@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from config import Config
+from utils.concurrency import Speculation, SpeculationCancelled, Stage, run_dag, run_parallel
+
+
+def _sleeper(seconds, value=None):
+    def task():
+        time.sleep(seconds)
+        return value
+    return task
+
+
+def test_latency_is_max_not_sum():
+    start = time.monotonic()
+    outcomes = run_parallel({f"agent{i}": _sleeper(0.1, i) for i in range(5)})
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.3
+    assert [o.value for o in outcomes.values()] == [0, 1, 2, 3, 4]
+    assert all(o.ok for o in outcomes.values())
+
+
+def test_concurrency_cap():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def task():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+
+    run_parallel({str(i): task for i in range(6)}, max_workers=2)
+
+    assert max(peak) == 2
+
+
+def test_slow_and_failing_tasks_do_not_block_the_rest():
+    def boom():
+        raise RuntimeError("bedrock throttled")
+
+    start = time.monotonic()
+    outcomes = run_parallel(
+        {"fast": _sleeper(0.01, "ok"), "slow": _sleeper(1.0, "late"), "broken": boom},
+        timeout=0.1,
+    )
+
+    assert time.monotonic() - start < 0.5
+    assert outcomes["fast"].value == "ok"
+    assert outcomes["slow"].status == "timeout"
+    assert outcomes["broken"].status == "error"
+    assert "bedrock throttled" in outcomes["broken"].error
+
+
+def test_stop_when_cancels_queued_tasks():
+    outcomes = run_parallel(
+        {str(i): _sleeper(0.05, i == 0) for i in range(8)},
+        max_workers=2,
+        stop_when=lambda outcome: outcome.ok and outcome.value,
+    )
+
+    assert outcomes["0"].value is True
+    assert sum(o.status == "cancelled" for o in outcomes.values()) >= 5
+
+
+def test_cancelled_speculation_stops_at_next_check():
+    reached = []
+
+    def task(cancel):
+        time.sleep(0.05)
+        if cancel.is_set():
+            raise SpeculationCancelled()
+        reached.append(True)
+        return "reply"
+
+    speculation = Speculation(task)
+    speculation.cancel()
+
+    with pytest.raises(Exception):
+        speculation.result(timeout=1)
+    assert reached == []
+    assert Speculation(task).result(timeout=1) == "reply"
+
+
+def test_dag_passes_dependency_values_and_skips_after_failures():
+    def boom():
+        raise RuntimeError("no transcript")
+
+    outcomes = run_dag({
+        "history": Stage(lambda: "Client: hi"),
+        "summary": Stage(lambda history: history.upper(), deps=("history",)),
+        "broken": Stage(boom),
+        "ratings": Stage(lambda broken: broken, deps=("broken",)),
+        "slow": Stage(_sleeper(1.0), timeout=0.05),
+    }, max_workers=2)
+
+    assert outcomes["summary"].value == "CLIENT: HI"
+    assert outcomes["broken"].status == "error"
+    assert outcomes["ratings"].status == "skipped"
+    assert outcomes["slow"].status == "timeout"
+
+
+def test_dag_rejects_cycles():
+    with pytest.raises(ValueError):
+        run_dag({"a": Stage(lambda b: b, deps=("b",)), "b": Stage(lambda a: a, deps=("a",))})
+
+
+def test_failed_specialized_agent_is_left_out_of_synthesis(monkeypatch):
+    from agents import orchestrator
+    from agents.specialized import common
+    from models.client import ClientProfile
+    from utils.offline import use_bedrock, use_stub
+
+    def broken_prompt(*args):
+        raise RuntimeError("bedrock throttled")
+
+    monkeypatch.setitem(common.TECHNIQUE_PROMPTS, "Reflection", ("reflection_agent", broken_prompt))
+    model, _ = use_stub()
+    try:
+        system = orchestrator.CBTCounselingSystem(
+            ClientProfile(age=28, gender="Female", mood="Sad", diagnosis="GAD",
+                          history="Work stress", reason_for_counseling="Work anxiety", goal="Less anxiety"),
+            "I keep dreading my performance review.",
+        )
+        candidates = system._generate_candidate_responses(system.session.history_view(Config.MAX_HISTORY_LENGTH))
+    finally:
+        use_bedrock()
+
+    assert "reflection" not in candidates
+    assert set(candidates) == set(orchestrator.CBTCounselingSystem.CANDIDATE_TECHNIQUES) - {"reflection"}
+    assert not any("bedrock throttled" in call["prompt"] or "Error in" in call["prompt"] for call in model.calls)
+    assert "Error in" not in system.initial_response
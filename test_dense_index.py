@@ -0,0 +1,119 @@
+import json
+import shutil
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from agents.specialized.crisis_handler import CrisisHandlerAgent
+from config import Config
+from utils import knowledge_base, usage
+from utils.bm25_index import passages_from_entries
+from utils.dense_index import DenseIndex, HashingEncoder, get_dense_index, load_or_build, quantize, set_dense_index
+from utils.knowledge_base import configure_kb_backend, retrieve, score_threshold
+from utils.offline import use_bedrock, use_stub
+from utils.rag_lexicon import load_entries
+from utils.stub_model import StubModel
+
+CRISIS = {"equals": {"key": "intervention_type", "value": "crisis"}}
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    yield
+    set_dense_index(None)
+    knowledge_base.set_retriever(None)
+
+
+def test_int8_vectors_keep_the_ranking():
+    passages = passages_from_entries(load_entries())
+    encoder = HashingEncoder()
+    vectors = encoder.encode([p.text for p in passages])
+    quantized, scales = quantize(vectors)
+
+    assert quantized.dtype == np.int8
+    assert np.abs(quantized * scales[:, None] - vectors).max() <= scales.max() / 2 + 1e-6
+
+    index = DenseIndex.build(passages, encoder)
+    best = index("I want to kill myself", 3, CRISIS)
+    assert best[0]["metadata"]["flag"] == "1: Direct Suicidal Statement"
+    assert all(r["metadata"]["intervention_type"] == "crisis" for r in best)
+    assert 0.0 <= best[-1]["score"] <= best[0]["score"] <= 1.0
+
+
+def test_snapshot_is_memory_mapped_and_rebuilt_when_stale(tmp_path):
+    kb = tmp_path / "agent.json"
+    shutil.copy(Config.AGENT_KB_PATH, kb)
+    snapshot = str(tmp_path / "agent.dense.npy")
+
+    built = load_or_build(str(kb), snapshot)
+    loaded = load_or_build(str(kb), snapshot)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert np.array_equal(np.asarray(loaded.vectors), built.vectors)
+
+    entries = json.loads(kb.read_text())
+    kb.write_text(json.dumps(entries[:10]))
+    rebuilt = load_or_build(str(kb), snapshot)
+    assert not isinstance(rebuilt.vectors, np.memmap)
+    assert len(rebuilt.passages) < len(built.passages)
+
+
+def test_shipped_snapshot_loads_without_rebuilding(capsys):
+    index = get_dense_index()
+
+    assert isinstance(index.vectors, np.memmap)
+    assert "rebuilding" not in capsys.readouterr().out
+    # The fitted encoder comes back from the snapshot, not a plain one
+    assert index.encoder.name == "hashing-512-idf"
+
+
+def test_dense_backend_uses_its_own_thresholds():
+    configure_kb_backend("dense")
+
+    assert score_threshold("crisis_possible") == Config.KB_SCORE_THRESHOLDS["dense"]["crisis_possible"]
+    assert retrieve("I took too many pills", 1, CRISIS)[0]["source"] == "dense"
+
+
+def test_clear_crisis_message_gets_the_direct_crisis_response():
+    model, _ = use_stub(model=StubModel(responses=["suicidal ideation", "Please call 000 now."]))
+    configure_kb_backend("dense")
+    try:
+        with usage.open_ledger("crisis") as ledger:
+            result = json.loads(CrisisHandlerAgent().execute("I want to kill myself"))
+    finally:
+        use_bedrock()
+
+    assert result["kb_score"] > Config.KB_SCORE_THRESHOLDS["dense"]["crisis_likely"]
+    assert result["response"] == "Please call 000 now."
+    assert "crisis_detect" not in ledger.by_task()
+
+
+@pytest.mark.parametrize("message", [
+    "nobody would miss me if I was gone",
+    "I am planning to jump off the bridge",
+    "I am going to end it all tonight",
+    "I wish I could go to sleep and never wake up",
+])
+def test_crises_worded_unlike_agent_json_still_get_the_llm_check(message):
+    use_stub(model=StubModel(responses=["NO_CRISIS"]))
+    configure_kb_backend("dense")
+    try:
+        with usage.open_ledger("crisis") as ledger:
+            CrisisHandlerAgent().execute(message)
+    finally:
+        use_bedrock()
+
+    assert ledger.by_task()["crisis_detect"].calls == 1
+
+
+def test_dense_thresholds_check_every_message():
+    from benchmarks.kb_backends import report
+
+    stats = report("dense", load_entries())
+
+    # No score on the local scale is low enough to skip the LLM check
+    for group in ("crisis", "known_crisis", "counseling"):
+        assert stats[group]["ignored"] == 0.0
+    # Crises phrased like agent.json get the direct response, counseling inputs almost never
+    assert stats["known_crisis"]["crisis_response"] >= 0.9
+    assert stats["counseling"]["crisis_response"] <= 0.01
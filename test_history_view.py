@@ -0,0 +1,89 @@
+from agents.specialized.common import latest_client_turn
+from models.session import CounselingSession
+from utils.tokens import estimate_tokens, truncate_to_tokens
+
+
+def _session(n):
+    session = CounselingSession()
+    for i in range(n):
+        session.add_message("Client" if i % 2 == 0 else "Counselor", f"message {i}")
+    return session
+
+
+def test_window_is_bounded_and_tracks_appends():
+    session = _session(30)
+    view = session.history_view(4)
+
+    assert [m.content for m in view.messages()] == ["message 26", "message 27", "message 28", "message 29"]
+    session.add_message("Client", "I can't sleep.\nI keep replaying the meeting.")
+    assert view.messages()[-1].content.startswith("I can't sleep.")
+    assert len(view) == 4
+    assert view.latest_client_turn == "I can't sleep.\nI keep replaying the meeting."
+
+
+def test_render_is_memoized_until_append_or_summary_change():
+    session = _session(6)
+    view = session.history_view(10)
+    first = view.render()
+
+    assert view.render() is first
+    session.add_message("Client", "new")
+    assert view.render() is not first and view.render().endswith("Client: new")
+
+    session.rolling_summary, session.summary_checkpoint = "Earlier: work stress.", 4
+    rendered = session.history_view(10).render()
+    assert rendered.startswith("Summary of earlier conversation: Earlier: work stress.")
+    assert "message 3" not in rendered and "message 4" in rendered
+
+
+def test_session_state_does_not_include_views():
+    session = _session(2)
+    session.history_view(10)
+
+    restored = CounselingSession.from_dict(session.to_dict())
+
+    assert "_views" not in session.to_dict()
+    assert restored.history_view(10).render() == session.history_view(10).render()
+
+
+def test_latest_client_turn_from_string_keeps_continuation_lines():
+    history = "Client: first\nCounselor: ok\nClient: line one\nline two\nCounselor: I hear you"
+
+    assert latest_client_turn(history) == "line one\nline two"
+    assert latest_client_turn("Counselor: hello") == ""
+
+
+def test_token_budget_keeps_recent_turns_and_condenses_the_rest():
+    session = CounselingSession()
+    for i in range(20):
+        speaker = "Client" if i % 2 == 0 else "Counselor"
+        session.add_message(speaker, f"turn {i} " + "I keep worrying about everything at work. " * 40)
+    view = session.history_view(20)
+
+    rendered = view.render(1200)
+
+    assert estimate_tokens(rendered) <= 1200
+    assert rendered.startswith("Earlier turns (condensed): ")
+    assert rendered.splitlines()[-1].startswith("Counselor: turn 19")
+    assert view.render(1200) is rendered
+    assert view.render(100000) == view.render()
+
+
+def test_oversized_latest_message_is_shortened_to_fit():
+    session = CounselingSession()
+    session.add_message("Client", "x" * 20 + " word" * 3000 + " the end")
+
+    rendered = session.history_view(10).render(300)
+
+    assert estimate_tokens(rendered) <= 300
+    assert rendered.startswith("Client: ") and rendered.endswith("the end")
+
+
+def test_truncate_to_tokens_keeps_head_and_tail():
+    text = "start " + "filler " * 500 + "finish"
+
+    short = truncate_to_tokens(text, 50)
+
+    assert estimate_tokens(short) <= 50
+    assert short.startswith("start") and short.endswith("finish") and "[...]" in short
+    assert truncate_to_tokens("short text", 50) == "short text"
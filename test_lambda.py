@@ -1,3 +1,10 @@
+"""
+Local run of the Lambda handlers.
+
+Calls Bedrock by default. For offline runs set CBT_BACKEND=stub (scripted
+outputs), or record a real session once with CBT_BACKEND=record and replay it
+deterministically with CBT_BACKEND=replay (cassette path: CBT_CASSETTE).
+"""
 import json
 from lambda_function import start_session_handler, process_turn_handler, session_summary_handler
 
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from benchmarks.handlers import SCRIPTS, compare, run_benchmark
+from utils import metrics
+from utils.metrics import MetricsCollector, percentile, set_metrics
+from utils.response_cache import ResponseCache, set_response_cache
+from utils.session_store import InMemorySessionStore, set_session_store
+from utils.stub_model import LatencyProfile
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    set_response_cache(ResponseCache())
+    set_session_store(InMemorySessionStore())
+    yield
+    set_metrics(None)
+    set_session_store(None)
+
+
+def test_percentile_interpolates_between_samples():
+    values = [10.0, 20.0, 30.0, 40.0]
+
+    assert percentile(values, 50) == pytest.approx(25.0)
+    assert percentile(values, 100) == 40.0
+    assert percentile([], 95) == 0.0
+
+
+def test_timed_is_a_no_op_without_a_collector():
+    with metrics.timed("stage.anything"):
+        metrics.incr("llm_calls")
+
+    collector = MetricsCollector()
+    set_metrics(collector)
+    with pytest.raises(ValueError):
+        with metrics.timed("stage.failing"):
+            raise ValueError("boom")
+
+    assert collector.summary()["stage.failing"]["count"] == 1
+    assert collector.counters() == {}
+
+
+def test_handler_benchmark_reports_every_handler_and_stage():
+    report = run_benchmark(SCRIPTS[:1], repeat=2, concurrency=2,
+                           llm_latency=LatencyProfile.instant(), retrieval_latency=LatencyProfile.instant())
+
+    turns = len(SCRIPTS[0]["messages"]) - 1
+    assert report["handlers"]["process_turn"]["count"] == 2 * turns
+    assert report["handlers"]["session_summary"]["count"] == 2
+    assert {"stage.crisis_check", "stage.technique_selection", "retrieval", "summary.summary"} <= set(report["stages"])
+    assert report["counters"]["llm_calls"] > 0
+    json.dumps(report)
+    assert compare(report, report)[0].endswith("(+0.0%)")
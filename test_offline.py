@@ -0,0 +1,434 @@
+import json
+import time
+
+import pytest
+
+import lambda_function
+from config import Config
+from lambda_function import (
+    process_turn_handler,
+    process_turn_stream_handler,
+    session_summary_handler,
+    start_session_handler,
+)
+from utils import knowledge_base, model_registry, usage
+from agents.relevance_validator import RelevanceValidationAgent
+from models.session import CounselingSession
+from utils.cassette import Cassette, RecordingModel, recording_retriever, use_cassette
+from utils.offline import use_bedrock, use_stub
+from utils.response_cache import ResponseCache, set_response_cache
+from utils.session_store import InMemorySessionStore, set_session_store
+from utils.llm import complete, prompt_content
+from utils.prompts import PromptTemplates
+from utils.stub_model import LatencyProfile, StubModel, StubRetriever, default_responder
+from utils.tokens import estimate_tokens
+
+
+CLIENT_PROFILE = {
+    "age": 28,
+    "gender": "Female",
+    "mood": "Sad",
+    "diagnosis": "Generalized Anxiety Disorder (GAD)",
+    "history": "Experiencing workplace stress and anxiety about performance reviews",
+    "reason_for_counseling": "Managing work-related anxiety and perfectionism",
+    "goal": "Reduce anxiety and improve work performance",
+}
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    set_response_cache(ResponseCache())
+    set_session_store(InMemorySessionStore())
+    yield
+    use_bedrock()
+    set_session_store(None)
+
+
+def _run_session(messages):
+    start = start_session_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "initial_client_message": messages[0],
+    })}, None)
+    body = json.loads(start["body"])
+    replies = [body["initial_response"]]
+    state = body["session_state"]
+    for message in messages[1:]:
+        turn = process_turn_handler({"body": json.dumps({
+            "session_state": state,
+            "client_message": message,
+            "client_profile": CLIENT_PROFILE,
+        })}, None)
+        body = json.loads(turn["body"])
+        replies.append(body["response"])
+        state = body["session_state"]
+    return replies, state
+
+
+def test_stub_backend_runs_all_handlers_offline():
+    model, retriever = use_stub()
+
+    replies, state = _run_session([
+        "I can't stop worrying about making mistakes at work.",
+        "My boss will fire me if I'm not perfect.",
+    ])
+
+    assert all(replies)
+    assert len(state["messages"]) == 4
+    assert model.calls and retriever.calls
+
+    chat_history = [{"role": m["speaker"], "message": m["content"]} for m in state["messages"]]
+    summary = session_summary_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "chat_history": chat_history,
+    })}, None)
+    assert summary["statusCode"] == 200
+    assert json.loads(summary["body"])["agendaTopic"]
+
+
+def test_summary_reuses_turn_annotations(monkeypatch):
+    model, retriever = use_stub()
+    monkeypatch.setattr(Config, "ANNOTATE_RELEVANCE", True)
+    start_relevance_check = lambda_function._start_relevance_check
+
+    def finished_relevance_check(message):
+        # The turn only keeps a verdict that is already back; make sure it is
+        relevance = start_relevance_check(message)
+        relevance.result()
+        return relevance
+
+    monkeypatch.setattr(lambda_function, "_start_relevance_check", finished_relevance_check)
+    _, state = _run_session([
+        "I can't stop worrying about making mistakes at work.",
+        "My boss will fire me if I'm not perfect.",
+        "I lie awake going over every email I sent.",
+    ])
+    client = [m for m in state["messages"] if m["speaker"] == "Client"]
+    counselor = [m for m in state["messages"] if m["speaker"] == "Counselor"]
+    assert all({"crisis_flags", "kb_score", "relevant"} <= m["annotations"].keys() for m in client)
+    assert all(m["annotations"]["technique"] in Config.THERAPY_AGENTS for m in counselor)
+
+    model.calls.clear()
+    retriever.calls.clear()
+    chat_history = [
+        {"role": m["speaker"], "message": m["content"], "annotations": m["annotations"]}
+        for m in state["messages"]
+    ]
+    summary = session_summary_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "chat_history": chat_history,
+    })}, None)
+
+    assert json.loads(summary["body"])["sectionStatus"]["flags"] == "ok"
+    assert not retriever.calls
+    systems = [call["system_prompt"].lower() for call in model.calls]
+    assert not any("crisis" in s or "relevance validation" in s for s in systems)
+
+
+def test_turns_make_no_relevance_call_by_default():
+    use_stub()
+
+    with usage.open_ledger("test") as ledger:
+        _run_session(["I feel overwhelmed at work."])
+
+    assert "relevance_check" not in ledger.by_task()
+
+
+def test_turn_does_not_wait_for_relevance_verdict(monkeypatch):
+    use_stub()
+    monkeypatch.setattr(Config, "ANNOTATE_RELEVANCE", True)
+    verdicts = []
+
+    def slow_verdict(self, message):
+        time.sleep(1.0)
+        verdicts.append(message)
+        return "RELEVANT"
+
+    monkeypatch.setattr(RelevanceValidationAgent, "execute", slow_verdict)
+    start = time.perf_counter()
+    _, state = _run_session(["I feel overwhelmed at work."])
+
+    assert time.perf_counter() - start < 0.8
+    client = next(m for m in state["messages"] if m["speaker"] == "Client")
+    assert "relevant" not in client["annotations"]
+
+
+@pytest.mark.parametrize("stream", [False, True], ids=["whole", "stream"])
+def test_failed_crisis_check_cancels_background_work(monkeypatch, stream):
+    use_stub()
+    monkeypatch.setattr(Config, "ANNOTATE_RELEVANCE", True)
+    session = CounselingSession()
+    started = []
+    start_relevance_check = lambda_function._start_relevance_check
+
+    def tracked_relevance_check(message):
+        started.append(start_relevance_check(message))
+        return started[-1]
+
+    def broken_crisis_check(message):
+        raise RuntimeError("bedrock throttled")
+
+    monkeypatch.setattr(lambda_function, "_start_relevance_check", tracked_relevance_check)
+    monkeypatch.setattr(lambda_function, "_check_crisis", broken_crisis_check)
+    if stream:
+        events = list(lambda_function._stream_turn(session, CLIENT_PROFILE, "I feel overwhelmed at work.", "response"))
+        assert [e["type"] for e in events] == ["error"]
+    else:
+        with pytest.raises(RuntimeError):
+            lambda_function._screened_turn(session, CLIENT_PROFILE, "I feel overwhelmed at work.")
+
+    assert started and started[0].cancelled.is_set()
+    assert session.messages == []
+
+
+def test_batched_relevance_uses_one_call_per_chunk(monkeypatch):
+    model, _ = use_stub()
+    monkeypatch.setattr(Config, "RELEVANCE_BATCH_SIZE", 20)
+    validator = RelevanceValidationAgent()
+    messages = [f"message {i}" for i in range(45)]
+
+    assert validator.classify_batch(messages) == [True] * 45
+    assert len(model.calls) == 3
+
+    model.calls.clear()
+    assert validator.any_relevant([f"other {i}" for i in range(45)], strategy="batch") is True
+    assert len(model.calls) == 1
+
+
+def test_parallel_relevance_stops_at_first_relevant_message(monkeypatch):
+    def responder(system_prompt, prompt):
+        return "RELEVANT" if "anxious" in prompt else "Let's focus on how you've been feeling."
+
+    model, _ = use_stub(model=StubModel(responder, latency=LatencyProfile(first_token_ms=50)))
+    monkeypatch.setattr(Config, "RELEVANCE_MAX_WORKERS", 2)
+    validator = RelevanceValidationAgent()
+    messages = ["I feel anxious"] + [f"what's the weather {i}" for i in range(11)]
+
+    assert validator.any_relevant(messages, strategy="parallel") is True
+    assert len(model.calls) < len(messages)
+    assert validator.any_relevant(messages[1:4], strategy="parallel") is False
+
+
+def test_rolling_summary_checkpoints_and_shrinks_summary_prompt(monkeypatch):
+    model, _ = use_stub()
+    monkeypatch.setattr(Config, "MAX_HISTORY_LENGTH", 4)
+    monkeypatch.setattr(Config, "ROLLING_SUMMARY_UPDATE_EVERY", 2)
+    messages = [f"Turn {i}: I keep worrying that I will mess up at work." for i in range(6)]
+
+    _, state = _run_session(messages)
+
+    assert state["rolling_summary"]
+    assert 0 < state["summary_checkpoint"] <= len(state["messages"]) - 4
+    assert any("Summary of earlier conversation" in call["system_prompt"] for call in model.calls)
+
+    model.calls.clear()
+    chat_history = [{"role": m["speaker"], "message": m["content"]} for m in state["messages"]]
+    session_summary_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "chat_history": chat_history,
+        "rolling_summary": state["rolling_summary"],
+        "summary_checkpoint": state["summary_checkpoint"],
+    })}, None)
+
+    overview = [c for c in model.calls if "session overview" in c["prompt"].lower()]
+    assert len(overview) == 1
+    assert "Turn 0" not in overview[0]["prompt"]
+    assert "Turn 5" in overview[0]["prompt"]
+
+
+def test_summary_returns_partial_results_when_a_section_fails():
+    def responder(system_prompt, prompt):
+        if "clinical supervisor" in system_prompt.lower():
+            raise RuntimeError("throttled")
+        return default_responder(system_prompt, prompt)
+
+    use_stub(model=StubModel(responder))
+    chat_history = [
+        {"role": "Client", "message": "I can't stop worrying about work."},
+        {"role": "Counselor", "message": "That sounds exhausting."},
+    ]
+
+    summary = session_summary_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "chat_history": chat_history,
+    })}, None)
+    body = json.loads(summary["body"])
+
+    assert summary["statusCode"] == 200
+    assert body["sectionStatus"]["summary"] == "error"
+    assert body["summary"] == ""
+    assert body["sectionStatus"]["agendaTopic"] == "ok"
+    assert body["agendaTopic"]
+
+
+def test_session_id_mode_sends_only_deltas():
+    use_stub()
+    start = json.loads(start_session_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "initial_client_message": "I feel overwhelmed at work.",
+        "session_mode": "id",
+    })}, None)["body"])
+    assert "session_state" not in start
+    assert start["version"] == 1
+
+    turn = process_turn_handler({"body": json.dumps({
+        "session_id": start["session_id"],
+        "version": start["version"],
+        "client_message": "I keep thinking I will fail.",
+    })}, None)
+    body = json.loads(turn["body"])
+    assert turn["statusCode"] == 200
+    assert body["response"] and "session_state" not in body
+    assert body["version"] == 2
+
+    stale = process_turn_handler({"body": json.dumps({
+        "session_id": start["session_id"],
+        "version": 1,
+        "client_message": "Hello again",
+    })}, None)
+    assert stale["statusCode"] == 409
+    assert json.loads(stale["body"])["version"] == 2
+
+    summary = session_summary_handler({"body": json.dumps({"session_id": start["session_id"]})}, None)
+    assert summary["statusCode"] == 200
+    assert json.loads(summary["body"])["agendaTopic"]
+
+    missing = process_turn_handler({"body": json.dumps({"session_id": "nope", "client_message": "hi"})}, None)
+    assert missing["statusCode"] == 404
+
+
+def test_stub_backend_crisis_path():
+    use_stub()
+
+    start = start_session_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "initial_client_message": "I want to kill myself",
+    })}, None)
+
+    assert json.loads(start["body"])["crisis_detected"] is True
+
+
+@pytest.mark.parametrize("message, crisis", [
+    ("I feel overwhelmed at work.", False),
+    ("I want to kill myself", True),
+])
+def test_speculative_crisis_screening_matches_serial(monkeypatch, message, crisis):
+    use_stub()
+    serial, serial_state = _run_session([message])
+
+    monkeypatch.setattr(Config, "SPECULATIVE_CRISIS_SCREENING", True)
+    speculative, speculative_state = _run_session([message])
+
+    assert speculative == serial
+    assert speculative_state["messages"] == serial_state["messages"]
+    if crisis:
+        assert "000" in speculative[0]
+
+
+def test_speculative_stream_yields_nothing_before_crisis_check(monkeypatch):
+    use_stub()
+    monkeypatch.setattr(Config, "SPECULATIVE_CRISIS_SCREENING", True)
+
+    events = list(process_turn_stream_handler({"body": json.dumps({
+        "session_state": {"messages": []},
+        "client_message": "I want to end my life",
+        "client_profile": CLIENT_PROFILE,
+    })}, None))
+
+    assert [e["type"] for e in events] == ["token", "final"]
+    assert events[-1]["body"]["crisis_detected"] is True
+
+
+def test_stream_handler_yields_tokens_then_final_state():
+    use_stub()
+    _, state = _run_session(["I feel overwhelmed at work."])
+
+    events = list(process_turn_stream_handler({"body": json.dumps({
+        "session_state": state,
+        "client_message": "I keep thinking I will fail.",
+        "client_profile": CLIENT_PROFILE,
+    })}, None))
+
+    tokens = [e["text"] for e in events if e["type"] == "token"]
+    final = events[-1]
+    assert final["type"] == "final"
+    assert len(tokens) > 1
+    assert "".join(tokens) == final["body"]["response"]
+    assert final["body"]["session_state"]["messages"][-1]["content"] == final["body"]["response"]
+
+
+def test_failed_stream_ends_with_an_error_event(monkeypatch):
+    from agents.specialized import common
+
+    def interrupted(prompt, message, task):
+        yield "That sounds "
+        yield "really "
+        raise ConnectionError("stream interrupted")
+
+    use_stub()
+    _, state = _run_session(["I feel overwhelmed at work."])
+    monkeypatch.setattr(common, "stream_complete", interrupted)
+
+    events = list(process_turn_stream_handler({"body": json.dumps({
+        "session_state": state,
+        "client_message": "I keep thinking I will fail.",
+        "client_profile": CLIENT_PROFILE,
+    })}, None))
+
+    assert [e["type"] for e in events] == ["token", "token", "error"]
+    assert events[-1]["statusCode"] == 500
+    assert not any("Error in" in e.get("text", "") for e in events)
+
+
+def test_cassette_replays_recorded_session(tmp_path):
+    path = str(tmp_path / "session.json")
+    cassette = Cassette(path)
+    inner = StubModel(model_id=Config.DEFAULT_MODEL)
+    model_registry.set_model_factory(lambda *args: RecordingModel(inner, cassette))
+    knowledge_base.set_retriever(recording_retriever(cassette, StubRetriever()))
+    messages = ["I feel overwhelmed at work.", "I keep thinking I will fail."]
+    recorded, _ = _run_session(messages)
+    cassette.save()
+
+    use_cassette(path, mode="replay")
+    replayed, _ = _run_session(messages)
+
+    assert replayed == recorded
+
+
+def test_stub_serves_repeated_static_prefix_from_prompt_cache():
+    model, _ = use_stub()
+
+    complete(PromptTemplates.crisis_flag_prompt("I can't sleep"), "I can't sleep", task="crisis_flag")
+    complete(PromptTemplates.crisis_flag_prompt("I feel alone"), "I feel alone", task="crisis_flag")
+
+    stats = model.prefix_cache_stats()
+    static = PromptTemplates.crisis_flag_prompt("x").static
+    assert stats["requests"] == 2 and stats["cache_hits"] == 1
+    assert stats["cache_read_tokens"] == estimate_tokens(static)
+    assert model.calls[1]["system_prompt"] == PromptTemplates.crisis_flag_prompt("I feel alone")
+
+
+def test_cache_points_only_for_models_that_support_them(monkeypatch):
+    class BedrockLike(StubModel):
+        supports_cache_points = None
+
+    prompt = PromptTemplates.session_summary_prompt(CLIENT_PROFILE, "Client: hello")
+
+    blocks = prompt_content(prompt, BedrockLike(model_id="anthropic.claude-3-5-haiku-20241022-v1:0"))
+    assert blocks == [{"text": prompt.static}, {"cachePoint": {"type": "default"}}, {"text": prompt.dynamic}]
+    assert prompt_content(prompt, BedrockLike(model_id=Config.DEFAULT_MODEL)) is prompt
+    assert prompt_content("plain prompt", StubModel()) == "plain prompt"
+    monkeypatch.setattr(Config, "PROMPT_CACHE_POINTS", False)
+    assert prompt_content(prompt, StubModel()) is prompt
+
+
+def test_recording_model_sends_the_prompt_shape_of_the_model_it_wraps(tmp_path):
+    cassette = Cassette(str(tmp_path / "session.json"))
+    prompt = PromptTemplates.crisis_flag_prompt("I can't sleep")
+
+    recording = RecordingModel(StubModel(model_id=Config.DEFAULT_MODEL), cassette)
+    assert recording.supports_cache_points is True
+    assert prompt_content(prompt, recording) == prompt_content(prompt, StubModel(model_id=Config.DEFAULT_MODEL))
+
+    complete(prompt, "I can't sleep", task="crisis_flag", model=recording)
+    assert cassette.entries["llm"][0]["request"]["system_prompt"] == prompt
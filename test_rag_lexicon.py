@@ -0,0 +1,62 @@
+import pytest
+
+from agents.specialized.common import generate_kb_queries
+from config import Config
+from utils import usage
+from utils.offline import use_bedrock, use_stub
+from utils.rag_lexicon import ConceptLexicon, get_lexicon, load_entries, set_lexicon
+from utils.response_cache import ResponseCache, set_response_cache
+
+ENTRIES = [
+    {"section": "CBT COTHERAPIST BOT TRAINING RESPONSES", "subsection": "Intent: work_stress",
+     "module": "Distress Tolerance & Coping Skills", "approach": "REFLECTIONS",
+     "content": 'Client Input: "My boss keeps adding deadlines"\nClient Input: "Work is crushing me"'},
+    {"section": "CBT COTHERAPIST BOT TRAINING RESPONSES", "subsection": "Intent: specific_phobia",
+     "module": "Behavioural Interventions", "approach": "NORMALIZING",
+     "content": 'Client Input: "I panic when I see spiders"'},
+    {"section": "Comprehensive Crisis Scenarios", "subsection": "SUICIDAL IDEATION",
+     "module": "CBT Foundations", "approach": "NORMALIZING",
+     "content": 'Client Input: "I want to end it all"'},
+]
+
+
+@pytest.fixture(autouse=True)
+def stub_backend():
+    set_response_cache(ResponseCache())
+    use_stub()
+    yield
+    set_lexicon(None)
+    use_bedrock()
+
+
+def test_lexicon_matches_turns_to_concepts_but_not_crisis_scenarios():
+    lexicon = ConceptLexicon.from_entries(ENTRIES)
+
+    assert [c.name for c in lexicon.concepts] == ["work stress", "specific phobia"]
+    assert lexicon.queries("My boss set three deadlines for Friday", max_concepts=1) == [
+        "My boss set three deadlines for Friday",
+        "work stress in CBT: distress tolerance & coping skills",
+    ]
+    assert lexicon.queries("hmm") == ["hmm"]
+
+
+def test_leave_one_out_drops_the_excluded_example():
+    lexicon = ConceptLexicon.from_entries(ENTRIES, exclude_inputs={"I panic when I see spiders"})
+
+    assert lexicon.score("spiders") == []
+
+
+def test_local_mode_derives_queries_without_a_model_call(monkeypatch):
+    monkeypatch.setattr(Config, "RAG_QUERY_MODE", "local")
+    set_lexicon(ConceptLexicon.from_entries(ENTRIES))
+
+    with usage.open_ledger("turn") as ledger:
+        queries = generate_kb_queries("Work is crushing me lately")
+
+    assert queries[1] == "work stress in CBT: distress tolerance & coping skills"
+    assert ledger.totals().calls == 0
+
+
+def test_agent_json_lexicon_loads():
+    assert len(get_lexicon().concepts) > 20
+    assert len(load_entries()) > len(get_lexicon().concepts)
@@ -0,0 +1,54 @@
+import time
+
+from utils.response_cache import ResponseCache, cache_key
+
+
+def test_key_depends_on_every_input():
+    base = cache_key("model", "system", "thank you", {"temperature": 0})
+    assert base == cache_key("model", "system", "thank you", {"temperature": 0})
+    assert base != cache_key("other", "system", "thank you", {"temperature": 0})
+    assert base != cache_key("model", "system 2", "thank you", {"temperature": 0})
+    assert base != cache_key("model", "system", "ok", {"temperature": 0})
+    assert base != cache_key("model", "system", "thank you", {"temperature": 0.7})
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_ttl_expires_entries():
+    cache = ResponseCache(ttl_seconds=0.01)
+    cache.put("a", "1")
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+
+
+def test_sqlite_tier_survives_new_instance(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(db_path=db_path).put("a", "RELEVANT")
+
+    cache = ResponseCache(db_path=db_path)
+    assert cache.get("a") == "RELEVANT"
+    assert cache.get("a") == "RELEVANT"
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_counters():
+    cache = ResponseCache()
+    cache.get("missing")
+    cache.put("a", "1")
+    cache.get("a")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["writes"]) == (1, 1, 1)
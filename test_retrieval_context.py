@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from agents.specialized.common import RetrievalContext, build_retrieval_context, run_technique
+from config import Config
+from utils import usage
+from utils.knowledge_base import retrieve_batch
+from utils.offline import use_bedrock, use_stub
+from utils.stub_model import LatencyProfile, StubRetriever
+
+PASSAGES = {
+    "REFLECTIONS on EMOTIONS": "Name the feeling the client describes.",
+    "NORMALIZING": "Many people feel this way before a review.",
+    "QUESTIONS on PERSPECTIVES": "Ask what a friend would say.",
+}
+
+
+def _results(text, number_of_results, metadata_filter):
+    return [
+        {"text": f"Section: Training\nApproach: {approach}\nContent: {content}",
+         "score": 0.8, "metadata": {}, "source": "stub"}
+        for approach, content in PASSAGES.items()
+    ][:number_of_results]
+
+
+@pytest.fixture
+def stubs():
+    model, retriever = use_stub(retriever=StubRetriever(results=_results))
+    yield model, retriever
+    use_bedrock()
+
+
+def test_one_context_serves_every_specialized_agent(stubs):
+    model, retriever = stubs
+
+    with usage.open_ledger("turn") as ledger:
+        context = build_retrieval_context("I keep dreading my performance review.")
+        replies = {
+            technique: run_technique(technique, "client", "anxiety", "Client: I keep dreading my performance review.", context)
+            for technique in Config.THERAPY_AGENTS
+        }
+
+    assert all(replies.values())
+    assert ledger.by_task()["rag_query"].calls == 1
+    assert len(retriever.calls) == len(context.queries)
+    # The same passages come back for every query; each is kept once
+    assert len(context.passages) == len(PASSAGES)
+
+
+def test_agents_keep_the_passages_of_their_approach():
+    context = RetrievalContext("turn", ["q"], [r for r in _results("q", 3, None)])
+
+    assert context.kb_text("Normalization") == PASSAGES["NORMALIZING"]
+    assert context.kb_text("Questioning") == PASSAGES["QUESTIONS on PERSPECTIVES"]
+    # No passage of its approach: the agent gets all of them
+    assert len(context.passages_for("Providing solutions")) == len(PASSAGES)
+
+
+def test_batch_sends_each_distinct_query_once_and_concurrently():
+    def by_query(text, number_of_results, metadata_filter):
+        shared = {"text": "Content: shared", "score": 0.9 if "panic" in text else 0.75, "metadata": {}}
+        own = {"text": f"Content: {text}", "score": 0.5, "metadata": {}}
+        return [shared, own][:number_of_results]
+
+    retriever = StubRetriever(results=by_query, latency=LatencyProfile(first_token_ms=100))
+    use_stub(retriever=retriever)
+    try:
+        start = time.perf_counter()
+        results = retrieve_batch(["panic attacks", "Panic  attacks ", "avoidance", "worry"],
+                                 number_of_results=2, min_score=0.7)
+        elapsed = time.perf_counter() - start
+    finally:
+        use_bedrock()
+
+    assert sorted(call["text"] for call in retriever.calls) == ["avoidance", "panic attacks", "worry"]
+    assert elapsed < 0.25
+    # One merged passage above the threshold, with the best score and every query that found it
+    assert len(results) == 1
+    assert results[0]["score"] == 0.9
+    assert sorted(results[0]["queries"]) == ["Panic  attacks ", "avoidance", "panic attacks", "worry"]
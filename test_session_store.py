@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from utils.session_store import (
+    InMemorySessionStore,
+    SessionNotFoundError,
+    SessionStore,
+    SQLiteSessionStore,
+    VersionConflictError,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore(max_entries=10)
+    return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+
+
+def test_create_load_save_bumps_version(store):
+    session_id, version = store.create({"session_state": {"messages": []}})
+    record, loaded_version = store.load(session_id)
+
+    assert (version, loaded_version) == (1, 1)
+    record["session_state"]["messages"].append({"speaker": "Client", "content": "hi"})
+    assert store.save(session_id, record, expected_version=1) == 2
+    assert store.load(session_id) == (record, 2)
+
+
+def test_stale_save_raises_conflict(store):
+    session_id, _ = store.create({"n": 0})
+    store.save(session_id, {"n": 1}, expected_version=1)
+
+    with pytest.raises(VersionConflictError) as excinfo:
+        store.save(session_id, {"n": "stale"}, expected_version=1)
+
+    assert excinfo.value.current_version == 2
+    assert store.load(session_id) == ({"n": 1}, 2)
+
+
+def test_unknown_session(store):
+    with pytest.raises(SessionNotFoundError):
+        store.load("missing")
+    with pytest.raises(SessionNotFoundError):
+        store.save("missing", {}, expected_version=1)
+
+
+def test_memory_store_is_lru_bounded_and_isolated():
+    store = InMemorySessionStore(max_entries=2)
+    first, _ = store.create({"n": 1})
+    second, _ = store.create({"n": 2})
+    store.load(first)
+    third, _ = store.create({"n": 3})
+
+    with pytest.raises(SessionNotFoundError):
+        store.load(second)
+    record, _ = store.load(first)
+    record["n"] = "mutated"
+    assert store.load(first)[0] == {"n": 1}
+    assert store.load(third)[0] == {"n": 3}
+
+
+def test_sqlite_store_does_not_revive_expired_sessions(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl_seconds=60)
+    session_id, _ = store.create({"n": 0})
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+
+    with pytest.raises(SessionNotFoundError):
+        store.save(session_id, {"n": 1}, expected_version=1)
+    with pytest.raises(SessionNotFoundError):
+        store.load(session_id)
+
+
+def test_incomplete_store_fails_when_created():
+    class LoadOnly(SessionStore):
+        def load(self, session_id):
+            raise SessionNotFoundError(session_id)
+
+    with pytest.raises(TypeError):
+        LoadOnly()
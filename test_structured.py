@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from config import Config
+from models.outputs import Agenda, TechniqueSelection
+from utils.offline import use_bedrock, use_stub
+from utils.response_cache import ResponseCache, set_response_cache
+from utils.structured import compact_schema, parse, structured_complete
+from utils.stub_model import StubModel
+
+GOOD = json.dumps({"techniques": [{"technique": "Questioning", "score": 0.8}]})
+
+
+@pytest.fixture(autouse=True)
+def stub_backend():
+    set_response_cache(ResponseCache())
+    use_stub()
+    yield
+    use_bedrock()
+
+
+def test_compact_schema_is_a_small_skeleton():
+    schema = json.loads(compact_schema(TechniqueSelection))
+
+    assert schema == {"techniques": [{"technique": "|".join(Config.THERAPY_AGENTS), "score": "number 0-1"}]}
+    assert len(compact_schema(Agenda)) < len(json.dumps(Agenda.model_json_schema())) / 3
+
+
+def test_parse_tolerates_fences_prose_and_bare_lists():
+    fenced = f"Here you go:\n```json\n{GOOD}\n```"
+    bare = '[{"technique": "Reflection", "score": 0.9}]'
+
+    assert parse(TechniqueSelection, fenced).techniques[0].technique == "Questioning"
+    assert parse(TechniqueSelection, bare).techniques[0].technique == "Reflection"
+    with pytest.raises(ValueError):
+        parse(TechniqueSelection, '[{"technique": "Hypnosis", "score": 0.9}]')
+    with pytest.raises(ValueError):
+        parse(TechniqueSelection, "Reflection seems best here.")
+
+
+@pytest.mark.parametrize("mode", ["json", "native"])
+def test_one_repair_call_after_a_bad_output(monkeypatch, mode):
+    monkeypatch.setattr(Config, "STRUCTURED_OUTPUT_MODE", mode)
+    model = StubModel(responses=["Reflection, definitely.", GOOD])
+
+    result = structured_complete("Pick a technique.", "Dialogue", TechniqueSelection, "technique_selection", model)
+
+    assert result.techniques[0].technique == "Questioning"
+    assert len(model.calls) == 2
+
+
+@pytest.mark.parametrize("mode", ["json", "native"])
+def test_selector_falls_back_to_the_default_technique(monkeypatch, mode):
+    from agents.technique_selector import TechniqueSelectorAgent
+
+    monkeypatch.setattr(Config, "STRUCTURED_OUTPUT_MODE", mode)
+    model = StubModel(responses="I am not sure.")
+    selector = TechniqueSelectorAgent()
+    selector.model = model
+
+    best = selector.execute("Client: I feel anxious.")
+
+    assert best["technique"] == Config.DEFAULT_TECHNIQUE
+    assert len(model.calls) == 2
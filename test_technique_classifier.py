@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from agents.technique_selector import TechniqueSelectorAgent
+from benchmarks.technique_classifier import cassette_examples, evaluate
+from config import Config
+from utils.offline import use_bedrock, use_stub
+from utils.response_cache import ResponseCache, set_response_cache
+from utils.stub_model import StubModel
+from utils.technique_classifier import (
+    TechniqueClassifier,
+    history_text,
+    session_examples,
+    set_technique_classifier,
+)
+
+# Client phrasing that (in these synthetic logs) always led to the same technique
+PHRASES = {
+    "Reflection": ["I feel so sad and alone tonight", "I just feel empty and hurt"],
+    "Questioning": ["I don't know why it keeps happening", "something happened at work again"],
+    "Providing solutions": ["what can I do to sleep better", "how do I stop procrastinating"],
+    "Normalization": ["is it weird that I cry at work", "am I crazy for feeling this nervous"],
+    "Psycho-education": ["why does anxiety make my heart race", "what is a panic attack exactly"],
+}
+
+
+def _examples(repeat=3):
+    return [
+        (f"Counselor: Hello, what brings you here?\nClient: {phrase}", technique)
+        for _ in range(repeat)
+        for technique, phrases in PHRASES.items()
+        for phrase in phrases
+    ]
+
+
+@pytest.fixture(autouse=True)
+def no_classifier():
+    set_response_cache(ResponseCache())
+    use_stub()
+    yield
+    set_technique_classifier(None)
+    use_bedrock()
+
+
+@pytest.fixture
+def classifier():
+    return TechniqueClassifier().fit(_examples())
+
+
+def test_classifier_learns_logged_choices_and_round_trips(classifier, tmp_path):
+    report = evaluate(classifier, _examples(repeat=1))
+    assert report["agreement"] == 1.0
+    assert report["latency_us"]["p50"] < 5000
+
+    path = tmp_path / "classifier.json"
+    classifier.save(str(path))
+    loaded = TechniqueClassifier.load(str(path))
+    history = "Client: what can I do to sleep better"
+    assert loaded.predict(history)[0] == classifier.predict(history)[0] == "Providing solutions"
+    assert sum(loaded.predict_proba(history).values()) == pytest.approx(1.0)
+
+
+def test_session_examples_skip_the_classifiers_own_choices():
+    messages = [
+        {"speaker": "Client", "content": "I feel sad.", "annotations": {}},
+        {"speaker": "Counselor", "content": "That sounds hard.",
+         "annotations": {"technique": "Reflection", "technique_source": "llm"}},
+        {"speaker": "Client", "content": "Why do I feel like this?", "annotations": {}},
+        {"speaker": "Counselor", "content": "Anxiety can...",
+         "annotations": {"technique": "Psycho-education", "technique_source": "classifier"}},
+    ]
+
+    assert session_examples({"messages": messages}) == [("Client: I feel sad.", "Reflection")]
+    assert len(session_examples({"messages": messages}, include_classifier=True)) == 2
+    assert history_text(messages[:3]).endswith("Client: Why do I feel like this?")
+
+
+def test_cassette_examples_use_the_recorded_llm_choice(tmp_path):
+    path = tmp_path / "cassette.json"
+    path.write_text(json.dumps({"llm": [{
+        "key": "k",
+        "request": {"system_prompt": "You are a counselor selecting psychological techniques.\n"
+                                     "Counseling Dialogue: Client: I feel sad.\n\n"},
+        "response": json.dumps({"techniques": [{"technique": "Questioning", "score": 0.4},
+                                               {"technique": "Reflection", "score": 0.9}]}),
+    }]}))
+
+    assert cassette_examples(str(path)) == [("Client: I feel sad.", "Reflection")]
+
+
+def test_selector_defers_to_the_llm_below_the_threshold(classifier, monkeypatch):
+    set_technique_classifier(classifier)
+    model = StubModel(responses=json.dumps({"techniques": [{"technique": "Normalization", "score": 0.7}]}))
+    selector = TechniqueSelectorAgent()
+    selector.model = model
+
+    confident = selector.execute("Client: how do I stop procrastinating")
+    assert confident["source"] == "classifier" and confident["technique"] == "Providing solutions"
+    assert model.calls == []
+
+    monkeypatch.setattr(Config, "TECHNIQUE_CLASSIFIER_THRESHOLD", 1.01)
+    deferred = selector.execute("Client: how do I stop procrastinating")
+    assert deferred == {"technique": "Normalization", "score": 0.7, "source": "llm"}
+    assert len(model.calls) == 1
+
+
+def test_training_history_matches_what_the_selector_sees(monkeypatch):
+    import lambda_function
+    from models.session import CounselingSession
+
+    messages = [
+        {"speaker": "Client" if i % 2 == 0 else "Counselor", "content": f"Turn {i}: " + "worried about work " * 40,
+         "annotations": {}}
+        for i in range(24)
+    ]
+    messages[-1]["annotations"] = {"technique": "Questioning", "technique_source": "llm"}
+    seen = []
+    monkeypatch.setattr(TechniqueSelectorAgent, "execute",
+                        lambda self, history: seen.append(history) or {"technique": "Questioning", "source": "llm"})
+
+    lambda_function._select_technique(CounselingSession.from_dict({"messages": [dict(m) for m in messages[:-1]]}))
+
+    (history, technique), = session_examples({"messages": messages})
+    assert technique == "Questioning"
+    assert history == seen[0]
+    assert len(history) < len("\n".join(f"{m['speaker']}: {m['content']}" for m in messages[-11:-1]))
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from config import Config
+from lambda_function import process_turn_handler, process_turn_stream_handler, start_session_handler
+from utils import tracing
+from utils.offline import use_bedrock, use_stub
+from utils.response_cache import ResponseCache, set_response_cache
+from utils.session_store import InMemorySessionStore, set_session_store
+
+CLIENT_PROFILE = {
+    "age": 28,
+    "gender": "Female",
+    "mood": "Sad",
+    "diagnosis": "Generalized Anxiety Disorder (GAD)",
+    "history": "Experiencing workplace stress and anxiety about performance reviews",
+    "reason_for_counseling": "Managing work-related anxiety and perfectionism",
+    "goal": "Reduce anxiety and improve work performance",
+}
+
+
+@pytest.fixture(autouse=True)
+def stub_backend():
+    set_response_cache(ResponseCache())
+    set_session_store(InMemorySessionStore())
+    use_stub()
+    yield
+    use_bedrock()
+    set_session_store(None)
+
+
+def _turn(message, extra=None):
+    start = json.loads(start_session_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "initial_client_message": "I feel overwhelmed at work.",
+    })}, None)["body"])
+    return json.loads(process_turn_handler({"body": json.dumps({
+        "session_state": start["session_state"],
+        "client_message": message,
+        "client_profile": CLIENT_PROFILE,
+        **(extra or {}),
+    })}, None)["body"])
+
+
+def test_timings_are_returned_only_when_requested(monkeypatch):
+    monkeypatch.setattr(Config, "ANNOTATE_RELEVANCE", True)
+    assert "timings" not in _turn("I keep thinking I will fail.")
+
+    timings = _turn("Everyone will see I'm a fraud.", {"include_timings": True})["timings"]
+
+    spans = {span["id"]: span for span in timings["spans"]}
+    root = next(span for span in spans.values() if span["parent"] is None)
+    assert root["name"] == "process_turn"
+    assert all(span["parent"] in spans for span in spans.values() if span is not root)
+    assert {"parse.request", "parse.session_state", "stage.crisis_check", "retrieval",
+            "llm.technique_selection", "serialize.session_state"} <= set(timings["by_name"])
+    # Spans recorded on worker threads still hang off the request
+    relevance = [s for s in spans.values() if s["name"] == "llm.relevance_check"]
+    assert relevance and relevance[0]["thread"] != root["thread"]
+
+
+def test_streamed_turn_is_traced_until_the_stream_ends(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "TRACE_DIR", str(tmp_path))
+    start = json.loads(start_session_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "initial_client_message": "I feel overwhelmed at work.",
+    })}, None)["body"])
+
+    events = list(process_turn_stream_handler({"body": json.dumps({
+        "session_state": start["session_state"],
+        "client_message": "I keep thinking I will fail.",
+        "client_profile": CLIENT_PROFILE,
+        "include_timings": True,
+    })}, None))
+
+    assert all("timings" not in e.get("body", {}) for e in events[:-1])
+    timings = events[-1]["body"]["timings"]
+    root = next(span for span in timings["spans"] if span["parent"] is None)
+    assert root["name"] == "process_turn"
+    # The root span covers the streamed reply, not just the call that created the generator
+    assert {"parse.request", "stage.crisis_check", "llm.specialized_response",
+            "serialize.session_state"} <= set(timings["by_name"])
+    assert len(list(tmp_path.glob("process_turn-*.json"))) == 1
+    assert tracing.current_trace() is None
+
+
+def test_traces_are_exported_in_chrome_format(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "TRACING", True)
+    monkeypatch.setattr(Config, "TRACE_DIR", str(tmp_path))
+
+    body = _turn("I keep thinking I will fail.")
+
+    assert "timings" not in body
+    files = sorted(tmp_path.glob("process_turn-*.json"))
+    assert len(files) == 1
+    trace = json.loads(files[0].read_text())
+    complete_events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert {"process_turn", "stage.technique_response"} <= {e["name"] for e in complete_events}
+    assert all(e["dur"] >= 0 and "span_id" in e["args"] for e in complete_events)
+
+
+def test_span_is_a_no_op_outside_a_trace():
+    with tracing.span("orphan"):
+        pass
+    assert tracing.current_trace() is None
@@ -0,0 +1,145 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from config import Config
+from lambda_function import process_turn_handler, process_turn_stream_handler, start_session_handler
+from utils import usage
+from utils.offline import use_bedrock, use_stub
+from utils.response_cache import ResponseCache, set_response_cache
+from utils.session_store import InMemorySessionStore, set_session_store
+
+CLIENT_PROFILE = {
+    "age": 28,
+    "gender": "Female",
+    "mood": "Sad",
+    "diagnosis": "Generalized Anxiety Disorder (GAD)",
+    "history": "Experiencing workplace stress and anxiety about performance reviews",
+    "reason_for_counseling": "Managing work-related anxiety and perfectionism",
+    "goal": "Reduce anxiety and improve work performance",
+}
+
+
+@pytest.fixture(autouse=True)
+def stub_backend():
+    set_response_cache(ResponseCache())
+    set_session_store(InMemorySessionStore())
+    use_stub()
+    yield
+    use_bedrock()
+    set_session_store(None)
+
+
+def _start(extra=None):
+    return json.loads(start_session_handler({"body": json.dumps({
+        "client_profile": CLIENT_PROFILE,
+        "initial_client_message": "I feel overwhelmed at work.",
+        **(extra or {}),
+    })}, None)["body"])
+
+
+def _turn(state, message, extra=None):
+    return json.loads(process_turn_handler({"body": json.dumps({
+        "session_state": state,
+        "client_message": message,
+        "client_profile": CLIENT_PROFILE,
+        **(extra or {}),
+    })}, None)["body"])
+
+
+def test_usage_is_reported_per_handler_and_accumulated_per_session():
+    start = _start()
+    assert "usage" not in start
+    first_session = start["session_state"]["llm_usage"]
+
+    body = _turn(start["session_state"], "I keep thinking I will fail.", {"include_usage": True})
+
+    turn = body["usage"]
+    assert {"technique_selection", "rag_query", "specialized_response"} <= set(turn["by_task"])
+    assert turn["total"]["calls"] == sum(t["calls"] for t in turn["by_task"].values())
+    assert turn["total"]["input_tokens"] > 0 and turn["total"]["output_tokens"] > 0
+    session = body["session_state"]["llm_usage"]
+    for task, used in turn["by_task"].items():
+        assert session[task]["calls"] == used["calls"] + first_session.get(task, {}).get("calls", 0)
+
+
+def test_turn_budget_skips_optional_stages_only(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_CALL_BUDGET_PER_TURN", 1)
+
+    body = _start({"include_usage": True})
+
+    by_task = body["usage"]["by_task"]
+    assert body["initial_response"]
+    assert by_task["rag_query"]["calls"] == 0 and by_task["rag_query"]["skipped"] >= 1
+    # Required calls are made (and counted) even past the budget
+    assert by_task["technique_selection"]["calls"] == 1
+    assert by_task["specialized_response"]["calls"] == 1
+
+
+def test_session_budget_uses_the_stored_session_usage(monkeypatch):
+    start = _start()
+    spent = sum(t["calls"] for t in start["session_state"]["llm_usage"].values())
+    monkeypatch.setattr(Config, "LLM_CALL_BUDGET_PER_SESSION", spent)
+
+    body = _turn(start["session_state"], "Everyone will see I'm a fraud.", {"include_usage": True})
+
+    assert body["usage"]["by_task"]["rag_query"]["skipped"] >= 1
+
+
+def test_streamed_turns_are_metered_and_budgeted(monkeypatch):
+    start = _start()
+    spent = start["session_state"]["llm_usage"]
+    monkeypatch.setattr(Config, "LLM_CALL_BUDGET_PER_TURN", 1)
+
+    events = process_turn_stream_handler({"body": json.dumps({
+        "session_state": start["session_state"],
+        "client_message": "I keep thinking I will fail.",
+        "client_profile": CLIENT_PROFILE,
+        "include_usage": True,
+    })}, None)
+    # A UI server may resume the stream on a different worker thread each time
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        collected = []
+        while (event := pool.submit(next, events, None).result()) is not None:
+            collected.append(event)
+
+    body = collected[-1]["body"]
+    assert body["usage"]["by_task"]["rag_query"]["skipped"] >= 1
+    assert body["usage"]["by_task"]["specialized_response"]["calls"] == 1
+    session = body["session_state"]["llm_usage"]
+    assert session["specialized_response"]["calls"] == spent["specialized_response"]["calls"] + 1
+    assert usage.current_ledger() is None
+
+
+def test_ledger_adds_to_parents_and_checks_their_budgets():
+    session = usage.Ledger("session", usage.Budget(max_tokens=100))
+    with usage.open_ledger("handler") as handler:
+        with usage.open_ledger("turn", usage.Budget(max_calls=5), parents=[session]) as turn:
+            usage.record("rag_query", 60, 20, 12.5)
+            assert turn.exhausted_by(0) is None
+            assert turn.exhausted_by(30) == "session"
+            assert not usage.allows("rag_query", "x" * 200)
+            assert usage.allows("specialized_response", "x" * 200)
+
+    for ledger in (handler, turn, session):
+        assert ledger.by_task()["rag_query"] == usage.TaskUsage(1, 60, 20, 0, 12.5, skipped=1)
+    assert usage.current_ledger() is None
+    assert usage.Ledger.from_dict("copy", session.to_dict()).to_dict() == session.to_dict()
+
+
+def test_usage_from_result_prefers_reported_tokens():
+    class Metrics:
+        accumulated_usage = {"inputTokens": 40, "outputTokens": 10, "cacheReadInputTokens": 100}
+
+    class Result:
+        metrics = Metrics()
+
+        def __str__(self):
+            return "reply"
+
+    assert usage.usage_from_result(Result()) == (140, 10, 100)
+    # Agents that are called repeatedly report lifetime totals
+    previous = {"inputTokens": 30, "outputTokens": 5, "cacheReadInputTokens": 100}
+    assert usage.usage_from_result(Result(), previous=previous) == (10, 5, 0)
+    assert usage.usage_from_result("plain text reply", "a prompt of some length")[2] == 0
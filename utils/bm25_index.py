@@ -0,0 +1,208 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from config import Config
+from utils.rag_lexicon import load_entries, stem
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Function words only: crisis phrasing ("I don't want to be here anymore") is
+# carried by words a topical stopword list would drop
+_STOPWORDS = frozenset("a an and are as at be but by for from in is it its of on or that the this to was with".split())
+_EXAMPLE = re.compile(r"^(?=Example \d+:)", re.MULTILINE)
+_EXAMPLE_TITLE = re.compile(r"^Example (\d+): ?(.*)$", re.MULTILINE)
+_LABEL = re.compile(r"^([A-Z][A-Za-z ]*?)(?: \d+)?:")
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(t) for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _chunks(content: str, max_chars: int) -> List[str]:
+    """One chunk per "Example N:" block, with longer blocks cut at line breaks."""
+    chunks = []
+    for block in (b.strip() for b in _EXAMPLE.split(content)):
+        if not block:
+            continue
+        current = ""
+        for line in block.splitlines():
+            if current and len(current) + len(line) + 1 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def indexed_text(content: str) -> str:
+    """
+    The part of a passage that is scored: everything but the counselor
+    responses ("Cotherapist Response:", "Response 2:", ...), whose generic
+    wording ("thank you for sharing") would match any client message.
+    """
+    kept, in_response = [], False
+    for line in content.splitlines():
+        label = _LABEL.match(line)
+        if label:
+            in_response = label.group(1).endswith("Response")
+        if not in_response:
+            kept.append(line)
+    return "\n".join(kept)
+
+
+@dataclass
+class Passage:
+    text: str
+    metadata: Dict[str, str]
+
+
+def passages_from_entries(entries: Iterable[Dict[str, Any]], max_chars: Optional[int] = None) -> List[Passage]:
+    """
+    Split agent.json entries into passages shaped like the Bedrock knowledge
+    base's: a ``Section/Subsection/Approach/Module`` header, then ``Content:``.
+    Crisis scenarios become one passage per example, with ``intervention_type``
+    "crisis" and the example title as ``flag``.
+    """
+    max_chars = max_chars or Config.LOCAL_KB_CHUNK_CHARS
+    passages = []
+    for entry in entries:
+        crisis = "crisis" in entry.get("section", "").lower()
+        fields = {key: str(entry.get(key, "")).strip() for key in ("section", "subsection", "approach", "module")}
+        header = "\n".join(f"{key.capitalize()}: {value}" for key, value in fields.items())
+        for chunk in _chunks(entry.get("content", ""), max_chars):
+            title = _EXAMPLE_TITLE.match(chunk)
+            metadata = dict(
+                fields,
+                intervention_type="crisis" if crisis else "counseling",
+                flag=f"{title.group(1)}: {title.group(2)}" if title else "",
+            )
+            passages.append(Passage(f"{header}\nContent: {chunk}", metadata))
+    return passages
+
+
+def matches_filter(metadata: Dict[str, Any], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Bedrock-style retrieval filter (``equals``, ``notEquals``,
+    ``in``, ``notIn``, ``startsWith``, ``stringContains``, ``andAll``, ``orAll``)
+    against a passage's metadata.
+    """
+    if not metadata_filter:
+        return True
+    (operator, operand), = metadata_filter.items()
+    if operator == "andAll":
+        return all(matches_filter(metadata, f) for f in operand)
+    if operator == "orAll":
+        return any(matches_filter(metadata, f) for f in operand)
+    value = metadata.get(operand["key"])
+    expected = operand["value"]
+    if operator == "equals":
+        return value == expected
+    if operator == "notEquals":
+        return value != expected
+    if operator == "in":
+        return value in expected
+    if operator == "notIn":
+        return value not in expected
+    if operator == "startsWith":
+        return isinstance(value, str) and value.startswith(expected)
+    if operator == "stringContains":
+        return isinstance(value, str) and expected in value
+    raise ValueError(f"Unsupported retrieval filter operator: {operator}")
+
+
+class BM25Index:
+    """
+    In-process knowledge base over agent.json: an inverted index with BM25
+    scoring, used as a retriever (``utils.knowledge_base.set_retriever``)
+    in place of the Bedrock knowledge base.
+
+    Metadata filters are applied before scoring, so only the postings of
+    matching passages are visited. Scores are normalized to 0-1 by the
+    score of a passage of average length containing every query term once
+    (query terms unknown to the index count as the rarest possible term), so
+    a query whose words are mostly absent scores low however common the few
+    matching ones are. The scale is not Bedrock's cosine similarity; the
+    thresholds callers use come from ``Config.KB_SCORE_THRESHOLDS["bm25"]``.
+    """
+
+    score_scale = "bm25"
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, passages: List[Passage]):
+        self.passages = passages
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._lengths: List[int] = []
+        for i, passage in enumerate(passages):
+            counts = Counter(tokenize(indexed_text(passage.text.split("Content:", 1)[-1])))
+            self._lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                self._postings[term][i] = count
+        total = len(passages)
+        average_length = sum(self._lengths) / total if total else 1.0
+        # Length part of each passage's BM25 denominator, fixed once the index is built
+        self._norms = [self.K1 * (1 - self.B + self.B * length / average_length) for length in self._lengths]
+        self._idf = {term: self._term_idf(len(docs)) for term, docs in self._postings.items()}
+
+    def _term_idf(self, document_frequency: int) -> float:
+        total = len(self.passages)
+        return math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict[str, Any]]) -> "BM25Index":
+        return cls(passages_from_entries(entries))
+
+    def search(self, text: str, number_of_results: int = 1,
+               metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        query_terms = set(tokenize(text))
+        if not query_terms:
+            return []
+        allowed: Optional[Set[int]] = None
+        if metadata_filter:
+            allowed = {i for i, p in enumerate(self.passages) if matches_filter(p.metadata, metadata_filter)}
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in query_terms:
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, count in self._postings[term].items():
+                if allowed is not None and i not in allowed:
+                    continue
+                scores[i] += idf * count * (self.K1 + 1) / (count + self._norms[i])
+
+        unknown_idf = self._term_idf(0)
+        ceiling = sum(self._idf.get(term, unknown_idf) for term in query_terms)
+        ranked = heapq.nlargest(number_of_results, scores.items(), key=lambda item: item[1])
+        return [
+            {
+                "text": self.passages[i].text,
+                "score": min(1.0, score / ceiling),
+                "metadata": dict(self.passages[i].metadata),
+                "source": "bm25",
+            }
+            for i, score in ranked
+        ]
+
+    def __call__(self, text: str, number_of_results: int = 1,
+                 metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self.search(text, number_of_results, metadata_filter)
+
+
+_index: Optional[BM25Index] = None
+_index_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    """The process-wide index over ``Config.AGENT_KB_PATH``, built on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = BM25Index.from_entries(load_entries())
+    return _index
@@ -0,0 +1,219 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+from typing import Any, AsyncGenerator, Dict, List, Optional, Type, TypeVar
+
+from strands.models import Model
+
+from utils import knowledge_base, llm, model_registry
+from utils.response_cache import ResponseCache, set_response_cache
+from utils.knowledge_base import Retriever
+from utils.stub_model import LatencyProfile, StubModel, last_user_text, system_text
+
+T = TypeVar("T")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def llm_key(model_id: str, system_prompt: str, prompt: str) -> str:
+    payload = json.dumps([model_id, system_prompt, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def retrieval_key(text: str, number_of_results: int, metadata_filter: Optional[Dict[str, Any]]) -> str:
+    payload = json.dumps([text, number_of_results, metadata_filter], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Recorded prompt -> response pairs and retrieval results, stored as JSON.
+
+    Identical requests may be recorded several times (sampling is not
+    deterministic); on replay the n-th identical request gets the n-th
+    recording, and the last one is repeated once they run out.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, List[Dict[str, Any]]] = {"llm": [], "retrieval": []}
+        self._index: Dict[str, Dict[str, List[Any]]] = {"llm": {}, "retrieval": {}}
+        self._replayed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self.load()
+
+    def load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self.entries = {"llm": data.get("llm", []), "retrieval": data.get("retrieval", [])}
+            self._index = {"llm": {}, "retrieval": {}}
+            for kind, items in self.entries.items():
+                for item in items:
+                    self._index[kind].setdefault(item["key"], []).append(item["response"])
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            data = json.dumps(self.entries, ensure_ascii=False, indent=2)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(data)
+
+    def record(self, kind: str, key: str, request: Dict[str, Any], response: Any) -> None:
+        with self._lock:
+            self.entries[kind].append({"key": key, "request": request, "response": response})
+            self._index[kind].setdefault(key, []).append(response)
+
+    def lookup(self, kind: str, key: str) -> Any:
+        with self._lock:
+            recordings = self._index[kind].get(key)
+            if not recordings:
+                raise CassetteMiss(f"No recorded {kind} response for key {key[:12]} in {self.path}")
+            counter_key = f"{kind}:{key}"
+            position = self._replayed.get(counter_key, 0)
+            self._replayed[counter_key] = position + 1
+            return recordings[min(position, len(recordings) - 1)]
+
+
+class RecordingModel(Model):
+    """Wraps a real model and records every completion into a cassette."""
+
+    def __init__(self, inner: Model, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    def update_config(self, **model_config: Any) -> None:
+        self.inner.update_config(**model_config)
+
+    def get_config(self) -> Any:
+        return self.inner.get_config()
+
+    @property
+    def supports_cache_points(self) -> bool:
+        """Same prompt layout as the wrapped model, so recordings match replays."""
+        return llm.supports_cache_points(self.inner)
+
+    def _model_id(self) -> str:
+        config = self.get_config()
+        return config.get("model_id", "") if isinstance(config, dict) else ""
+
+    async def stream(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_specs: Optional[List[Any]] = None,
+        system_prompt: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        chunks: List[str] = []
+        async for event in self.inner.stream(messages, tool_specs, system_prompt, **kwargs):
+            delta = event.get("contentBlockDelta", {}).get("delta", {})
+            if "text" in delta:
+                chunks.append(delta["text"])
+            elif "toolUse" in delta:
+                # Structured output arrives as the tool input; the stub replays it as a tool call
+                chunks.append(delta["toolUse"].get("input", ""))
+            yield event
+
+        system = system_text(system_prompt, kwargs.get("system_prompt_content"))
+        prompt = last_user_text(messages)
+        self.cassette.record(
+            "llm",
+            llm_key(self._model_id(), system, prompt),
+            {"model_id": self._model_id(), "system_prompt": system, "prompt": prompt},
+            "".join(chunks),
+        )
+
+    async def structured_output(
+        self,
+        output_model: Type[T],
+        prompt: List[Dict[str, Any]],
+        system_prompt: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        async for event in self.inner.structured_output(output_model, prompt, system_prompt, **kwargs):
+            if "output" in event:
+                system = system_text(system_prompt, kwargs.get("system_prompt_content"))
+                user_text = last_user_text(prompt)
+                self.cassette.record(
+                    "llm",
+                    llm_key(self._model_id(), system, user_text),
+                    {"model_id": self._model_id(), "system_prompt": system, "prompt": user_text},
+                    event["output"].model_dump_json(),
+                )
+            yield event
+
+
+class ReplayModel(StubModel):
+    """Stub model whose outputs come from a cassette instead of a script."""
+
+    def __init__(self, cassette: Cassette, latency: Optional[LatencyProfile] = None, **model_config: Any):
+        super().__init__(latency=latency, **model_config)
+        self.cassette = cassette
+
+    def respond(self, system_prompt: str, prompt: str) -> str:
+        return self.cassette.lookup("llm", llm_key(self.config.get("model_id", ""), system_prompt, prompt))
+
+
+def recording_retriever(cassette: Cassette, inner: Optional[Retriever] = None) -> Retriever:
+    inner = inner or knowledge_base.bedrock_retrieve
+
+    def retriever(text: str, number_of_results: int = 1,
+                  metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        results = inner(text, number_of_results, metadata_filter)
+        cassette.record(
+            "retrieval",
+            retrieval_key(text, number_of_results, metadata_filter),
+            {"text": text, "number_of_results": number_of_results, "filter": metadata_filter},
+            results,
+        )
+        return results
+
+    return retriever
+
+
+def replay_retriever(cassette: Cassette) -> Retriever:
+    def retriever(text: str, number_of_results: int = 1,
+                  metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return cassette.lookup("retrieval", retrieval_key(text, number_of_results, metadata_filter))
+
+    return retriever
+
+
+def use_cassette(path: str, mode: str = "replay", latency: Optional[LatencyProfile] = None) -> Cassette:
+    """
+    Route every model and knowledge base call through a cassette.
+
+    In "record" mode real Bedrock calls are made and saved to ``path`` at exit;
+    in "replay" mode nothing touches the network and unrecorded requests raise
+    ``CassetteMiss``. The response cache is reset to a memory-only instance
+    so that a warm on-disk cache cannot hide calls from the recording.
+    """
+    cassette = Cassette(path)
+    set_response_cache(ResponseCache())
+    if mode == "record":
+        model_registry.set_model_factory(
+            lambda model_id, region_name, temperature, streaming: RecordingModel(
+                model_registry.bedrock_model(model_id, region_name, temperature, streaming), cassette
+            ),
+            name="record",
+        )
+        knowledge_base.set_retriever(recording_retriever(cassette))
+        atexit.register(cassette.save)
+    elif mode == "replay":
+        model_registry.set_model_factory(
+            lambda model_id, region_name, temperature, streaming: ReplayModel(
+                cassette, latency=latency, model_id=model_id, temperature=temperature
+            ),
+            name="replay",
+        )
+        knowledge_base.set_retriever(replay_retriever(cassette))
+    else:
+        raise ValueError(f"Unknown cassette mode: {mode}")
+    return cassette
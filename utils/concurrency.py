@@ -0,0 +1,310 @@
+import contextvars
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+@dataclass
+class TaskOutcome:
+    """Result of one task run by ``run_parallel``."""
+    name: str
+    status: str  # "ok", "error", "timeout", "skipped" or "cancelled"
+    value: Any = None
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+def run_parallel(
+    tasks: Dict[str, Callable[[], Any]],
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    stop_when: Optional[Callable[[TaskOutcome], bool]] = None,
+) -> Dict[str, TaskOutcome]:
+    """
+    Run independent callables on a bounded thread pool.
+
+    Args:
+        tasks: Task name -> zero-argument callable.
+        max_workers: Concurrency cap (defaults to one thread per task).
+        timeout: Per-task budget in seconds, measured from when the task
+            starts running. Tasks still queued when every worker slot has had
+            its chance are timed out as well, so the call returns within
+            roughly ``timeout * ceil(len(tasks) / max_workers)``.
+        stop_when: Early-exit predicate. As soon as one finished task's
+            outcome satisfies it, tasks not yet started are cancelled and
+            tasks still running are abandoned (status "cancelled").
+
+    Returns:
+        Task name -> TaskOutcome, in the order of ``tasks``. Timed-out tasks
+        keep running in the background but their results are discarded.
+        Each task runs in a copy of the caller's context (contextvars).
+    """
+    if not tasks:
+        return {}
+
+    workers = max(1, min(max_workers or len(tasks), len(tasks)))
+    started: Dict[str, float] = {}
+    finished: Dict[str, float] = {}
+
+    def call(name: str, fn: Callable[[], Any]) -> Any:
+        started[name] = time.monotonic()
+        try:
+            return fn()
+        finally:
+            finished[name] = time.monotonic()
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fanout")
+    futures: Dict[Future, str] = {}
+    for name, fn in tasks.items():
+        ctx = contextvars.copy_context()
+        futures[executor.submit(ctx.run, call, name, fn)] = name
+
+    overall_deadline = (
+        time.monotonic() + timeout * math.ceil(len(tasks) / workers) if timeout is not None else None
+    )
+    outcomes: Dict[str, TaskOutcome] = {}
+    pending = set(futures)
+    try:
+        while pending:
+            wait_for = None
+            if timeout is not None:
+                deadlines = [started[futures[f]] + timeout for f in pending if futures[f] in started]
+                deadlines.append(overall_deadline)
+                wait_for = max(0.0, min(deadlines) - time.monotonic())
+
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                elapsed_ms = (finished.get(name, time.monotonic()) - started.get(name, time.monotonic())) * 1000
+                try:
+                    outcomes[name] = TaskOutcome(name, "ok", value=future.result(), elapsed_ms=elapsed_ms)
+                except Exception as e:
+                    outcomes[name] = TaskOutcome(name, "error", error=f"{type(e).__name__}: {e}", elapsed_ms=elapsed_ms)
+
+            if stop_when is not None and any(stop_when(outcomes[futures[f]]) for f in done):
+                for future in pending:
+                    future.cancel()
+                    outcomes[futures[future]] = TaskOutcome(futures[future], "cancelled", error="stopped early")
+                break
+
+            if timeout is None:
+                continue
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                start = started.get(name)
+                if (start is not None and now - start >= timeout) or now >= overall_deadline:
+                    future.cancel()
+                    pending.discard(future)
+                    elapsed_ms = (now - start) * 1000 if start is not None else 0.0
+                    outcomes[name] = TaskOutcome(name, "timeout", error=f"timed out after {timeout}s", elapsed_ms=elapsed_ms)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return {name: outcomes[name] for name in tasks}
+
+
+@dataclass
+class Stage:
+    """
+    One node of a ``run_dag`` graph.
+
+    ``fn`` is called with the values of its dependencies as keyword arguments
+    (keyed by stage name). ``timeout`` overrides the graph-wide default.
+    """
+    fn: Callable[..., Any]
+    deps: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+
+
+def _check_acyclic(stages: Dict[str, Stage]) -> None:
+    """Raise ValueError for unknown dependencies or dependency cycles."""
+    state: Dict[str, str] = {}
+
+    def visit(name: str, path: Tuple[str, ...]) -> None:
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+        state[name] = "visiting"
+        for dep in stages[name].deps:
+            if dep not in stages:
+                raise ValueError(f"Stage {name!r} depends on unknown stage {dep!r}")
+            visit(dep, path + (name,))
+        state[name] = "done"
+
+    for name in stages:
+        visit(name, ())
+
+
+def run_dag(
+    stages: Dict[str, Stage],
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, TaskOutcome]:
+    """
+    Run a dependency graph of stages on a bounded thread pool.
+
+    A stage starts as soon as all of its dependencies have succeeded. Stages
+    whose dependencies failed or timed out are not run and get status
+    "skipped", so callers always get one outcome per stage and can return
+    partial results.
+
+    Args:
+        stages: Stage name -> Stage.
+        max_workers: Concurrency cap (defaults to one thread per stage).
+        timeout: Default per-stage budget in seconds, measured from when the
+            stage starts running.
+
+    Returns:
+        Stage name -> TaskOutcome, in the order of ``stages``.
+    """
+    _check_acyclic(stages)
+    if not stages:
+        return {}
+
+    workers = max(1, min(max_workers or len(stages), len(stages)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dag")
+    outcomes: Dict[str, TaskOutcome] = {}
+    running: Dict[Future, str] = {}
+    started: Dict[str, float] = {}
+    finished: Dict[str, float] = {}
+
+    def call(name: str, kwargs: Dict[str, Any]) -> Any:
+        started[name] = time.monotonic()
+        try:
+            return stages[name].fn(**kwargs)
+        finally:
+            finished[name] = time.monotonic()
+
+    def stage_timeout(name: str) -> Optional[float]:
+        return stages[name].timeout if stages[name].timeout is not None else timeout
+
+    def schedule() -> None:
+        # Skips can cascade, so keep going until nothing new becomes ready
+        progress = True
+        while progress:
+            progress = False
+            for name in stages:
+                if name in outcomes or name in running.values():
+                    continue
+                deps = stages[name].deps
+                failed = [dep for dep in deps if dep in outcomes and not outcomes[dep].ok]
+                if failed:
+                    outcomes[name] = TaskOutcome(name, "skipped", error=f"dependency failed: {', '.join(failed)}")
+                    progress = True
+                elif all(dep in outcomes for dep in deps):
+                    kwargs = {dep: outcomes[dep].value for dep in deps}
+                    ctx = contextvars.copy_context()
+                    running[executor.submit(ctx.run, call, name, kwargs)] = name
+                    progress = True
+
+    try:
+        schedule()
+        while running:
+            deadlines = []
+            for future, name in running.items():
+                limit = stage_timeout(name)
+                if limit is not None:
+                    deadlines.append(started.get(name, time.monotonic()) + limit)
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+
+            done, _ = wait(set(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in done:
+                name = running.pop(future)
+                elapsed_ms = (finished.get(name, now) - started.get(name, now)) * 1000
+                try:
+                    outcomes[name] = TaskOutcome(name, "ok", value=future.result(), elapsed_ms=elapsed_ms)
+                except Exception as e:
+                    outcomes[name] = TaskOutcome(name, "error", error=f"{type(e).__name__}: {e}", elapsed_ms=elapsed_ms)
+
+            for future, name in list(running.items()):
+                limit = stage_timeout(name)
+                start = started.get(name)
+                if limit is not None and start is not None and now - start >= limit:
+                    future.cancel()
+                    del running[future]
+                    outcomes[name] = TaskOutcome(
+                        name, "timeout", error=f"timed out after {limit}s", elapsed_ms=(now - start) * 1000
+                    )
+
+            schedule()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return {name: outcomes[name] for name in stages}
+
+
+class SpeculationCancelled(Exception):
+    """Raised by a speculative task that noticed its result is no longer wanted."""
+
+
+_speculation_pool: Optional[ThreadPoolExecutor] = None
+_speculation_lock = threading.Lock()
+
+
+def _get_speculation_pool() -> ThreadPoolExecutor:
+    global _speculation_pool
+    if _speculation_pool is None:
+        with _speculation_lock:
+            if _speculation_pool is None:
+                _speculation_pool = ThreadPoolExecutor(thread_name_prefix="speculative")
+    return _speculation_pool
+
+
+class Speculation:
+    """
+    A task started ahead of a check that may make its result unnecessary.
+
+    ``fn`` runs on a shared worker pool (in a copy of the caller's context) and
+    receives a ``threading.Event`` that is set by ``cancel()``. Work already in
+    flight cannot be interrupted, so ``fn`` should check the event before each
+    expensive step and raise ``SpeculationCancelled`` once it is set.
+    """
+
+    def __init__(self, fn: Callable[[threading.Event], Any]):
+        self.cancelled = threading.Event()
+        ctx = contextvars.copy_context()
+        self._future = _get_speculation_pool().submit(ctx.run, fn, self.cancelled)
+
+    def cancel(self) -> None:
+        """Discard the result; the task stops at its next cancellation check."""
+        self.cancelled.set()
+        self._future.cancel()
+
+    def done(self) -> bool:
+        """Whether the task has finished (or was cancelled before it started)."""
+        return self._future.done()
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        """Wait for and return the task's result (re-raises its exception)."""
+        return self._future.result(timeout)
+
+
+def in_own_context(items: Iterator[Any]) -> Iterator[Any]:
+    """
+    Advance ``items`` in one copy of the caller's context, whichever thread
+    drives the iteration (a UI server may resume a stream on another worker).
+    Context variables it sets, such as an open ledger or trace, stay with it
+    between items instead of leaking into the consumer.
+    """
+    ctx = contextvars.copy_context()
+    try:
+        while True:
+            try:
+                item = ctx.run(next, items)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        close = getattr(items, "close", None)
+        if close is not None:
+            ctx.run(close)
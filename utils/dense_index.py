@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from config import Config
+from utils.bm25_index import Passage, indexed_text, matches_filter, passages_from_entries, tokenize
+from utils.rag_lexicon import load_entries
+
+# Snapshot format; bump when the layout or the default encoder changes
+SNAPSHOT_VERSION = 2
+
+
+class Encoder(Protocol):
+    """CPU text encoder: ``encode`` returns one L2-normalized float32 row per text."""
+    name: str
+    dim: int
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray: ...
+
+
+class HashingEncoder:
+    """
+    Deterministic encoder that needs no model download: word unigrams and
+    bigrams plus character trigrams, hashed (crc32, signed) into ``dim``
+    buckets with log term frequency. Character trigrams let related word
+    forms ("hopeless"/"hopelessness") share weight, which BM25 cannot.
+
+    With ``term_weights`` (``fit``: BM25 idf over the indexed passages) a
+    word, its trigrams and the bigrams it is part of count by how rare the
+    word is, so a message that shares only common words ("feel", "really")
+    or passage labels ("Safety Level") with a passage scores low. Words
+    outside the vocabulary get the weight of the rarest word.
+    """
+
+    TRIGRAM_WEIGHT = 0.25
+
+    def __init__(self, dim: int = 512, term_weights: Optional[Dict[str, float]] = None):
+        self.dim = dim
+        self.term_weights = term_weights or {}
+        self._unknown_weight = max(self.term_weights.values(), default=1.0)
+        self.name = f"hashing-{dim}-idf" if self.term_weights else f"hashing-{dim}"
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], dim: int = 512) -> "HashingEncoder":
+        """Encoder weighted by the idf of each word over ``texts``."""
+        frequencies: Dict[str, int] = {}
+        for text in texts:
+            for token in set(tokenize(text)):
+                frequencies[token] = frequencies.get(token, 0) + 1
+        total = len(texts)
+        return cls(dim, {
+            token: float(np.log(1 + (total - count + 0.5) / (count + 0.5))) for token, count in frequencies.items()
+        })
+
+    def _add(self, row: np.ndarray, feature: str, weight: float) -> None:
+        h = zlib.crc32(feature.encode("utf-8"))
+        row[h % self.dim] += weight if (h >> 31) & 1 else -weight
+
+    def _term_weight(self, token: str) -> float:
+        if not self.term_weights:
+            return 1.0
+        return self.term_weights.get(token, self._unknown_weight)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in zip(vectors, texts):
+            tokens = tokenize(text)
+            # feature -> (occurrences, weight); a trigram shared by several words keeps the rarest word's weight
+            features: Dict[str, Tuple[int, float]] = {}
+
+            def count(feature: str, weight: float) -> None:
+                occurrences, previous = features.get(feature, (0, 0.0))
+                features[feature] = (occurrences + 1, max(previous, weight))
+
+            for token in tokens:
+                weight = self._term_weight(token)
+                count("w:" + token, weight)
+                padded = f"#{token}#"
+                for i in range(len(padded) - 2):
+                    count("c:" + padded[i:i + 3], self.TRIGRAM_WEIGHT * weight)
+            for first, second in zip(tokens, tokens[1:]):
+                count(f"b:{first}_{second}", float(np.sqrt(self._term_weight(first) * self._term_weight(second))))
+            for feature, (occurrences, weight) in features.items():
+                self._add(row, feature, (1.0 + np.log(occurrences)) * weight)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+# Name of the encoder ``DenseIndex.build`` fits when none is installed
+DEFAULT_ENCODER = "hashing-512-idf"
+
+_encoder: Optional[Encoder] = None
+
+
+def get_encoder() -> Optional[Encoder]:
+    """The installed encoder; ``None`` means an idf-weighted ``HashingEncoder`` fitted on the passages."""
+    return _encoder
+
+
+def set_encoder(encoder: Optional[Encoder]) -> None:
+    """
+    Install the encoder for passages and queries (e.g. a sentence-transformers
+    wrapper); ``None`` restores the fitted ``HashingEncoder``. Snapshots record
+    the encoder name, so one built with another encoder is rebuilt, not misread.
+    """
+    global _encoder
+    _encoder = encoder
+    set_dense_index(None)
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: ``vectors ~= q * scales[:, None]``."""
+    peaks = np.abs(vectors).max(axis=1)
+    scales = np.where(peaks == 0, 1.0, peaks / 127.0).astype(np.float32)
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales
+
+
+def _meta_path(snapshot_path: str) -> str:
+    return os.path.splitext(snapshot_path)[0] + ".json"
+
+
+def _fingerprint(kb_path: str, encoder: Optional[Encoder]) -> str:
+    name, dim = (encoder.name, encoder.dim) if encoder is not None else (DEFAULT_ENCODER, 512)
+    digest = hashlib.sha256()
+    with open(kb_path, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"{SNAPSHOT_VERSION}:{name}:{dim}:{Config.LOCAL_KB_CHUNK_CHARS}".encode())
+    return digest.hexdigest()
+
+
+def _indexed(passage: Passage) -> str:
+    return indexed_text(passage.text.split("Content:", 1)[-1])
+
+
+class DenseIndex:
+    """
+    In-process embedding index over the agent.json passages (the same
+    passages as ``utils.bm25_index``), used as a retriever in place of the
+    Bedrock knowledge base.
+
+    Vectors are stored int8 with one float32 scale per passage; a query is
+    encoded in float32 and scored against every candidate row with one
+    matrix-vector product. Metadata filters select the candidate rows
+    before scoring. Scores are cosine similarities (clipped at 0) on this
+    encoder's scale; thresholds come from ``Config.KB_SCORE_THRESHOLDS["dense"]``.
+    """
+
+    score_scale = "dense"
+
+    def __init__(self, passages: List[Passage], vectors: np.ndarray, scales: np.ndarray, encoder: Encoder):
+        self.passages = passages
+        self.vectors = vectors
+        self.scales = scales
+        self.encoder = encoder
+
+    @classmethod
+    def build(cls, passages: List[Passage], encoder: Optional[Encoder] = None) -> "DenseIndex":
+        """Encode ``passages``; without an encoder (argument or ``set_encoder``) one is fitted on them."""
+        texts = [_indexed(p) for p in passages]
+        encoder = encoder or get_encoder() or HashingEncoder.fit(texts)
+        return cls(passages, *quantize(encoder.encode(texts)), encoder)
+
+    def save(self, path: str, fingerprint: str) -> None:
+        """
+        Write the int8 matrix to ``path`` (.npy) and the scales, fingerprint
+        and any ``HashingEncoder`` term weights next to it (.json).
+        """
+        np.save(path, self.vectors)
+        meta: Dict[str, Any] = {"fingerprint": fingerprint, "encoder": self.encoder.name,
+                                "scales": [float(s) for s in self.scales]}
+        if isinstance(self.encoder, HashingEncoder) and self.encoder.term_weights:
+            meta["term_weights"] = {t: round(w, 4) for t, w in sorted(self.encoder.term_weights.items())}
+        with open(_meta_path(path), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path: str, passages: List[Passage], fingerprint: str,
+             encoder: Optional[Encoder] = None) -> Optional["DenseIndex"]:
+        """
+        The snapshot at ``path``, memory-mapped; ``None`` if missing or built
+        from other inputs. Without ``encoder`` the fitted ``HashingEncoder``
+        is restored from the snapshot's term weights.
+        """
+        try:
+            with open(_meta_path(path), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("fingerprint") != fingerprint:
+            return None
+        encoder = encoder or HashingEncoder(term_weights=meta.get("term_weights"))
+        vectors = np.load(path, mmap_mode="r")
+        if vectors.shape != (len(passages), encoder.dim):
+            return None
+        return cls(passages, vectors, np.asarray(meta["scales"], dtype=np.float32), encoder)
+
+    def search(self, text: str, number_of_results: int = 1,
+               metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        query = self.encoder.encode([text])[0]
+        if not query.any():
+            return []
+        if metadata_filter:
+            rows = np.array([i for i, p in enumerate(self.passages) if matches_filter(p.metadata, metadata_filter)],
+                            dtype=np.intp)
+        else:
+            rows = np.arange(len(self.passages))
+        if not len(rows):
+            return []
+        scores = (self.vectors[rows] @ query) * self.scales[rows]
+        top = np.argsort(-scores)[:number_of_results]
+        return [
+            {
+                "text": self.passages[rows[k]].text,
+                "score": float(max(0.0, min(1.0, scores[k]))),
+                "metadata": dict(self.passages[rows[k]].metadata),
+                "source": "dense",
+            }
+            for k in top
+        ]
+
+    def __call__(self, text: str, number_of_results: int = 1,
+                 metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self.search(text, number_of_results, metadata_filter)
+
+
+def load_or_build(kb_path: Optional[str] = None, snapshot_path: Optional[str] = None) -> DenseIndex:
+    """
+    Memory-map the snapshot when it matches agent.json and the encoder;
+    otherwise encode the passages and try to write a fresh snapshot (a
+    read-only deployment keeps the rebuilt index in memory only).
+    """
+    kb_path = kb_path or Config.AGENT_KB_PATH
+    snapshot_path = snapshot_path or Config.DENSE_INDEX_PATH
+    encoder = get_encoder()
+    passages = passages_from_entries(load_entries(kb_path))
+    fingerprint = _fingerprint(kb_path, encoder)
+    index = DenseIndex.load(snapshot_path, passages, fingerprint, encoder)
+    if index is not None:
+        return index
+    print(f"[WARN] Dense index snapshot {snapshot_path} missing or stale; rebuilding")
+    index = DenseIndex.build(passages, encoder)
+    try:
+        index.save(snapshot_path, fingerprint)
+    except OSError as e:
+        print(f"[WARN] Dense index snapshot not written: {e}")
+    return index
+
+
+def write_snapshot(kb_path: Optional[str] = None, snapshot_path: Optional[str] = None) -> DenseIndex:
+    """Encode the agent.json passages with the current encoder and write the snapshot."""
+    kb_path = kb_path or Config.AGENT_KB_PATH
+    encoder = get_encoder()
+    index = DenseIndex.build(passages_from_entries(load_entries(kb_path)), encoder)
+    index.save(snapshot_path or Config.DENSE_INDEX_PATH, _fingerprint(kb_path, encoder))
+    return index
+
+
+_index: Optional[DenseIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_dense_index() -> DenseIndex:
+    """The process-wide index, loaded (or built) on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_or_build()
+    return _index
+
+
+def set_dense_index(index: Optional[DenseIndex]) -> None:
+    """Install an index (tests, benchmarks); ``None`` loads the snapshot again on next use."""
+    global _index
+    with _index_lock:
+        _index = index
+
+
+class DenseRetriever:
+    """Retriever that loads the dense index on its first lookup rather than at import."""
+
+    score_scale = "dense"
+
+    def __call__(self, text: str, number_of_results: int = 1,
+                 metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return get_dense_index().search(text, number_of_results, metadata_filter)
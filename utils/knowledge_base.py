@@ -0,0 +1,169 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from config import Config
+from utils import metrics
+from utils.concurrency import run_parallel
+from utils.model_registry import get_client
+
+# A retriever takes (text, number_of_results, metadata_filter) and returns a list
+# of normalized results: {"text": str, "score": float, "metadata": dict, "source": str}.
+Retriever = Callable[[str, int, Optional[Dict[str, Any]]], List[Dict[str, Any]]]
+
+_retriever: Optional[Retriever] = None
+
+
+def bedrock_retrieve(
+    text: str,
+    number_of_results: int = 1,
+    metadata_filter: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Query the Bedrock knowledge base through the pooled bedrock-agent-runtime client."""
+    search_config: Dict[str, Any] = {"numberOfResults": number_of_results}
+    if metadata_filter:
+        search_config["filter"] = metadata_filter
+
+    response = get_client("bedrock-agent-runtime").retrieve(
+        knowledgeBaseId=Config.KNOWLEDGE_BASE_ID,
+        retrievalQuery={"text": text},
+        retrievalConfiguration={"vectorSearchConfiguration": search_config},
+    )
+    return [
+        {
+            "text": item.get("content", {}).get("text", ""),
+            "score": item.get("score", 0.0),
+            "metadata": item.get("metadata", {}),
+            "source": "bedrock",
+        }
+        for item in response.get("retrievalResults", [])
+    ]
+
+
+def set_retriever(retriever: Optional[Retriever]) -> None:
+    """Install a retriever (stub, cassette, ...). ``None`` restores Bedrock."""
+    global _retriever
+    _retriever = retriever
+
+
+def get_retriever() -> Retriever:
+    return _retriever or bedrock_retrieve
+
+
+def configure_kb_backend(kb_backend: Optional[str] = None) -> None:
+    """
+    Install the knowledge base named by ``Config.KB_BACKEND`` (env
+    ``CBT_KB_BACKEND``): "bedrock" leaves the current retriever in place,
+    "bm25" builds the in-process index over agent.json and uses it, "dense"
+    uses the embedding index, loading its snapshot on the first lookup.
+    """
+    kb_backend = kb_backend or Config.KB_BACKEND
+    if kb_backend == "bedrock":
+        return
+    if kb_backend == "bm25":
+        from utils.bm25_index import get_bm25_index
+        set_retriever(get_bm25_index())
+    elif kb_backend == "dense":
+        from utils.dense_index import DenseRetriever
+        set_retriever(DenseRetriever())
+    else:
+        raise ValueError(f"Unknown KB backend: {kb_backend}")
+
+
+def score_threshold(name: str) -> float:
+    """
+    ``Config.KB_SCORE_THRESHOLDS`` entry ``name`` on the score scale of the
+    installed retriever (its ``score_scale`` attribute; Bedrock's by default).
+    """
+    thresholds = Config.KB_SCORE_THRESHOLDS
+    scale = getattr(get_retriever(), "score_scale", "bedrock")
+    return thresholds.get(scale, thresholds["bedrock"])[name]
+
+
+def retrieve(
+    text: str,
+    number_of_results: int = 1,
+    metadata_filter: Optional[Dict[str, Any]] = None,
+    min_score: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Retrieve knowledge base passages for a query.
+
+    Args:
+        text: Query text.
+        number_of_results: Maximum number of passages to return.
+        metadata_filter: Optional Bedrock-style filter, e.g.
+            ``{"equals": {"key": "intervention_type", "value": "crisis"}}``.
+        min_score: Drop passages scoring below this value.
+
+    Returns:
+        List of normalized results ordered as returned by the retriever.
+    """
+    metrics.incr("retrievals")
+    with metrics.timed("retrieval"):
+        results = get_retriever()(text, number_of_results, metadata_filter)
+    if min_score is not None:
+        results = [r for r in results if r.get("score", 0.0) >= min_score]
+    return results
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used to send each distinct query once."""
+    return " ".join(text.lower().split())
+
+
+def retrieve_batch(
+    queries: Sequence[str],
+    number_of_results: int = 1,
+    metadata_filter: Optional[Dict[str, Any]] = None,
+    min_score: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Retrieve knowledge base passages for several queries in one call.
+
+    Queries equal after ``normalize_query`` are sent once, and the distinct
+    ones run concurrently (``Config.RETRIEVAL_MAX_WORKERS``) on the pooled
+    retriever, so the batch takes about as long as its slowest query. A
+    failing query is logged and contributes nothing.
+
+    Returns:
+        Results merged by passage text (keeping the best score), at or above
+        ``min_score``, best first. Each carries its provenance: ``queries``,
+        the queries (as given) that returned it.
+    """
+    distinct: Dict[str, List[str]] = {}
+    for query in queries:
+        if query.strip():
+            distinct.setdefault(normalize_query(query), []).append(query)
+    metrics.incr("retrieval_batches")
+    metrics.incr("retrieval_duplicates", sum(len(group) - 1 for group in distinct.values()))
+
+    outcomes = run_parallel(
+        {
+            key: (lambda text=group[0]: retrieve(text, number_of_results, metadata_filter))
+            for key, group in distinct.items()
+        },
+        max_workers=Config.RETRIEVAL_MAX_WORKERS,
+        timeout=Config.RETRIEVAL_TIMEOUT_SECONDS,
+    )
+    merged: Dict[str, Dict[str, Any]] = {}
+    for key, outcome in outcomes.items():
+        if not outcome.ok:
+            print(f"[WARN] RAG retrieve failed for '{distinct[key][0]}' ({outcome.status}): {outcome.error}")
+            continue
+        for result in outcome.value:
+            if min_score is not None and result.get("score", 0.0) < min_score:
+                continue
+            kept = merged.get(result["text"])
+            if kept is None:
+                merged[result["text"]] = dict(result, queries=list(distinct[key]))
+                continue
+            kept["queries"].extend(distinct[key])
+            if result.get("score", 0.0) > kept.get("score", 0.0):
+                kept.update(result, queries=kept["queries"])
+    return sorted(merged.values(), key=lambda r: -r.get("score", 0.0))
+
+
+def passage_content(text: str) -> str:
+    """Strip the ``Section/Approach/...`` header the KB prepends to each passage."""
+    if "Content:" in text:
+        text = text.split("Content:", 1)[1]
+    return text.strip().replace("\n", " ")
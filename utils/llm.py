@@ -0,0 +1,149 @@
+import asyncio
+import contextvars
+import inspect
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from strands import Agent
+from strands.models import Model
+
+from config import Config
+from utils import metrics, model_registry, usage
+from utils.prompts import PromptParts
+from utils.response_cache import cache_key, get_response_cache
+
+_SAMPLING_KEYS = ("temperature", "top_p", "max_tokens", "stop_sequences", "additional_request_fields")
+
+
+def model_signature(model: Model) -> Tuple[str, Dict[str, Any]]:
+    """Return (model_id, sampling params) identifying what a model will generate."""
+    config = model.get_config()
+    if not isinstance(config, dict):
+        config = dict(config or {})
+    params = {k: config[k] for k in _SAMPLING_KEYS if config.get(k) is not None}
+    params["backend"] = model_registry.current_backend()
+    return str(config.get("model_id", "")), params
+
+
+def supports_cache_points(model: Model) -> bool:
+    """
+    True if ``model`` accepts cache points in its prompt.
+
+    Backends can declare it with a ``supports_cache_points`` attribute (the
+    stub does); Bedrock models are matched against ``Config.PROMPT_CACHE_MODELS``.
+    """
+    declared = getattr(model, "supports_cache_points", None)
+    if declared is not None:
+        return bool(declared)
+    model_id, _ = model_signature(model)
+    return any(prefix in model_id for prefix in Config.PROMPT_CACHE_MODELS)
+
+
+# strands takes a system prompt as content blocks (passed to the model as
+# system_prompt_content) from 1.16 on; older versions hand the list to the
+# model as the system prompt text
+SYSTEM_PROMPT_BLOCKS = "system_prompt_content" in inspect.signature(Model.stream).parameters
+
+
+def prompt_content(prompt: str, model: Model, system: bool = False) -> Union[str, List[Dict[str, Any]]]:
+    """
+    Content to send for ``prompt``: content blocks with a cache point after the
+    static prefix of a ``PromptParts`` when caching is on and supported,
+    otherwise the prompt unchanged. System prompts (``system=True``) stay
+    plain strings on strands versions without ``SYSTEM_PROMPT_BLOCKS``.
+    """
+    if not (isinstance(prompt, PromptParts) and Config.PROMPT_CACHE_POINTS and supports_cache_points(model)):
+        return prompt
+    if system and not SYSTEM_PROMPT_BLOCKS:
+        return prompt
+    blocks: List[Dict[str, Any]] = [{"text": prompt.static}, {"cachePoint": {"type": "default"}}]
+    if prompt.dynamic:
+        blocks.append({"text": prompt.dynamic})
+    return blocks
+
+
+def complete(system_prompt: str, message: str, task: str, model: Optional[Model] = None) -> str:
+    """
+    Run a single-turn completion on a fresh strands Agent.
+
+    Args:
+        system_prompt: System prompt for the call. ``PromptParts`` prompts
+            get a cache point after their static prefix (see ``prompt_content``).
+        message: User message (a ``PromptParts`` is cached the same way).
+        task: Name of the sub-task. Tasks listed in ``Config.CACHED_LLM_TASKS``
+            are served from the response cache when the same model, prompt,
+            message and sampling params were seen before. Calls are
+            accounted per task in the current ``utils.usage`` ledger.
+        model: Model to use (defaults to the pooled default model).
+
+    Returns:
+        The completion text.
+    """
+    model = model or model_registry.get_model()
+    key = None
+    if task in Config.CACHED_LLM_TASKS:
+        model_id, params = model_signature(model)
+        key = cache_key(model_id, system_prompt, message, params)
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            metrics.incr("llm_cache_hits")
+            return cached
+
+    agent = Agent(system_prompt=prompt_content(system_prompt, model, system=True), tools=[], model=model)
+    metrics.incr("llm_calls")
+    start = time.perf_counter()
+    with metrics.timed(f"llm.{task}", model_id=model_signature(model)[0]):
+        result = agent(prompt_content(message, model))
+    text = str(result)
+    usage.record_result(task, result, f"{system_prompt}\n{message}", (time.perf_counter() - start) * 1000)
+
+    if key is not None:
+        get_response_cache().put(key, text)
+    return text
+
+
+_STREAM_END = object()
+
+
+def stream_complete(system_prompt: str, message: str, task: str, model: Optional[Model] = None) -> Iterator[str]:
+    """
+    Streaming counterpart of ``complete``: yields text chunks as they arrive.
+
+    The strands agent runs its async stream on a worker thread and hands
+    chunks over through a queue, so callers can consume it as a plain
+    generator. Streaming calls are never cached.
+    """
+    model = model or model_registry.get_model(streaming=True)
+    agent = Agent(system_prompt=prompt_content(system_prompt, model, system=True), tools=[], model=model)
+    chunks: "queue.Queue[Any]" = queue.Queue()
+    metrics.incr("llm_calls")
+
+    async def pump() -> None:
+        async for event in agent.stream_async(prompt_content(message, model)):
+            if "data" in event:
+                chunks.put(event["data"])
+            elif "result" in event:
+                usage.record_result(task, event["result"], f"{system_prompt}\n{message}",
+                                    (time.perf_counter() - start) * 1000)
+
+    def produce() -> None:
+        try:
+            with metrics.timed(f"llm.{task}", streaming=True):
+                asyncio.run(pump())
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(_STREAM_END)
+
+    start = time.perf_counter()
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(produce,), name=f"stream-{task}", daemon=True).start()
+    while True:
+        item = chunks.get()
+        if item is _STREAM_END:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
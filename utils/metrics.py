@@ -0,0 +1,108 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from utils import tracing
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """``q``-th percentile (0-100) with linear interpolation; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100.0
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def describe(values: Sequence[float]) -> Dict[str, float]:
+    """count / mean / p50 / p95 / p99 / max of a list of timings."""
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+class MetricsCollector:
+    """Thread-safe sink for named timings (milliseconds) and counters."""
+
+    def __init__(self):
+        self._timings: Dict[str, List[float]] = defaultdict(list)
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            self._timings[name].append(elapsed_ms)
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def timings(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return {name: list(values) for name, values in self._timings.items()}
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """``describe`` of every timing, by name."""
+        return {name: describe(values) for name, values in sorted(self.timings().items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+
+
+# None (the default) makes timed/incr no-ops, so production turns pay nothing
+_collector: Optional[MetricsCollector] = None
+
+
+def get_metrics() -> Optional[MetricsCollector]:
+    return _collector
+
+
+def set_metrics(collector: Optional[MetricsCollector]) -> None:
+    """Install a collector (benchmarks, tests); ``None`` turns collection off."""
+    global _collector
+    _collector = collector
+
+
+@contextmanager
+def timed(name: str, **attrs: Any) -> Iterator[None]:
+    """
+    Record the wall time of the block under ``name`` (also when it raises),
+    and trace it as a span of the current request (``utils.tracing``).
+    """
+    collector = _collector
+    with tracing.span(name, **attrs):
+        if collector is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            collector.record(name, (time.perf_counter() - start) * 1000)
+
+
+def record(name: str, elapsed_ms: float) -> None:
+    collector = _collector
+    if collector is not None:
+        collector.record(name, elapsed_ms)
+
+
+def incr(name: str, amount: int = 1) -> None:
+    collector = _collector
+    if collector is not None:
+        collector.incr(name, amount)
@@ -0,0 +1,141 @@
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+from strands.models import BedrockModel, Model
+from config import Config
+
+T = TypeVar("T")
+
+# (model_id, region_name, temperature, streaming) -> Model
+ModelFactory = Callable[[str, str, Optional[float], bool], Model]
+
+# Process-wide pools. They live at module scope so that a warm Lambda container
+# (or a long-running Gradio process) reuses models, boto3 clients and their TLS
+# connections across invocations instead of rebuilding them on every turn.
+_models: Dict[Tuple[Any, ...], Model] = {}
+_clients: Dict[Tuple[str, str], Any] = {}
+_agents: Dict[type, Any] = {}
+_model_factory: Optional[ModelFactory] = None
+_backend_name = "bedrock"
+_lock = threading.Lock()
+
+
+def get_model(
+    model_id: Optional[str] = None,
+    region_name: Optional[str] = None,
+    temperature: Optional[float] = None,
+    streaming: bool = False,
+) -> Model:
+    """
+    Return a pooled model instance.
+
+    Instances are keyed by (model_id, region_name, temperature, streaming), so
+    callers asking for the same configuration share one model and its client.
+    """
+    model_id = model_id or Config.DEFAULT_MODEL
+    region_name = region_name or Config.AWS_REGION
+    key = (model_id, region_name, temperature, streaming)
+
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            model = _build_model(model_id, region_name, temperature, streaming)
+            _models[key] = model
+    return model
+
+
+def set_model_factory(factory: Optional[ModelFactory], name: str = "custom") -> None:
+    """
+    Replace the Bedrock model factory (e.g. with a stub or cassette backend).
+
+    Pooled models and shared agents are dropped so the next lookup is built by
+    the new factory. ``None`` restores Bedrock. ``name`` identifies the backend
+    (it is part of response cache keys, so stub output never serves real calls).
+    """
+    global _model_factory, _backend_name
+    with _lock:
+        _model_factory = factory
+        _backend_name = name if factory is not None else "bedrock"
+        _models.clear()
+        _agents.clear()
+
+
+def current_backend() -> str:
+    """Name of the backend models are currently built by."""
+    return _backend_name
+
+
+def _build_model(model_id: str, region_name: str, temperature: Optional[float], streaming: bool) -> Model:
+    if _model_factory is not None:
+        return _model_factory(model_id, region_name, temperature, streaming)
+    return bedrock_model(model_id, region_name, temperature, streaming)
+
+
+def bedrock_model(model_id: str, region_name: str, temperature: Optional[float], streaming: bool) -> Model:
+    """Build an unpooled BedrockModel (the default factory)."""
+    kwargs: Dict[str, Any] = {
+        "model_id": model_id,
+        "region_name": region_name,
+        "streaming": streaming,
+    }
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    return BedrockModel(**kwargs)
+
+
+def get_client(service_name: str, region_name: Optional[str] = None) -> Any:
+    """Return a pooled boto3 client (boto3 clients are thread-safe)."""
+    region_name = region_name or Config.AWS_REGION
+    key = (service_name, region_name)
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            import boto3
+            client = boto3.client(service_name, region_name=region_name)
+            _clients[key] = client
+    return client
+
+
+def get_shared_agent(agent_cls: Type[T]) -> T:
+    """
+    Return a shared instance of a stateless agent class.
+
+    Only use this for agents that build a fresh strands ``Agent`` per call
+    (e.g. ``TechniqueSelectorAgent``, ``CrisisHandlerAgent``). A strands
+    ``Agent`` keeps its conversation in ``messages``, so agents that call
+    ``self.agent``/``self(...)`` repeatedly must not be pooled.
+    """
+    agent = _agents.get(agent_cls)
+    if agent is not None:
+        return agent
+
+    with _lock:
+        agent = _agents.get(agent_cls)
+    if agent is None:
+        # Constructed outside the lock: agent constructors call get_model().
+        created = agent_cls()
+        with _lock:
+            agent = _agents.setdefault(agent_cls, created)
+    return agent
+
+
+def registry_stats() -> Dict[str, int]:
+    """Return the number of pooled instances per kind."""
+    return {"models": len(_models), "clients": len(_clients), "agents": len(_agents)}
+
+
+def clear_registry() -> None:
+    """Drop every pooled instance (used by benchmarks and tests)."""
+    with _lock:
+        _models.clear()
+        _clients.clear()
+        _agents.clear()
@@ -0,0 +1,54 @@
+from typing import Optional, Tuple
+
+from config import Config
+from utils import knowledge_base, model_registry
+from utils.response_cache import ResponseCache, set_response_cache
+from utils.stub_model import LatencyProfile, StubModel, StubRetriever
+
+
+def use_stub(
+    model: Optional[StubModel] = None,
+    retriever: Optional[StubRetriever] = None,
+    latency: Optional[LatencyProfile] = None,
+    retrieval_latency: Optional[LatencyProfile] = None,
+) -> Tuple[StubModel, StubRetriever]:
+    """
+    Route every model and knowledge base call to in-process stubs.
+
+    One ``StubModel`` serves every (model_id, temperature, ...) configuration,
+    so ``model.calls`` counts all LLM calls made by the pipeline. The response
+    cache is reset to a fresh memory-only instance so runs are reproducible.
+    """
+    model = model or StubModel(latency=latency)
+    retriever = retriever or StubRetriever(latency=retrieval_latency)
+    model_registry.set_model_factory(lambda model_id, region_name, temperature, streaming: model, name="stub")
+    set_response_cache(ResponseCache())
+    knowledge_base.set_retriever(retriever)
+    return model, retriever
+
+
+def use_bedrock() -> None:
+    """Restore the real Bedrock model and knowledge base backends."""
+    model_registry.set_model_factory(None)
+    knowledge_base.set_retriever(None)
+    set_response_cache(None)
+
+
+def configure_backend(backend: Optional[str] = None, cassette_path: Optional[str] = None) -> None:
+    """
+    Install the backend named by ``Config.BACKEND`` (env ``CBT_BACKEND``).
+
+    "bedrock" (default) leaves everything untouched, "stub" uses the scripted
+    offline stubs, and "record"/"replay" go through the cassette at
+    ``Config.CASSETTE_PATH`` (env ``CBT_CASSETTE``). A local knowledge base
+    (``Config.KB_BACKEND``) then replaces the retriever of any of them.
+    """
+    backend = backend or Config.BACKEND
+    if backend == "stub":
+        use_stub()
+    elif backend in ("record", "replay"):
+        from utils.cassette import use_cassette
+        use_cassette(cassette_path or Config.CASSETTE_PATH, mode=backend)
+    elif backend != "bedrock":
+        raise ValueError(f"Unknown backend: {backend}")
+    knowledge_base.configure_kb_backend()
@@ -0,0 +1,168 @@
+import json
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from config import Config
+
+_TOKEN = re.compile(r"[a-z]+")
+_QUOTED_INPUT = re.compile(r"(?:Example|Client) Input(?: \d+)?: ?[\"“]([^\"”\n]+)")
+
+_STOPWORDS = frozenset("""
+a about after again all am an and any are as at be been being but by can could did do does doing
+don dont for from had has have having he her here him his how i if im in into is it its ive just
+me more most my myself no not now of on once only or other our out over own same she should so
+some such than that the their them then there these they this those through to too under until
+up very was we were what when where which while who why will with would you your yourself really
+feel feeling like get got going know thing things something want even still much make keep
+""".split())
+
+# Sections of agent.json that are not counseling concepts (the crisis
+# scenarios are handled by CrisisHandlerAgent before any specialized agent runs)
+_SKIPPED_SECTIONS = ("crisis",)
+
+
+def stem(token: str) -> str:
+    """Strip a common inflection ("-ing", "-ed", "-es", "-s") from a longer token."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[: -len(suffix)]
+    return token
+
+
+def terms(text: str) -> List[str]:
+    """Lower-cased, stemmed content words of ``text``."""
+    return [stem(t) for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS and len(t) > 2]
+
+
+@dataclass
+class Concept:
+    """One agent.json entry as a retrieval concept."""
+    name: str
+    module: str
+    approach: str
+    keywords: Counter = field(default_factory=Counter)
+
+    @property
+    def query(self) -> str:
+        """Academic-style KB query for the concept, in the shape the LLM path produces."""
+        return f"{self.name} in CBT: {self.module.lower()}" if self.module else f"{self.name} in CBT"
+
+
+def _concept_name(subsection: str) -> str:
+    name = subsection.split(":", 1)[1] if subsection.lower().startswith("intent:") else subsection
+    return name.replace("_", " ").strip().lower()
+
+
+def concept_entries(entries: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(concept name, entry) for the agent.json entries that describe a counseling concept."""
+    for entry in entries:
+        if any(s in entry.get("section", "").lower() for s in _SKIPPED_SECTIONS):
+            continue
+        if entry.get("subsection"):
+            yield _concept_name(entry["subsection"]), entry
+
+
+def example_inputs(entry: Dict[str, Any]) -> List[str]:
+    """The quoted example client inputs of an agent.json entry."""
+    return _QUOTED_INPUT.findall(entry.get("content", ""))
+
+
+class ConceptLexicon:
+    """
+    CBT concepts from the knowledge base source (agent.json): the
+    ``subsection`` intent or module name, its ``module`` and ``approach``, and
+    keywords from the example client inputs (or the opening of the content
+    for entries without examples). ``queries`` matches a client turn against
+    them with BM25-weighted keyword overlap, so no LLM call is needed.
+    """
+
+    # BM25 term saturation and length normalization (entries range from a
+    # few example inputs to whole module descriptions)
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, concepts: List[Concept]):
+        self.concepts = concepts
+        document_frequency: Counter = Counter()
+        for concept in concepts:
+            document_frequency.update(set(concept.keywords))
+        total = max(1, len(concepts))
+        self._idf = {term: math.log(1 + total / count) for term, count in document_frequency.items()}
+        self._lengths = [sum(c.keywords.values()) for c in concepts]
+        self._average_length = sum(self._lengths) / total or 1.0
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict[str, Any]], exclude_inputs: Optional[Set[str]] = None) -> "ConceptLexicon":
+        """
+        Build the lexicon from agent.json entries. Example inputs listed in
+        ``exclude_inputs`` are left out (leave-one-out evaluation).
+        """
+        exclude_inputs = exclude_inputs or set()
+        concepts: Dict[str, Concept] = {}
+        for name, entry in concept_entries(entries):
+            concept = concepts.setdefault(name, Concept(name, entry.get("module", ""), entry.get("approach", "")))
+            inputs = example_inputs(entry)
+            # The concept name and module count several times so they outweigh any single example
+            concept.keywords.update(terms(f"{name} {name} {name} {concept.module}"))
+            if inputs:
+                concept.keywords.update(terms(" ".join(text for text in inputs if text not in exclude_inputs)))
+            else:
+                concept.keywords.update(terms(entry.get("content", "")[:400]))
+        return cls(list(concepts.values()))
+
+    def score(self, text: str) -> List[tuple]:
+        """(score, concept) for every concept sharing a term with ``text``, best first."""
+        query_terms = set(terms(text))
+        scored = []
+        for concept, length in zip(self.concepts, self._lengths):
+            norm = self.K1 * (1 - self.B + self.B * length / self._average_length)
+            score = 0.0
+            for t in query_terms:
+                tf = concept.keywords.get(t, 0)
+                if tf:
+                    score += self._idf[t] * tf * (self.K1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, concept))
+        scored.sort(key=lambda item: -item[0])
+        return scored
+
+    def queries(self, latest_turn: str, max_concepts: Optional[int] = None) -> List[str]:
+        """
+        KB queries for a client turn: the turn itself plus the query of each
+        of the best-matching concepts (``Config.RAG_LOCAL_CONCEPTS``).
+        """
+        limit = Config.RAG_LOCAL_CONCEPTS if max_concepts is None else max_concepts
+        queries = [latest_turn]
+        for _, concept in self.score(latest_turn)[:limit]:
+            queries.append(concept.query)
+        return queries
+
+
+def load_entries(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    with open(path or Config.AGENT_KB_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_lexicon: Optional[ConceptLexicon] = None
+_lexicon_lock = threading.Lock()
+
+
+def get_lexicon() -> ConceptLexicon:
+    """The process-wide lexicon built from ``Config.AGENT_KB_PATH``."""
+    global _lexicon
+    if _lexicon is None:
+        with _lexicon_lock:
+            if _lexicon is None:
+                _lexicon = ConceptLexicon.from_entries(load_entries())
+    return _lexicon
+
+
+def set_lexicon(lexicon: Optional[ConceptLexicon]) -> None:
+    """Install a lexicon (tests); ``None`` rebuilds it from agent.json on next use."""
+    global _lexicon
+    with _lexicon_lock:
+        _lexicon = lexicon
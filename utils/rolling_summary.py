@@ -0,0 +1,70 @@
+from typing import List, Optional, Tuple
+
+from config import Config
+from models.session import CounselingSession, Message
+from utils import metrics
+from utils.concurrency import Speculation
+from utils.llm import complete
+from utils.prompts import PromptTemplates
+
+ROLLING_SUMMARY_SYSTEM_PROMPT = '''You are an experienced clinical supervisor keeping a running summary
+        of a CBT counseling session. Update the summary with only what the new turns add.'''
+
+
+def format_turns(messages: List[Message]) -> str:
+    return "\n".join(str(msg) for msg in messages)
+
+
+def summarize_turns(previous_summary: str, messages: List[Message]) -> str:
+    """Fold ``messages`` into ``previous_summary`` with one LLM call."""
+    prompt = PromptTemplates.rolling_summary_prompt(previous_summary, format_turns(messages))
+    return complete(ROLLING_SUMMARY_SYSTEM_PROMPT, prompt, task="rolling_summary").strip()
+
+
+def pending_update(session: CounselingSession) -> Optional[Tuple[int, int]]:
+    """
+    Return the (start, end) message range the next update should fold, or None.
+
+    The newest ``Config.MAX_HISTORY_LENGTH`` messages always stay verbatim in
+    turn prompts, so only older messages are folded, and only once at least
+    ``Config.ROLLING_SUMMARY_UPDATE_EVERY`` of them have piled up.
+    """
+    if not Config.ROLLING_SUMMARY_ENABLED:
+        return None
+    start = session.summary_checkpoint
+    end = len(session.messages) - Config.MAX_HISTORY_LENGTH
+    if end - start < Config.ROLLING_SUMMARY_UPDATE_EVERY:
+        return None
+    return start, end
+
+
+def start_update(session: CounselingSession) -> Optional[Speculation]:
+    """
+    Start the next due update on a worker thread; returns None if none is due.
+
+    The folded messages are already outside the verbatim window, so the
+    update can run while the current turn is processed and adds no latency.
+    Collect it with ``finish_update``.
+    """
+    span = pending_update(session)
+    if span is None:
+        return None
+    start, end = span
+    previous_summary, messages = session.rolling_summary, session.messages[start:end]
+    return Speculation(lambda cancel: (summarize_turns(previous_summary, messages), end))
+
+
+def finish_update(session: CounselingSession, update: Optional[Speculation]) -> None:
+    """Store a finished update on the session; on failure the same span is retried next turn."""
+    if update is None:
+        return
+    try:
+        with metrics.timed("stage.rolling_summary_wait"):
+            summary, checkpoint = update.result(timeout=Config.ROLLING_SUMMARY_TIMEOUT_SECONDS)
+    except Exception as e:
+        print(f"[WARN] Rolling summary update skipped: {type(e).__name__}: {e}")
+        update.cancel()
+        return
+    if checkpoint > session.summary_checkpoint:
+        session.rolling_summary = summary
+        session.summary_checkpoint = checkpoint
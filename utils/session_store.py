@@ -0,0 +1,208 @@
+import copy
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from config import Config
+
+# A stored session record: {"session_state": {...}, "client_profile": {...}}
+Record = Dict[str, Any]
+
+
+class SessionNotFoundError(KeyError):
+    """Raised when a session id is unknown (or was evicted/expired)."""
+
+
+class VersionConflictError(Exception):
+    """Raised when a save is based on a version that is no longer current."""
+
+    def __init__(self, session_id: str, expected_version: int, current_version: int):
+        super().__init__(
+            f"Session {session_id} is at version {current_version}, not {expected_version}"
+        )
+        self.session_id = session_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+class SessionStore(ABC):
+    """
+    Server-side session storage with optimistic versioning.
+
+    Every successful save bumps the record's version. ``save`` only succeeds
+    if the caller's ``expected_version`` is still current, so two turns
+    racing on the same session cannot silently overwrite each other.
+    Subclasses implement ``load``, ``_insert``, ``_update`` and ``delete``.
+    """
+
+    def create(self, record: Record) -> Tuple[str, int]:
+        """Store a new record; returns (session_id, version)."""
+        session_id = uuid.uuid4().hex
+        self._insert(session_id, record)
+        return session_id, 1
+
+    @abstractmethod
+    def load(self, session_id: str) -> Tuple[Record, int]:
+        """Return (record, version); raises SessionNotFoundError."""
+        pass
+
+    def save(self, session_id: str, record: Record, expected_version: int) -> int:
+        """Replace the record if it is still at ``expected_version``; returns the new version."""
+        return self._update(session_id, record, expected_version)
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def _insert(self, session_id: str, record: Record) -> None:
+        pass
+
+    @abstractmethod
+    def _update(self, session_id: str, record: Record, expected_version: int) -> int:
+        """Replace a live record at ``expected_version``; raises SessionNotFoundError or VersionConflictError."""
+        pass
+
+
+class InMemorySessionStore(SessionStore):
+    """LRU-bounded store for a single warm process (Lambda container or app.py)."""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._records: "OrderedDict[str, Tuple[Record, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Tuple[Record, int]:
+        with self._lock:
+            if session_id not in self._records:
+                raise SessionNotFoundError(session_id)
+            self._records.move_to_end(session_id)
+            record, version = self._records[session_id]
+            return copy.deepcopy(record), version
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._records.pop(session_id, None)
+
+    def _insert(self, session_id: str, record: Record) -> None:
+        with self._lock:
+            self._remember(session_id, copy.deepcopy(record), 1)
+
+    def _update(self, session_id: str, record: Record, expected_version: int) -> int:
+        with self._lock:
+            if session_id not in self._records:
+                raise SessionNotFoundError(session_id)
+            current = self._records[session_id][1]
+            if current != expected_version:
+                raise VersionConflictError(session_id, expected_version, current)
+            self._remember(session_id, copy.deepcopy(record), current + 1)
+            return current + 1
+
+    def _remember(self, session_id: str, record: Record, version: int) -> None:
+        self._records[session_id] = (record, version)
+        self._records.move_to_end(session_id)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    File-backed store (one SQLite database) that survives process restarts.
+
+    Records untouched for ``ttl_seconds`` are treated as missing.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+            "record TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def load(self, session_id: str) -> Tuple[Record, int]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT record, version FROM sessions WHERE session_id = ? AND updated_at > ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+        if row is None:
+            raise SessionNotFoundError(session_id)
+        return json.loads(row[0]), row[1]
+
+    def records(self) -> Iterator[Record]:
+        """Every live record (e.g. to train on logged sessions)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT record FROM sessions WHERE updated_at > ?", (time.time() - self.ttl_seconds,)
+            ).fetchall()
+        for (record,) in rows:
+            yield json.loads(record)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def _insert(self, session_id: str, record: Record) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (session_id, version, record, updated_at) VALUES (?, 1, ?, ?)",
+                (session_id, json.dumps(record, ensure_ascii=False), time.time()),
+            )
+            self._db.commit()
+
+    def _update(self, session_id: str, record: Record, expected_version: int) -> int:
+        # An expired record stays missing, as in load: a save must not revive it
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE sessions SET version = version + 1, record = ?, updated_at = ? "
+                "WHERE session_id = ? AND version = ? AND updated_at > ?",
+                (json.dumps(record, ensure_ascii=False), now, session_id, expected_version, now - self.ttl_seconds),
+            )
+            self._db.commit()
+            if cursor.rowcount == 1:
+                return expected_version + 1
+            row = self._db.execute(
+                "SELECT version FROM sessions WHERE session_id = ? AND updated_at > ?",
+                (session_id, now - self.ttl_seconds),
+            ).fetchone()
+        if row is None:
+            raise SessionNotFoundError(session_id)
+        raise VersionConflictError(session_id, expected_version, row[0])
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide store selected by ``Config.SESSION_STORE``."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if Config.SESSION_STORE == "sqlite":
+                    _store = SQLiteSessionStore(Config.SESSION_STORE_DB, Config.SESSION_STORE_TTL_SECONDS)
+                elif Config.SESSION_STORE == "memory":
+                    _store = InMemorySessionStore(Config.SESSION_STORE_MAX_ENTRIES)
+                else:
+                    raise ValueError(f"Unknown session store: {Config.SESSION_STORE}")
+    return _store
+
+
+def set_session_store(store: Optional[SessionStore]) -> None:
+    """Install a specific store, e.g. a shared one for multi-container deployments."""
+    global _store
+    with _store_lock:
+        _store = store
@@ -0,0 +1,148 @@
+import json
+import re
+import time
+from typing import Any, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from strands import Agent
+from strands.models import Model
+from strands.types.exceptions import StructuredOutputException
+
+from config import Config
+from utils import metrics, model_registry, tracing, usage
+from utils.llm import complete, model_signature, prompt_content
+from utils.prompts import PromptTemplates
+
+M = TypeVar("M", bound=BaseModel)
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_JSON = re.compile(r"[\[{].*[\]}]", re.DOTALL)
+
+
+def compact_schema(schema: Type[BaseModel]) -> str:
+    """
+    One-line JSON skeleton of ``schema`` for prompts, e.g.
+    ``{"techniques": [{"technique": "Reflection|Questioning", "score": "number 0-1"}]}``.
+    A fraction of the size of ``model_json_schema()``.
+    """
+    full = schema.model_json_schema()
+    defs = full.get("$defs", {})
+
+    def render(node: Any) -> Any:
+        if "$ref" in node:
+            return render(defs[node["$ref"].rsplit("/", 1)[-1]])
+        if "enum" in node:
+            return "|".join(str(value) for value in node["enum"])
+        kind = node.get("type")
+        if kind == "object":
+            return {name: render(prop) for name, prop in node.get("properties", {}).items()}
+        if kind == "array":
+            return [render(node.get("items", {}))]
+        if kind in ("number", "integer") and "minimum" in node and "maximum" in node:
+            return f"{kind} {node['minimum']:g}-{node['maximum']:g}"
+        return kind or "any"
+
+    return json.dumps(render(full), ensure_ascii=False)
+
+
+def parse(schema: Type[M], text: str) -> M:
+    """
+    Validate the JSON in ``text`` against ``schema``.
+
+    Code fences and prose around the JSON are ignored, and a bare list is
+    accepted for a schema whose only field is that list.
+
+    Raises:
+        ValueError: no JSON in ``text`` or it does not match (``ValidationError``
+            is a ``ValueError``).
+    """
+    fenced = _FENCE.search(text)
+    match = _JSON.search(fenced.group(1) if fenced else text)
+    if not match:
+        raise ValueError("no JSON found in the output")
+    data = json.loads(match.group(0))
+    if isinstance(data, list) and len(schema.model_fields) == 1:
+        data = {next(iter(schema.model_fields)): data}
+    return schema.model_validate(data)
+
+
+def _native(system_prompt: str, message: str, schema: Type[M], task: str, model: Model) -> M:
+    """
+    Tool-use structured output (the ``structured_output_model`` invocation of
+    a strands Agent); the backend enforces the schema.
+    """
+    agent = Agent(system_prompt=prompt_content(system_prompt, model, system=True), tools=[], model=model)
+    metrics.incr("llm_calls")
+    start = time.perf_counter()
+    with metrics.timed(f"llm.{task}", model_id=model_signature(model)[0], structured=True):
+        result = agent(str(message), structured_output_model=schema)
+    usage.record_result(task, result, f"{system_prompt}\n{message}", (time.perf_counter() - start) * 1000)
+    if result.structured_output is None:
+        raise ValueError("the model returned no structured output")
+    return result.structured_output
+
+
+def _repair(schema: Type[M], output: str, error: Exception, task: str, model: Model) -> Optional[M]:
+    """The single repair attempt: show the model its output and the validation error."""
+    metrics.incr("structured_repairs")
+    try:
+        fixed = complete(
+            PromptTemplates.structured_repair_prompt(compact_schema(schema)),
+            f"Output:\n{output}\n\nErrors:\n{error}",
+            task=f"{task}_repair",
+            model=model,
+        )
+        return parse(schema, fixed)
+    except Exception as e:
+        print(f"[WARN] Structured output repair for {task} failed: {e}")
+        return None
+
+
+def structured_complete(
+    system_prompt: str,
+    message: str,
+    schema: Type[M],
+    task: str,
+    model: Optional[Model] = None,
+) -> Optional[M]:
+    """
+    Single-turn completion validated against a pydantic ``schema``.
+
+    With ``Config.STRUCTURED_OUTPUT_MODE`` "native" the backend's tool-use mode
+    produces the object directly; "json" asks for JSON matching the compact
+    schema in the completion text (``complete``, so response caching applies).
+    Either way at most one repair call follows a failure, so a bad output costs
+    one extra call and never a retried turn. In native mode that call is the
+    tool-forced retry strands makes itself; the JSON retry only follows
+    errors strands did not retry.
+
+    Returns:
+        The validated object, or ``None`` when the repair failed too; callers
+        fall back to a default.
+    """
+    model = model or model_registry.get_model()
+    instruction = f"{message}\n\nReturn ONLY JSON matching: {compact_schema(schema)}"
+    if Config.STRUCTURED_OUTPUT_MODE == "native":
+        try:
+            return _native(system_prompt, message, schema, task, model)
+        except StructuredOutputException as e:
+            print(f"[WARN] Structured output for {task} failed after the forced retry: {e}")
+            metrics.incr("structured_repairs")
+            return None
+        except Exception as e:
+            # The one retry is the same request in JSON mode, told what went wrong
+            print(f"[WARN] Native structured output for {task} failed: {e}")
+            metrics.incr("structured_repairs")
+            try:
+                return parse(schema, complete(system_prompt, f"{instruction}\nA previous attempt failed: {e}",
+                                              task=f"{task}_repair", model=model))
+            except Exception as retry_error:
+                print(f"[WARN] Structured output repair for {task} failed: {retry_error}")
+                return None
+
+    output = complete(system_prompt, instruction, task=task, model=model)
+    try:
+        with tracing.span(f"parse.{task}"):
+            return parse(schema, output)
+    except ValueError as e:
+        return _repair(schema, output, e, task, model)
@@ -0,0 +1,413 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union
+
+from strands.models import Model
+
+from config import Config
+from utils.tokens import estimate_tokens
+
+T = TypeVar("T")
+
+# (system_prompt, prompt) -> completion text
+Responder = Callable[[str, str], str]
+
+
+@dataclass
+class LatencyProfile:
+    """
+    Latency injected by the stub backends.
+
+    ``first_token_ms`` is the delay before the first streamed token and
+    ``per_token_ms`` the delay between tokens. ``distribution`` controls how
+    the first-token delay is drawn around its mean: "constant", "uniform"
+    (+/- ``spread`` as a fraction of the mean) or "lognormal" (``spread`` is sigma).
+    """
+    first_token_ms: float = 0.0
+    per_token_ms: float = 0.0
+    distribution: str = "constant"
+    spread: float = 0.0
+
+    def sample_first_token(self, rng: random.Random) -> float:
+        """Draw a first-token delay in seconds."""
+        mean = self.first_token_ms / 1000.0
+        if mean <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(mean * (1 - self.spread), mean * (1 + self.spread)))
+        if self.distribution == "lognormal":
+            return rng.lognormvariate(0.0, self.spread) * mean
+        return mean
+
+    @classmethod
+    def instant(cls) -> "LatencyProfile":
+        return cls()
+
+    @classmethod
+    def bedrock_like(cls) -> "LatencyProfile":
+        """Rough shape of Mistral Large on Bedrock: ~0.7s to first token, ~20ms/token."""
+        return cls(first_token_ms=700.0, per_token_ms=20.0, distribution="lognormal", spread=0.35)
+
+
+def system_blocks(system_prompt: Any, system_prompt_content: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    The system prompt of a ``Model.stream`` call as content blocks.
+
+    strands passes list prompts as ``system_prompt_content`` (with their cache
+    points) and only a newline-joined copy of the text as ``system_prompt``,
+    so the blocks take precedence.
+    """
+    if system_prompt_content:
+        return list(system_prompt_content)
+    if system_prompt is None:
+        return []
+    if isinstance(system_prompt, str):
+        return [{"text": system_prompt}]
+    return [block for block in system_prompt if isinstance(block, dict)]
+
+
+def system_text(system_prompt: Any, system_prompt_content: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Flatten a strands system prompt (string or content blocks) to text."""
+    return "".join(block.get("text", "") for block in system_blocks(system_prompt, system_prompt_content))
+
+
+def _tool_call(text: str, tool_specs: Optional[List[Any]], tool_choice: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Name of the tool a completion calls: a JSON object answer becomes the
+    input of the tool ``tool_choice`` forces, or of the only tool offered
+    (how strands' ``structured_output_model`` asks for its output).
+    """
+    names = [spec.get("name") for spec in tool_specs or [] if isinstance(spec, dict)]
+    forced = ((tool_choice or {}).get("tool") or {}).get("name")
+    name = forced if forced in names else (names[0] if len(names) == 1 else None)
+    if name is None:
+        return None
+    try:
+        return name if isinstance(json.loads(text), dict) else None
+    except ValueError:
+        return None
+
+
+def last_user_text(messages: List[Dict[str, Any]]) -> str:
+    """Return the text of the most recent user message in a strands message list."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return "".join(block.get("text", "") for block in message.get("content", []) if "text" in block)
+    return ""
+
+
+def default_responder(system_prompt: str, prompt: str) -> str:
+    """
+    Scripted outputs for every prompt the pipeline issues.
+
+    The rules key on phrases from ``PromptTemplates`` and the inline system
+    prompts in ``lambda_function.py`` so that a whole session runs offline with
+    plausible, parseable outputs.
+    """
+    system = system_prompt.lower()
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+
+    if "crisis_detected" in system:
+        return "NO_CRISIS"
+    if "relevance validation" in system and '"relevant"' in system:
+        try:
+            items = json.loads(prompt)
+        except json.JSONDecodeError:
+            items = []
+        return json.dumps([{"id": item.get("id"), "relevant": True} for item in items if isinstance(item, dict)])
+    if "relevance validation" in system:
+        return "RELEVANT"
+    if "intent analysis" in system:
+        return prompt.replace(",", "")
+    if "crisis response agent" in system:
+        return ("I'm an AI co-therapist and cannot provide crisis support. "
+                "Please call 000 now or contact Lifeline on 13 11 14. "
+                "Please reach out to your therapist or emergency services immediately.")
+    if '"queries"' in system:
+        return json.dumps({"queries": [
+            "cognitive distortions and automatic thoughts",
+            "emotion regulation strategies for anxiety",
+            "behavioural activation for low mood",
+        ]})
+    if "selecting psychological techniques" in system:
+        agents = Config.THERAPY_AGENTS
+        first = agents[digest % len(agents)]
+        second = agents[(digest // 7) % len(agents)]
+        return json.dumps({"techniques": [
+            {"technique": first, "score": 0.9},
+            {"technique": second, "score": 0.6},
+        ]})
+    if "setting the agenda" in system:
+        return json.dumps({
+            "session_focus": "Work-related anxiety",
+            "agenda_items": ["Recent stressful situations at work", "Thoughts before performance reviews"],
+            "goals": ["Notice anxious predictions"],
+            "priorities": ["Upcoming review"],
+            "agenda_summary": "Explore recent work stress and the thoughts behind it.",
+        })
+    if "evaluator of cbt counseling quality" in system:
+        return json.dumps({c: bool((digest >> i) & 1) for i, c in enumerate(sorted(Config.CRITERIONS))})
+    if "agenda topic" in system:
+        return "Managing work-related anxiety"
+    if "sub technique name" in system:
+        return "None"
+    if "running summary" in system:
+        return ("The client described persistent worry about mistakes at work and fear of "
+                "their manager's judgement. The counselor reflected feelings and explored "
+                "the evidence behind the client's predictions.")
+    if "clinical supervisor" in system:
+        return ("The client discussed ongoing anxiety and worry about making mistakes. "
+                "The session focused on identifying anxious thoughts and their impact. "
+                "Coping strategies were introduced collaboratively.")
+    return ("That sounds really tough, and it makes sense you'd feel that way. "
+            "Can you tell me a bit more about what goes through your mind when this happens?")
+
+
+class StubModel(Model):
+    """
+    Offline strands ``Model`` with scripted outputs and injected latency.
+
+    ``responses`` may be a single string, a list of strings (returned in turn,
+    repeating the last one), or a callable ``(system_prompt, prompt) -> str``.
+    By default ``default_responder`` scripts every prompt the pipeline uses.
+    Every call is appended to ``calls`` so tests and benchmarks can count them.
+
+    Cache points in the prompt are honoured like a provider prompt cache would:
+    a prefix seen within ``prefix_cache_ttl_s`` is reported as cache-read
+    tokens instead of input tokens (see ``prefix_cache_stats``).
+    """
+
+    supports_cache_points = True
+
+    def __init__(
+        self,
+        responses: Union[str, List[str], Responder, None] = None,
+        latency: Optional[LatencyProfile] = None,
+        seed: int = 0,
+        prefix_cache_ttl_s: float = 300.0,
+        **model_config: Any,
+    ):
+        self.config: Dict[str, Any] = {"model_id": "stub"}
+        self.config.update(model_config)
+        self.latency = latency or LatencyProfile.instant()
+        self.prefix_cache_ttl_s = prefix_cache_ttl_s
+        self.calls: List[Dict[str, Any]] = []
+        self._responses = responses
+        self._scripted_index = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # sha256 of a cached prefix -> monotonic expiry time
+        self._prefix_cache: Dict[str, float] = {}
+        self._cache_stats = {"requests": 0, "cache_hits": 0, "input_tokens": 0,
+                             "cache_read_tokens": 0, "cache_write_tokens": 0}
+
+    def update_config(self, **model_config: Any) -> None:
+        self.config.update(model_config)
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.config
+
+    def respond(self, system_prompt: str, prompt: str) -> str:
+        """Produce the scripted completion for a request."""
+        responses = self._responses
+        if responses is None:
+            return default_responder(system_prompt, prompt)
+        if isinstance(responses, str):
+            return responses
+        if callable(responses):
+            return responses(system_prompt, prompt)
+        with self._lock:
+            index = min(self._scripted_index, len(responses) - 1)
+            self._scripted_index += 1
+        return responses[index]
+
+    def _record_call(self, system_prompt: str, prompt: str, text: str, latency_s: float,
+                     cache_read_tokens: int = 0) -> None:
+        with self._lock:
+            self.calls.append({
+                "system_prompt": system_prompt,
+                "prompt": prompt,
+                "response": text,
+                "latency_ms": latency_s * 1000,
+                "cache_read_tokens": cache_read_tokens,
+            })
+
+    def _prefix_cache_usage(self, system: List[Dict[str, Any]], messages: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Return (cache_read_tokens, cache_write_tokens) for a request with
+        system prompt blocks ``system``.
+
+        Every cache point marks the text before it as a cacheable prefix. The
+        longest live prefix is read from the cache; the rest up to the last
+        cache point is written, and every prefix's TTL is refreshed.
+        """
+        blocks = list(system)
+        for message in messages:
+            blocks.extend(message.get("content", []))
+        prefixes, text = [], []
+        for block in blocks:
+            if "cachePoint" in block:
+                prefixes.append("".join(text))
+            elif "text" in block:
+                text.append(block["text"])
+        if not prefixes:
+            return 0, 0
+
+        now = time.monotonic()
+        read = 0
+        with self._lock:
+            for prefix in prefixes:
+                digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+                if self._prefix_cache.get(digest, 0.0) > now:
+                    read = estimate_tokens(prefix)
+                self._prefix_cache[digest] = now + self.prefix_cache_ttl_s
+        return read, max(0, estimate_tokens(prefixes[-1]) - read)
+
+    def prefix_cache_stats(self) -> Dict[str, int]:
+        """
+        Totals over every streamed request: ``input_tokens`` (uncached),
+        ``cache_read_tokens``, ``cache_write_tokens``, ``requests`` and
+        ``cache_hits`` (requests that read any prefix from the cache).
+        """
+        with self._lock:
+            return dict(self._cache_stats)
+
+    async def stream(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_specs: Optional[List[Any]] = None,
+        system_prompt: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        blocks = system_blocks(system_prompt, kwargs.get("system_prompt_content"))
+        system = system_text(blocks)
+        prompt = last_user_text(messages)
+        text = self.respond(system, prompt)
+
+        with self._lock:
+            first_token_s = self.latency.sample_first_token(self._rng)
+        per_token_s = self.latency.per_token_ms / 1000.0
+        chunks = re.findall(r"\S+\s*", text) or [text]
+        tool = _tool_call(text, tool_specs, kwargs.get("tool_choice"))
+
+        yield {"messageStart": {"role": "assistant"}}
+        if first_token_s:
+            await asyncio.sleep(first_token_s)
+        if tool is not None:
+            yield {"contentBlockStart": {"start": {"toolUse": {"toolUseId": f"stub-{uuid.uuid4().hex[:12]}",
+                                                               "name": tool}}}}
+            yield {"contentBlockDelta": {"delta": {"toolUse": {"input": text}}}}
+            yield {"contentBlockStop": {}}
+            yield {"messageStop": {"stopReason": "tool_use"}}
+        else:
+            yield {"contentBlockStart": {"start": {}}}
+            for i, chunk in enumerate(chunks):
+                if i and per_token_s:
+                    await asyncio.sleep(per_token_s)
+                yield {"contentBlockDelta": {"delta": {"text": chunk}}}
+            yield {"contentBlockStop": {}}
+            yield {"messageStop": {"stopReason": "end_turn"}}
+
+        latency_s = first_token_s + per_token_s * max(0, len(chunks) - 1)
+        cache_read, cache_write = self._prefix_cache_usage(blocks, messages)
+        self._record_call(system, prompt, text, latency_s, cache_read)
+        # Like Bedrock, inputTokens excludes the tokens read from or written to the cache
+        input_tokens = max(0, estimate_tokens(system) + estimate_tokens(prompt) - cache_read - cache_write)
+        output_tokens = estimate_tokens(text)
+        with self._lock:
+            stats = self._cache_stats
+            stats["requests"] += 1
+            stats["cache_hits"] += 1 if cache_read else 0
+            stats["input_tokens"] += input_tokens
+            stats["cache_read_tokens"] += cache_read
+            stats["cache_write_tokens"] += cache_write
+        yield {
+            "metadata": {
+                "usage": {
+                    "inputTokens": input_tokens,
+                    "outputTokens": output_tokens,
+                    "totalTokens": input_tokens + cache_read + cache_write + output_tokens,
+                    "cacheReadInputTokens": cache_read,
+                    "cacheWriteInputTokens": cache_write,
+                },
+                "metrics": {"latencyMs": int(latency_s * 1000)},
+            }
+        }
+
+    async def structured_output(
+        self,
+        output_model: Type[T],
+        prompt: List[Dict[str, Any]],
+        system_prompt: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        system = system_text(system_prompt, kwargs.get("system_prompt_content"))
+        user_text = last_user_text(prompt)
+        text = self.respond(system, user_text)
+        with self._lock:
+            first_token_s = self.latency.sample_first_token(self._rng)
+        if first_token_s:
+            await asyncio.sleep(first_token_s)
+        self._record_call(system, user_text, text, first_token_s)
+        yield {"output": output_model.model_validate_json(text)}
+
+
+_CRISIS_TERMS = ("die", "kill", "suicide", "end my life", "hurt myself", "gun", "overdose", "not be here")
+
+
+class StubRetriever:
+    """
+    Offline knowledge base with injected latency.
+
+    ``results`` may be a fixed list of normalized results or a callable
+    ``(text, number_of_results, metadata_filter) -> list``. By default crisis
+    lookups score high only for messages containing obvious risk terms and
+    other lookups return a generic CBT passage.
+    """
+
+    def __init__(self, results: Any = None, latency: Optional[LatencyProfile] = None, seed: int = 0):
+        self.latency = latency or LatencyProfile.instant()
+        self.calls: List[Dict[str, Any]] = []
+        self._results = results
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, text: str, number_of_results: int = 1,
+                 metadata_filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            delay = self.latency.sample_first_token(self._rng)
+            self.calls.append({"text": text, "number_of_results": number_of_results, "filter": metadata_filter})
+        if delay:
+            time.sleep(delay)
+
+        if callable(self._results):
+            return self._results(text, number_of_results, metadata_filter)
+        if self._results is not None:
+            return list(self._results)[:number_of_results]
+        return self._default_results(text, metadata_filter)[:number_of_results]
+
+    @staticmethod
+    def _default_results(text: str, metadata_filter: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        lowered = text.lower()
+        if metadata_filter and "crisis" in json.dumps(metadata_filter):
+            risky = any(term in lowered for term in _CRISIS_TERMS)
+            return [{
+                "text": "Example 1: Direct Suicidal Statement\nClient Input: \"I want to kill myself\"",
+                "score": 0.8 if risky else 0.1,
+                "metadata": {"intervention_type": "crisis"},
+                "source": "stub",
+            }]
+        return [{
+            "text": ("Content: Notice the thought, name the feeling, and gently check the "
+                     "evidence for and against it before choosing a helpful response."),
+            "score": 0.75,
+            "metadata": {"approach": "REFLECTIONS on EMOTIONS", "module": "Cognitive Interventions"},
+            "source": "stub",
+        }]
@@ -0,0 +1,218 @@
+import json
+import math
+import random
+import re
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import Config
+from models.session import CounselingSession, Message
+
+# (history text, technique) — one logged technique selection
+Example = Tuple[str, str]
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_SPEAKER = re.compile(r"^(Client|Counselor): ?", re.MULTILINE)
+
+# Characters of history (from the end) that contribute context features
+CONTEXT_CHARS = 1200
+
+
+def history_text(messages: Sequence[Dict[str, Any]], rolling_summary: str = "", summary_checkpoint: int = 0) -> str:
+    """
+    Render session messages ({"speaker", "content"}) exactly as technique
+    selection sees them in a live turn: the handler's history view (with the
+    rolling summary of ``messages[:summary_checkpoint]``, if any) within the
+    "technique_selection" token budget. Training and inference features then
+    come from the same text.
+    """
+    session = CounselingSession(
+        messages=[Message(m["speaker"], m["content"]) for m in messages],
+        rolling_summary=rolling_summary,
+        summary_checkpoint=summary_checkpoint,
+    )
+    view = session.history_view(Config.MAX_HISTORY_LENGTH, slack=Config.ROLLING_SUMMARY_UPDATE_EVERY)
+    return view.render(Config.HISTORY_TOKEN_BUDGETS.get("technique_selection"))
+
+
+def _latest_client_turn(history: str) -> str:
+    parts = _SPEAKER.split(history)
+    for speaker, text in reversed(list(zip(parts[1::2], parts[2::2]))):
+        if speaker == "Client":
+            return text
+    return history[-CONTEXT_CHARS:]
+
+
+def featurize(history: str, dim: int) -> Dict[int, float]:
+    """
+    Hashed, L2-normalized sparse features of a rendered history: unigrams and
+    bigrams of the latest client turn, unigrams of the recent context and a
+    bucket for how far into the session the turn is.
+    """
+    counts: Dict[int, float] = {}
+
+    def add(feature: str, weight: float = 1.0) -> None:
+        index = zlib.crc32(feature.encode("utf-8")) % dim
+        counts[index] = counts.get(index, 0.0) + weight
+
+    latest = _TOKEN.findall(_latest_client_turn(history).lower())
+    for token in latest:
+        add("c:" + token)
+    for first, second in zip(latest, latest[1:]):
+        add(f"c:{first}_{second}")
+    for token in _TOKEN.findall(history[-CONTEXT_CHARS:].lower()):
+        add("h:" + token, 0.5)
+    add(f"turn:{min(history.count('Counselor:'), 8)}", 2.0)
+    add("bias")
+
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {i: v / norm for i, v in counts.items()}
+
+
+class TechniqueClassifier:
+    """
+    Multinomial logistic regression over hashed n-gram features of the
+    recent history, predicting one of ``Config.THERAPY_AGENTS``.
+
+    Pure Python with sparse features: a prediction is a few dozen dict
+    lookups per label, so it answers in microseconds. Train it with
+    ``python -m benchmarks.technique_classifier train``.
+    """
+
+    def __init__(self, labels: Optional[List[str]] = None, dim: int = 4096):
+        self.labels = list(labels or Config.THERAPY_AGENTS)
+        self.dim = dim
+        self.weights: Dict[str, Dict[int, float]] = {label: {} for label in self.labels}
+
+    def _scores(self, features: Dict[int, float]) -> List[float]:
+        return [
+            sum(value * weights.get(index, 0.0) for index, value in features.items())
+            for weights in (self.weights[label] for label in self.labels)
+        ]
+
+    @staticmethod
+    def _softmax(scores: List[float]) -> List[float]:
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict_proba(self, history: str) -> Dict[str, float]:
+        probabilities = self._softmax(self._scores(featurize(history, self.dim)))
+        return dict(zip(self.labels, probabilities))
+
+    def predict(self, history: str) -> Tuple[str, float]:
+        """(technique, confidence) — the most likely technique and its probability."""
+        probabilities = self.predict_proba(history)
+        best = max(probabilities, key=probabilities.get)
+        return best, probabilities[best]
+
+    def fit(self, examples: Sequence[Example], epochs: int = 15, learning_rate: float = 0.5,
+            l2: float = 1e-4, seed: int = 0) -> "TechniqueClassifier":
+        """SGD on the cross-entropy loss. Examples with unknown labels are ignored."""
+        data = [(featurize(history, self.dim), self.labels.index(label))
+                for history, label in examples if label in self.labels]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch)
+            for features, target in data:
+                probabilities = self._softmax(self._scores(features))
+                for k, label in enumerate(self.labels):
+                    gradient = probabilities[k] - (1.0 if k == target else 0.0)
+                    weights = self.weights[label]
+                    for index, value in features.items():
+                        w = weights.get(index, 0.0)
+                        weights[index] = w - rate * (gradient * value + l2 * w)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "dim": self.dim,
+            "labels": self.labels,
+            "weights": {
+                label: {str(i): round(w, 6) for i, w in weights.items() if abs(w) > 1e-6}
+                for label, weights in self.weights.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TechniqueClassifier":
+        classifier = cls(data["labels"], data["dim"])
+        classifier.weights = {
+            label: {int(i): float(w) for i, w in weights.items()}
+            for label, weights in data["weights"].items()
+        }
+        return classifier
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "TechniqueClassifier":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def session_examples(session_state: Dict[str, Any], include_classifier: bool = False) -> List[Example]:
+    """
+    (history, technique) pairs from a serialized ``CounselingSession``: every
+    counselor message annotated with a technique, paired with the history
+    that preceded it. Choices the classifier made itself are skipped unless
+    ``include_classifier`` is set, so it is not trained on its own output.
+
+    Only the final rolling summary is stored, so it is used for the turns
+    after its checkpoint and earlier turns are rendered without one.
+    """
+    messages = session_state.get("messages", [])
+    summary = session_state.get("rolling_summary", "")
+    checkpoint = session_state.get("summary_checkpoint", 0)
+    examples = []
+    for i, message in enumerate(messages):
+        annotations = message.get("annotations") or {}
+        technique = annotations.get("technique")
+        if message.get("speaker") != "Counselor" or not technique:
+            continue
+        if annotations.get("technique_source") == "classifier" and not include_classifier:
+            continue
+        if summary and checkpoint <= i:
+            examples.append((history_text(messages[:i], summary, checkpoint), technique))
+        else:
+            examples.append((history_text(messages[:i]), technique))
+    return examples
+
+
+def collect_examples(session_states: Iterable[Dict[str, Any]], include_classifier: bool = False) -> List[Example]:
+    return [example for state in session_states for example in session_examples(state, include_classifier)]
+
+
+_UNLOADED = object()
+_classifier: Any = _UNLOADED
+_classifier_lock = threading.Lock()
+
+
+def get_technique_classifier() -> Optional[TechniqueClassifier]:
+    """
+    The process-wide classifier loaded from ``Config.TECHNIQUE_CLASSIFIER_PATH``,
+    or ``None`` when no path is configured or the file cannot be loaded.
+    """
+    global _classifier
+    if _classifier is _UNLOADED:
+        with _classifier_lock:
+            if _classifier is _UNLOADED:
+                path = Config.TECHNIQUE_CLASSIFIER_PATH
+                try:
+                    _classifier = TechniqueClassifier.load(path) if path else None
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"[WARN] Technique classifier {path} not loaded: {e}")
+                    _classifier = None
+    return _classifier
+
+
+def set_technique_classifier(classifier: Optional[TechniqueClassifier]) -> None:
+    """Install a classifier (tests, benchmarks); ``None`` sends every selection to the LLM."""
+    global _classifier
+    with _classifier_lock:
+        _classifier = classifier
@@ -0,0 +1,252 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config import Config
+from utils.concurrency import in_own_context
+
+
+@dataclass
+class Span:
+    """One timed step of a request; times are microseconds since the trace started."""
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    start_us: float
+    duration_us: float = 0.0
+    thread: str = ""
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    """The spans of one handler invocation."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans: List[Span] = []
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def timings(self) -> Dict[str, Any]:
+        """The ``timings`` section of a handler response."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_us)
+        by_name: Dict[str, Dict[str, float]] = {}
+        for span in spans:
+            entry = by_name.setdefault(span.name, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + span.duration_us / 1000, 3)
+        roots = [s for s in spans if s.parent_id is None]
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round(sum(s.duration_us for s in roots) / 1000, 3),
+            "by_name": by_name,
+            "spans": [
+                {
+                    "id": s.span_id,
+                    "parent": s.parent_id,
+                    "name": s.name,
+                    "start_ms": round(s.start_us / 1000, 3),
+                    "duration_ms": round(s.duration_us / 1000, 3),
+                    "thread": s.thread,
+                    **({"attrs": s.attrs} if s.attrs else {}),
+                }
+                for s in spans
+            ],
+        }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        Chrome trace event format ("X" complete events), viewable in
+        chrome://tracing or https://ui.perfetto.dev.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        threads = {name: tid for tid, name in enumerate(sorted({s.thread for s in spans}), 1)}
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+            for name, tid in threads.items()
+        ]
+        for span in spans:
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round(span.start_us, 1),
+                "dur": round(span.duration_us, 1),
+                "pid": 1,
+                "tid": threads[span.thread],
+                "args": {"span_id": span.span_id, "parent_id": span.parent_id, **span.attrs},
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "name": self.name},
+        }
+
+    def export(self, directory: str) -> str:
+        """Write the Chrome trace to ``directory``; returns the file path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{self.trace_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+        return path
+
+
+# The active trace and span follow the request into worker threads because
+# utils.concurrency runs every task in a copy of the caller's context.
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_parent: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("trace_parent", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[None]:
+    """Time the block as a child of the current span; a no-op outside a trace."""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    record = Span(name, trace.next_id(), _parent.get(), trace.now_us(),
+                  thread=threading.current_thread().name, attrs=attrs)
+    token = _parent.set(record.span_id)
+    try:
+        yield
+    except BaseException as e:
+        record.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _parent.reset(token)
+        record.duration_us = trace.now_us() - record.start_us
+        trace.add(record)
+
+
+@contextmanager
+def start_trace(name: str) -> Iterator[Trace]:
+    """Make a new trace current for the block, with one root span named ``name``."""
+    trace = Trace(name)
+    trace_token = _trace.set(trace)
+    parent_token = _parent.set(None)
+    try:
+        with span(name):
+            yield trace
+    finally:
+        _parent.reset(parent_token)
+        _trace.reset(trace_token)
+
+
+def traced(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap ``fn`` so each call runs in a span named ``name``."""
+    @functools.wraps(fn)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        with span(name):
+            return fn(*args, **kwargs)
+    return run
+
+
+def request_flag(event: Dict[str, Any], name: str) -> bool:
+    """True if the event or its JSON body sets ``name`` (e.g. ``include_timings``)."""
+    if event.get(name):
+        return True
+    raw = event.get("body")
+    # Cheap pre-check so ordinary requests are not parsed twice
+    if not isinstance(raw, str) or name not in raw:
+        return False
+    try:
+        return bool(json.loads(raw).get(name))
+    except (json.JSONDecodeError, AttributeError):
+        return False
+
+
+def _export(trace: Trace) -> None:
+    if Config.TRACE_DIR:
+        try:
+            trace.export(Config.TRACE_DIR)
+        except OSError as e:
+            print(f"[WARN] Trace export failed: {e}")
+
+
+def traced_handler(name: str) -> Callable[[Callable[..., Dict[str, Any]]], Callable[..., Dict[str, Any]]]:
+    """
+    Trace an API Gateway style handler.
+
+    A trace is recorded when ``Config.TRACING`` is on or the request sets
+    ``"include_timings": true``; the latter also adds a ``timings`` section to
+    the JSON response body. Traces are exported to ``Config.TRACE_DIR`` when it
+    is set.
+    """
+    def decorate(handler: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        @functools.wraps(handler)
+        def run(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            include_timings = request_flag(event, "include_timings")
+            if not (include_timings or Config.TRACING):
+                return handler(event, context)
+
+            with start_trace(name) as trace:
+                response = handler(event, context)
+            _export(trace)
+            if include_timings and isinstance(response.get("body"), str):
+                body = json.loads(response["body"])
+                body["timings"] = trace.timings()
+                response = {**response, "body": json.dumps(body)}
+            return response
+        return run
+    return decorate
+
+
+def traced_stream_handler(
+    name: str,
+) -> Callable[[Callable[..., Iterator[Dict[str, Any]]]], Callable[..., Iterator[Dict[str, Any]]]]:
+    """
+    ``traced_handler`` for a streaming handler (an iterator of events). The
+    root span closes when the stream ends, so it covers every chunk; with
+    ``"include_timings": true`` the timings are added to the body of the
+    closing ("final" or "error") event.
+    """
+    def decorate(handler: Callable[..., Iterator[Dict[str, Any]]]) -> Callable[..., Iterator[Dict[str, Any]]]:
+        def events(event: Dict[str, Any], context: Any, include_timings: bool) -> Iterator[Dict[str, Any]]:
+            closing = None
+            with start_trace(name) as trace:
+                for item in handler(event, context):
+                    if "body" in item:
+                        closing = item
+                    else:
+                        yield item
+            _export(trace)
+            if closing is not None:
+                if include_timings and isinstance(closing["body"], dict):
+                    closing = {**closing, "body": {**closing["body"], "timings": trace.timings()}}
+                yield closing
+
+        @functools.wraps(handler)
+        def run(event: Dict[str, Any], context: Any) -> Iterator[Dict[str, Any]]:
+            include_timings = request_flag(event, "include_timings")
+            if not (include_timings or Config.TRACING):
+                return handler(event, context)
+            return in_own_context(events(event, context, include_timings))
+        return run
+    return decorate
@@ -0,0 +1,255 @@
+import contextvars
+import functools
+import json
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from config import Config
+from utils import metrics, tracing
+from utils.concurrency import in_own_context
+from utils.tokens import estimate_tokens
+
+
+@dataclass
+class TaskUsage:
+    """Model calls of one task type (see ``utils.llm.complete``'s ``task``)."""
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    latency_ms: float = 0.0
+    skipped: int = 0  # optional calls not made because a budget was exhausted
+
+    def add(self, other: "TaskUsage") -> None:
+        self.calls += other.calls
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cache_read_tokens += other.cache_read_tokens
+        self.latency_ms += other.latency_ms
+        self.skipped += other.skipped
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Hard limits for one ledger; 0 means unlimited."""
+    max_calls: int = 0
+    max_tokens: int = 0
+
+    @classmethod
+    def per_turn(cls) -> "Budget":
+        return cls(Config.LLM_CALL_BUDGET_PER_TURN, Config.LLM_TOKEN_BUDGET_PER_TURN)
+
+    @classmethod
+    def per_session(cls) -> "Budget":
+        return cls(Config.LLM_CALL_BUDGET_PER_SESSION, Config.LLM_TOKEN_BUDGET_PER_SESSION)
+
+
+class Ledger:
+    """
+    Thread-safe tally of model calls per task for one scope (a handler
+    invocation, a turn or a whole session).
+
+    Usage recorded in a ledger is also added to its parents, so a turn ledger
+    whose parents are the handler and session ledgers keeps all three current.
+    """
+
+    def __init__(self, name: str, budget: Budget = Budget(), parents: Sequence["Ledger"] = ()):
+        self.name = name
+        self.budget = budget
+        self.parents = list(parents)
+        self._tasks: Dict[str, TaskUsage] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, name: str, data: Optional[Dict[str, Dict[str, Any]]], budget: Budget = Budget()) -> "Ledger":
+        """Rebuild a ledger from ``to_dict`` output (e.g. ``CounselingSession.llm_usage``)."""
+        ledger = cls(name, budget)
+        for task, fields in (data or {}).items():
+            ledger._tasks[task] = TaskUsage(**fields)
+        return ledger
+
+    def add(self, task: str, usage: TaskUsage) -> None:
+        with self._lock:
+            self._tasks.setdefault(task, TaskUsage()).add(usage)
+        for parent in self.parents:
+            parent.add(task, usage)
+
+    def by_task(self) -> Dict[str, TaskUsage]:
+        with self._lock:
+            return {task: TaskUsage(**asdict(usage)) for task, usage in self._tasks.items()}
+
+    def totals(self) -> TaskUsage:
+        total = TaskUsage()
+        for usage in self.by_task().values():
+            total.add(usage)
+        return total
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {task: asdict(usage) for task, usage in sorted(self.by_task().items())}
+
+    def report(self) -> Dict[str, Any]:
+        """``usage`` section of a handler response: totals plus the per-task breakdown."""
+        return {"total": asdict(self.totals()), "by_task": self.to_dict()}
+
+    def exhausted_by(self, estimated_tokens: int) -> Optional[str]:
+        """Name of the first ledger (this one or an ancestor) whose budget one more call would break."""
+        total = self.totals()
+        if self.budget.max_calls and total.calls + 1 > self.budget.max_calls:
+            return self.name
+        if self.budget.max_tokens and total.input_tokens + total.output_tokens + estimated_tokens > self.budget.max_tokens:
+            return self.name
+        for parent in self.parents:
+            exhausted = parent.exhausted_by(estimated_tokens)
+            if exhausted:
+                return exhausted
+        return None
+
+
+# Follows the request into worker threads like the tracing context
+# (utils.concurrency runs every task in a copy of the caller's context)
+_ledger: contextvars.ContextVar[Optional[Ledger]] = contextvars.ContextVar("llm_ledger", default=None)
+
+
+def current_ledger() -> Optional[Ledger]:
+    return _ledger.get()
+
+
+@contextmanager
+def open_ledger(name: str, budget: Budget = Budget(), parents: Sequence[Ledger] = ()) -> Iterator[Ledger]:
+    """
+    Make a new ledger current for the block. The ledger that was current
+    before (if any) becomes its first parent.
+    """
+    outer = _ledger.get()
+    ledger = Ledger(name, budget, ([outer] if outer is not None else []) + list(parents))
+    token = _ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _ledger.reset(token)
+
+
+@contextmanager
+def activate(ledger: Ledger) -> Iterator[Ledger]:
+    """Make an existing ledger current for the block."""
+    token = _ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _ledger.reset(token)
+
+
+def reported_usage(result: Any) -> Dict[str, Any]:
+    """The usage a strands ``AgentResult`` reports (accumulated over its agent's lifetime)."""
+    return dict(getattr(getattr(result, "metrics", None), "accumulated_usage", None) or {})
+
+
+def usage_from_result(result: Any, prompt_text: str = "",
+                      previous: Optional[Dict[str, Any]] = None) -> Tuple[int, int, int]:
+    """
+    (input, output, cache read) tokens of a strands ``AgentResult``.
+
+    Reported usage is used when the backend returns it; otherwise both sides
+    are estimated (``utils.tokens``). Input tokens include the ones served
+    from the prompt cache. For an agent that is called more than once, pass
+    its ``reported_usage`` from the previous call as ``previous``.
+    """
+    return usage_from_report(reported_usage(result), prompt_text, str(result), previous)
+
+
+def usage_from_report(reported: Dict[str, Any], prompt_text: str, output_text: str,
+                      previous: Optional[Dict[str, Any]] = None) -> Tuple[int, int, int]:
+    """``usage_from_result`` for a raw strands usage dict (e.g. an agent's ``event_loop_metrics``)."""
+    if previous:
+        reported = {k: v - previous.get(k, 0) for k, v in reported.items() if isinstance(v, (int, float))}
+    if reported.get("inputTokens") or reported.get("outputTokens"):
+        cache_read = int(reported.get("cacheReadInputTokens", 0))
+        input_tokens = int(reported.get("inputTokens", 0)) + cache_read + int(reported.get("cacheWriteInputTokens", 0))
+        return input_tokens, int(reported.get("outputTokens", 0)), cache_read
+    return estimate_tokens(prompt_text), estimate_tokens(output_text), 0
+
+
+def record(task: str, input_tokens: int, output_tokens: int, latency_ms: float, cache_read_tokens: int = 0) -> None:
+    """Record one model call of ``task`` in the current ledger (a no-op without one)."""
+    metrics.incr("llm_input_tokens", input_tokens)
+    metrics.incr("llm_output_tokens", output_tokens)
+    ledger = _ledger.get()
+    if ledger is not None:
+        ledger.add(task, TaskUsage(1, input_tokens, output_tokens, cache_read_tokens, latency_ms))
+
+
+def record_result(task: str, result: Any, prompt_text: str, latency_ms: float,
+                  previous: Optional[Dict[str, Any]] = None) -> None:
+    """Record a call from its strands ``AgentResult`` (see ``usage_from_result``)."""
+    input_tokens, output_tokens, cache_read = usage_from_result(result, prompt_text, previous)
+    record(task, input_tokens, output_tokens, latency_ms, cache_read)
+
+
+def allows(task: str, prompt_text: str = "") -> bool:
+    """
+    True if an optional ``task`` call fits the budgets of the current ledger
+    and its parents. Only tasks in ``Config.OPTIONAL_LLM_TASKS`` are ever
+    refused; a refusal is recorded as a skip so callers can fall back.
+    """
+    ledger = _ledger.get()
+    if ledger is None or task not in Config.OPTIONAL_LLM_TASKS:
+        return True
+    exhausted = ledger.exhausted_by(estimate_tokens(prompt_text))
+    if exhausted is None:
+        return True
+    print(f"[WARN] Skipping {task}: {exhausted} LLM budget exhausted")
+    metrics.incr("llm_budget_skips")
+    ledger.add(task, TaskUsage(skipped=1))
+    return False
+
+
+def metered_handler(name: str) -> Callable[[Callable[..., Dict[str, Any]]], Callable[..., Dict[str, Any]]]:
+    """
+    Account the model calls of an API Gateway style handler in a ledger of
+    its own. A request that sets ``"include_usage": true`` gets the ledger's
+    ``report()`` as a ``usage`` section of the JSON response body.
+    """
+    def decorate(handler: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        @functools.wraps(handler)
+        def run(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            with open_ledger(name) as ledger:
+                response = handler(event, context)
+            if tracing.request_flag(event, "include_usage") and isinstance(response.get("body"), str):
+                body = json.loads(response["body"])
+                body["usage"] = ledger.report()
+                response = {**response, "body": json.dumps(body)}
+            return response
+        return run
+    return decorate
+
+
+def metered_stream_handler(
+    name: str,
+) -> Callable[[Callable[..., Iterator[Dict[str, Any]]]], Callable[..., Iterator[Dict[str, Any]]]]:
+    """
+    ``metered_handler`` for a streaming handler (an iterator of events, see
+    ``lambda_function.start_session_stream_handler``). The ledger stays open
+    until the stream ends; with ``"include_usage": true`` its report is added
+    to the body of the closing ("final" or "error") event.
+    """
+    def decorate(handler: Callable[..., Iterator[Dict[str, Any]]]) -> Callable[..., Iterator[Dict[str, Any]]]:
+        def events(event: Dict[str, Any], context: Any) -> Iterator[Dict[str, Any]]:
+            closing = None
+            with open_ledger(name) as ledger:
+                for item in handler(event, context):
+                    if "body" in item:
+                        closing = item
+                    else:
+                        yield item
+            if closing is not None:
+                if tracing.request_flag(event, "include_usage") and isinstance(closing["body"], dict):
+                    closing = {**closing, "body": {**closing["body"], "usage": ledger.report()}}
+                yield closing
+
+        @functools.wraps(handler)
+        def run(event: Dict[str, Any], context: Any) -> Iterator[Dict[str, Any]]:
+            return in_own_context(events(event, context))
+        return run
+    return decorate